@@ -0,0 +1,143 @@
+"""Seeded generator for synthetic data.yaml files.
+
+Generated files have experiences of every type the template declares, groups with min/max
+constraints, experience min/max points, order fields on experiences and points, bold keywords
+and dependant bullets. The same size and seed always generate the same file.
+
+Usage: python benchmarks/datagen.py OUTPUT --bullets N [--seed SEED] [--types job project]
+"""
+
+import argparse
+import hashlib
+import random
+import sys
+
+import numpy as np
+import yaml
+
+from optimizer import WORDS
+
+DEFAULT_TYPES = ("job", "project")
+VERBS = ["Built", "Designed", "Led", "Reduced", "Automated", "Deployed", "Migrated", "Optimized",
+         "Wrote", "Maintained", "Trained", "Presented", "Integrated", "Refactored", "Launched"]
+NOUNS = WORDS + ["sql", "kubernetes", "c++", "pytorch", "react", "kafka", "latex", "rust",
+                 "robotics", "controls", "pcb", "grafana", "terraform", "spark", "interns", "customers"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell"]
+TITLES = ["Engineer", "Developer", "Intern", "Analyst", "Researcher", "Lead"]
+CITIES = ["Toronto", "Waterloo", "Ottawa", "Montreal", "Vancouver"]
+
+
+def generate_text(rng: random.Random) -> str:
+    """Generate a bullet sentence, numbers make most bullets unique like real ones."""
+    words = [rng.choice(VERBS)] + [rng.choice(NOUNS)
+                                   for _ in range(rng.randint(6, 24))]
+    if rng.random() < 0.5:
+        words.insert(rng.randint(1, len(words)),
+                     f"{rng.randint(2, 99)}%")
+    return " ".join(words)
+
+
+def generate_point(rng: random.Random) -> dict:
+    """Generate a point without dependants."""
+    point = {"text": generate_text(rng)}
+    if rng.random() < 0.3:
+        point["bold"] = rng.sample(point["text"].split(" ")[1:], 1)
+    if rng.random() < 0.2:
+        point["order"] = rng.randint(-2, 2)
+    return point
+
+
+def generate_data(n_bullets: int, seed: int = 0, experience_types: tuple[str, ...] = DEFAULT_TYPES) -> dict:
+    """Generate the contents of a data file with `n_bullets` bullets, dependants included."""
+    rng = random.Random(seed)
+    data: dict[str, dict] = {}
+    remaining = n_bullets
+    exp_i = 0
+    while remaining > 0:
+        experience = {
+            "type": experience_types[exp_i % len(experience_types)],
+            "metatext1": f"{rng.choice(COMPANIES)} {exp_i}",
+            "metatext2": str(2024 - exp_i % 10),
+            "metatext3": rng.choice(TITLES),
+            "metatext4": rng.choice(CITIES),
+        }
+        if rng.random() < 0.3:
+            experience["min_points"] = rng.randint(1, 2)
+        if rng.random() < 0.5:
+            experience["max_points"] = rng.randint(3, 6)
+        if rng.random() < 0.2:
+            experience["order"] = rng.randint(-1, 3)
+
+        groups = []
+        for _ in range(rng.randint(1, 3)):
+            if remaining <= 0:
+                break
+            group: dict = {"points": []}
+            if rng.random() < 0.25:
+                group["min"] = 1
+            if rng.random() < 0.4:
+                group["max"] = rng.randint(2, 3)
+            for _ in range(rng.randint(2, 5)):
+                if remaining <= 0:
+                    break
+                point = generate_point(rng)
+                remaining -= 1
+                if remaining > 0 and rng.random() < 0.2:
+                    n_dependants = min(rng.randint(1, 2), remaining)
+                    point["dependants"] = [generate_point(rng)
+                                           for _ in range(n_dependants)]
+                    remaining -= n_dependants
+                group["points"].append(point)
+            groups.append(group)
+        experience["groups"] = groups
+        data[f"exp{exp_i}"] = experience
+        exp_i += 1
+    return data
+
+
+def write_data_file(path: str, n_bullets: int, seed: int = 0, experience_types: tuple[str, ...] = DEFAULT_TYPES):
+    """Generate a data file and write it to a path."""
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(generate_data(n_bullets, seed, experience_types), f,
+                  Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False)
+
+
+class StubEncoder:
+    """Deterministic stand in for the embedding model so stages other than embedding can be timed.
+
+    Each text gets a random unit vector seeded by a hash of the text, which is stable between runs
+    unlike python's string hash.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+
+    def embed_one(self, text: str) -> np.ndarray:
+        "Embed a single text."
+        seed = int.from_bytes(hashlib.blake2b(
+            text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+    def encode(self, texts, batch_size: int = 32, **_):
+        "Embed a text or a list of texts like SentenceTransformer.encode."
+        if isinstance(texts, str):
+            return self.embed_one(texts)
+        if len(texts) == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed_one(text) for text in texts])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output")
+    parser.add_argument("--bullets", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--types", nargs="+", default=list(DEFAULT_TYPES))
+    args = parser.parse_args()
+    write_data_file(args.output, args.bullets, args.seed, tuple(args.types))
+    print(f"Wrote {args.bullets} bullets to {args.output}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
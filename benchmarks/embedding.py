@@ -0,0 +1,108 @@
+"""Benchmark comparing the throughput of the embedding backends.
+
+Embeds generated bullets with every backend, model and quantization given and reports the model
+load time, texts per second for each batch size and thread count, and the mean cosine similarity
+of the embeddings to the first configuration of the same model, so the speed of quantized and
+ONNX models can be weighed against how much their embeddings drift. Configurations whose
+dependencies aren't installed are skipped.
+
+Configurations are written as backend[-int8]:model, where model is a model name or an alias
+like small, e.g. torch:default onnx-int8:small.
+
+Usage: python benchmarks/embedding.py [--configs C ...] [--texts N] [--batch-sizes N ...] [--threads N ...] [--export-dir DIR] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from datagen import generate_text
+from optimizer import SRC_DIR
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.encoders import resolve_model
+from gencv.utils import TextEncoder
+
+DEFAULT_CONFIGS = ["torch:default", "onnx:default", "onnx-int8:default",
+                   "torch:small", "onnx:small", "onnx-int8:small"]
+
+
+def parse_config(config: str) -> tuple[str, str, bool]:
+    """Backend, model name and whether to quantize from a backend[-int8]:model configuration."""
+    backend, model_name = config.split(":", 1)
+    quantize = backend.endswith("-int8")
+    return backend.removesuffix("-int8"), resolve_model(model_name), quantize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[TextEncoder.DEFAULT_BATCH_SIZE])
+    parser.add_argument("--threads", type=int, nargs="+", default=[None],
+                        help="Thread counts to run each backend with, defaults to every core.")
+    parser.add_argument("--export-dir",
+                        help="Folder ONNX exports are kept in, defaults to a temporary folder.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # the encoder prepends the instruction to every text
+    texts = [TextEncoder.INSTRUCTION + generate_text(rng) for _ in range(args.texts)]
+    TextEncoder.set_cache(None)
+
+    results = []
+    # embeddings of the first configuration of each model that every other one is compared to
+    references: dict[str, np.ndarray] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        export_dir = args.export_dir or os.path.join(tmp_dir, "onnx")
+        print(f"{'config':>28} {'threads':>7} {'batch':>5} {'load s':>7} {'texts/s':>8} {'cosine':>7}")
+        for config in args.configs:
+            backend, model_name, quantize = parse_config(config)
+            for threads in args.threads:
+                TextEncoder.configure(backend, model_name, quantize=quantize,
+                                      threads=threads, export_dir=export_dir)
+                start = time.perf_counter()
+                try:
+                    model = TextEncoder.get_model()
+                except ImportError as e:
+                    print(f"{config:>28} skipped, {e}")
+                    break
+                load_seconds = time.perf_counter() - start
+
+                for batch_size in args.batch_sizes:
+                    # warm up so lazy initialization isn't timed
+                    model.encode(texts[:batch_size], batch_size=batch_size)
+                    start = time.perf_counter()
+                    embeddings = TextEncoder.normalize(model.encode(texts, batch_size=batch_size))
+                    seconds = time.perf_counter() - start
+
+                    reference = references.setdefault(model_name, embeddings)
+                    result = {
+                        "config": config,
+                        "key": TextEncoder.model_key(),
+                        "threads": threads,
+                        "batch_size": batch_size,
+                        "load_seconds": load_seconds,
+                        "texts_per_second": len(texts) / seconds,
+                        "mean_cosine": float(np.mean(np.sum(reference * embeddings, axis=1))),
+                    }
+                    results.append(result)
+                    print(f"{config:>28} {threads or 'all':>7} {batch_size:5} {load_seconds:7.1f} "
+                          f"{result['texts_per_second']:8.1f} {result['mean_cosine']:7.4f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"texts": args.texts, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
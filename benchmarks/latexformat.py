@@ -0,0 +1,79 @@
+"""Benchmark for building resume PDFs from a precompiled preamble format.
+
+Fills textemplates/jakes_resume with generated experiences and compares the average time of a
+cold pdflatex build with synctex (how every resume used to be built) to a build starting from the
+cached preamble format without synctex. Needs pdflatex to be installed.
+
+Usage: python benchmarks/latexformat.py [--repeat N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from optimizer import SRC_DIR, TEMPLATE_DIR, WORDS
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.latex_builder import BulletData, ExperienceData, TexResumeTemplate
+from gencv.latexformat import build_format, split_preamble
+
+DEFAULT_REPEAT = 5
+
+
+def sample_experiences() -> list[ExperienceData]:
+    """Experiences filling every placeholder of the template."""
+    experiences = []
+    for i, experience_type in enumerate(["job", "job", "project", "project", "project"]):
+        bullets = [BulletData(" ".join(WORDS[(i + j + k) % len(WORDS)] for k in range(18)), [WORDS[j]])
+                   for j in range(4)]
+        experiences.append(ExperienceData(
+            f"exp{i}", experience_type, bullets, f"Company {i}", "2024", "Engineer", "Waterloo", ""))
+    return experiences
+
+
+def time_builds(latex: str, repeat: int, build_root: str, **build_options) -> float:
+    """Average seconds to build a PDF."""
+    times = []
+    for i in range(repeat):
+        output_dir = os.path.join(build_root, f"out{i}")
+        start = time.perf_counter()
+        path = TexResumeTemplate.to_file(
+            output_dir, "resume", latex, output_name="resume", output="all", **build_options)
+        times.append(time.perf_counter() - start)
+        if not os.path.exists(path):
+            sys.exit(f"{path} was not generated.")
+        shutil.rmtree(output_dir)
+    return sum(times) / len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+    if shutil.which("pdflatex") is None:
+        sys.exit("pdflatex is not installed.")
+
+    latex = TexResumeTemplate(TEMPLATE_DIR).fill(sample_experiences())
+    with tempfile.TemporaryDirectory() as build_root:
+        format_dir = os.path.join(build_root, "formats")
+        start = time.perf_counter()
+        if build_format(split_preamble(latex)[0], "pdflatex", format_dir) is None:
+            sys.exit("Dumping the preamble format failed.")
+        dump_seconds = time.perf_counter() - start
+
+        cold = time_builds(latex, args.repeat, build_root, synctex=True)
+        warm = time_builds(latex, args.repeat, build_root,
+                           synctex=False, format_dir=format_dir)
+
+    print(f"format dump (once):            {dump_seconds * 1000:8.1f} ms")
+    print(f"cold build with synctex:       {cold * 1000:8.1f} ms")
+    print(f"format build without synctex:  {warm * 1000:8.1f} ms")
+    print(f"reduction per PDF:             {(1 - warm / cold):8.0%}")
+
+
+if __name__ == "__main__":
+    main()
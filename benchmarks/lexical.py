@@ -0,0 +1,86 @@
+"""Benchmark for the BM25 index and the lexical scoring modes.
+
+Compiles generated data files with the stub encoder, then reports the time to build the index,
+its size in the bundle and BM25 scoring latency, and times scoring and ranking the bullets with
+dense, hybrid and lexical scoring and with dense scoring after a top-N lexical prefilter.
+
+Usage: python benchmarks/lexical.py [--sizes N ...] [--dim D] [--prefilter-top-n N] [--repeat N] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+from datagen import NOUNS, StubEncoder, write_data_file
+from optimizer import SRC_DIR
+from suite import QUERY, timed
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.compiled_data import LEXICAL_FILENAME, compile_data, get_bundle_dir, load_compact_embeddings, load_compiled_data, load_lexical_index
+from gencv.lexical import BM25Index, LexicalQuery
+from gencv.pipeline import score_resume_data
+from gencv.utils import TextEncoder
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def run_size(size: int, args, work_dir: str) -> dict:
+    """Time the index and every scoring mode on a generated data file with `size` bullets."""
+    data_file = os.path.join(work_dir, f"data{size}.yaml")
+    write_data_file(data_file, size, args.seed)
+    compile_data(data_file)
+    experiences, embeddings = load_compiled_data(data_file)
+    compact = load_compact_embeddings(data_file, embeddings)
+    texts = [bullet.text for experience in experiences for bullet, _ in experience.bullets]
+    keywords = random.Random(args.seed).sample(NOUNS, 8)
+
+    stages: dict[str, float] = {}
+    stages["build_index"], _ = timed(lambda: BM25Index.build(texts), args.repeat)
+    stages["load_index"], index = timed(lambda: load_lexical_index(data_file), args.repeat)
+    stages["bm25_scores"], _ = timed(lambda: index.scores(keywords), args.repeat)
+    modes = {
+        "dense": None,
+        "hybrid": LexicalQuery(index, keywords, "hybrid"),
+        "lexical": LexicalQuery(index, keywords, "lexical"),
+        "prefiltered_dense": LexicalQuery(index, keywords, "dense", prefilter_top_n=args.prefilter_top_n),
+    }
+    for mode, lexical in modes.items():
+        stages[f"score_{mode}"], _ = timed(
+            lambda lexical=lexical: score_resume_data(experiences, compact, QUERY, lexical), args.repeat)
+    index_bytes = os.path.getsize(os.path.join(get_bundle_dir(data_file), LEXICAL_FILENAME))
+    return {"bullets": size, "terms": len(index.terms), "index_bytes": index_bytes, "stages": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--dim", type=int, default=1024,
+                        help="Dimensions of the stub embeddings, the real model has 1024.")
+    parser.add_argument("--prefilter-top-n", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    TextEncoder.set_model(StubEncoder(args.dim))
+    TextEncoder.set_cache(None)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            result = run_size(size, args, work_dir)
+            results.append(result)
+            print(f"{size} bullets, {result['terms']} terms, index {result['index_bytes'] / 2 ** 20:.2f} MB:")
+            for stage, seconds in result["stages"].items():
+                print(f"  {stage:24} {seconds * 1000:10.2f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"dim": args.dim, "prefilter_top_n": args.prefilter_top_n, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark for the font metric line estimator.
+
+Times counting the lines of random bullets with the metrics of a font, and compares the line
+counts to the character count estimate. Without a font it uses flat metrics where every glyph is half an em.
+
+The memoized pass only hits for every bullet while the bullets fit in the estimator's line cache,
+so the default number of bullets stays below LINE_CACHE_SIZE. The hit rates of the line and word
+caches are printed after the timings.
+
+Usage: python benchmarks/linewidth.py [--font NAME_OR_PATH] [--bold-font NAME_OR_PATH] [--text-width DIMENSION] [--bullets N]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from optimizer import SRC_DIR, WORDS
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.fontmetrics import LINE_CACHE_SIZE, FontMetrics, LineEstimator, load_font_metrics, parse_dimension
+from gencv.utils import TemplateLayout, calculate_lines
+
+
+def main():
+    layout = TemplateLayout()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--font", help="TFM/AFM file or font name.")
+    parser.add_argument("--bold-font", help="TFM/AFM file or font name.")
+    parser.add_argument("--font-size", type=float, default=layout.font_size)
+    parser.add_argument("--text-width", default="7in")
+    parser.add_argument("--bullets", type=int, default=5_000,
+                        help=f"Bullets to count, more than {LINE_CACHE_SIZE} evict line counts before they're reused.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    regular = bold = FontMetrics(
+        {chr(code): 0.5 for code in range(33, 127)}, 0.25)
+    if args.font is not None:
+        regular = bold = load_font_metrics(args.font)
+        if regular is None:
+            sys.exit(f"Font {args.font} not found.")
+    if args.bold_font is not None:
+        bold = load_font_metrics(args.bold_font)
+        if bold is None:
+            sys.exit(f"Font {args.bold_font} not found.")
+
+    rng = random.Random(args.seed)
+    bullets = []
+    for _ in range(args.bullets):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 30))]
+        bullets.append((" ".join(words), rng.sample(words, min(2, len(words)))))
+
+    estimator = LineEstimator(
+        regular, bold, args.font_size, parse_dimension(args.text_width))
+    start = time.perf_counter()
+    lines = [estimator.count_lines(text, bold_words)
+             for text, bold_words in bullets]
+    first_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for text, bold_words in bullets:
+        estimator.count_lines(text, bold_words)
+    memo_seconds = time.perf_counter() - start
+
+    char_lines = [calculate_lines(text, layout.line_chars_lim)
+                  for text, _ in bullets]
+    differ = sum(a != b for a, b in zip(lines, char_lines))
+    print(f"{first_seconds / len(bullets) * 1e6:.1f} us per bullet, "
+          f"{memo_seconds / len(bullets) * 1e6:.2f} us per memoized bullet")
+    print(f"{sum(lines)} lines estimated from font metrics, {sum(char_lines)} by character count "
+          f"({differ}/{len(bullets)} bullets differ)")
+    for name, info in estimator.cache_info().items():
+        total = info.hits + info.misses
+        print(f"{name} cache: {info.hits} hits, {info.misses} misses "
+              f"({info.hits / total if total else 0:.0%} hit rate), {info.currsize}/{info.maxsize} entries")
+
+
+if __name__ == "__main__":
+    main()
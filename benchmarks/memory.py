@@ -0,0 +1,66 @@
+"""Benchmark for the memory used by the compiled resume items.
+
+Generates a data file, compiles it with the stub encoder, then measures the traced peak memory
+and the number of objects created when loading the bundle and when compiling the YAML in memory.
+
+Usage: python benchmarks/memory.py [--bullets N] [--dim D] [--seed SEED]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from datagen import StubEncoder, write_data_file
+from optimizer import SRC_DIR
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.compiled_data import compile_data, load_compiled_data
+from gencv.resumeitems import bullet_embedding_matrix, compile_yaml
+from gencv.utils import TextEncoder
+
+
+def measure(function) -> tuple[float, int]:
+    """Traced peak memory in MB and the number of objects still alive after calling a function."""
+    gc.collect()
+    objects = len(gc.get_objects())
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    created = len(gc.get_objects()) - objects
+    del result
+    return peak / 2 ** 20, created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bullets", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=1024,
+                        help="Dimensions of the stub embeddings, the real model has 1024.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    TextEncoder.set_model(StubEncoder(args.dim))
+    TextEncoder.set_cache(None)
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, "data.yaml")
+        write_data_file(data_file, args.bullets, args.seed)
+        compile_data(data_file)
+
+        for name, function in [
+            ("load_compiled_data", lambda: load_compiled_data(data_file)),
+            ("compile_yaml", lambda: compile_yaml(data_file)),
+            ("bullet_embedding_matrix", lambda: bullet_embedding_matrix(
+                load_compiled_data(data_file).experiences)),
+        ]:
+            peak, objects = measure(function)
+            print(f"{name:24} peak {peak:8.1f} MB  {objects:9} tracked objects")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark comparing the greedy and exact bullet selection.
+
+Generates random experiences with groups, min/max constraints and dependant bullets, then
+compares the solve time, total similarity and lines used by both selections on the real template.
+The greedy selection can overshoot the line budget or miss bullet minimums, the exact selection never does.
+
+Usage: python benchmarks/optimizer.py [--sizes N ...] [--seed SEED] [--time-limit SECONDS] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+# pylint: disable=wrong-import-position
+from gencv.latex_builder import TexResumeTemplate
+from gencv.optimizer import DEFAULT_TIME_LIMIT, SolverTimeoutError, InfeasibleError, solve
+from gencv.pipeline import DEFAULT_LINE_CHARS_LIM, DEFAULT_MAX_LINES
+from gencv.resumeitems import (
+    GroupData, PreProcessedBullet, ProcessedData, ResumeBulletItem, ResumeExperienceItem,
+    process_data, select_data)
+from gencv.utils import calculate_lines
+
+TEMPLATE_DIR = os.path.join(SRC_DIR, "..", "textemplates", "jakes_resume")
+DEFAULT_SIZES = [25, 50, 100, 200, 400]
+WORDS = ["built", "designed", "python", "latency", "pipeline", "team", "sensor", "model",
+         "reduced", "deployed", "firmware", "dashboard", "tested", "scaled", "api", "cloud"]
+
+
+def generate_bullets(
+        n_bullets: int,
+        rng: random.Random,
+        experience_types: tuple[str, ...] = ("job", "project"),
+        similarity_range: tuple[float, float] = (0.2, 0.9)) -> list[PreProcessedBullet]:
+    """Generate random experiences and score their bullets with random similarities."""
+    bullets: list[PreProcessedBullet] = []
+    n_experiences = max(2, n_bullets // 6)
+    for exp_i in range(n_experiences):
+        experience = ResumeExperienceItem(
+            id=f"exp{exp_i}",
+            experience_type=experience_types[exp_i % len(experience_types)],
+            max_bullets=rng.choice([None, 3, 4, 5]),
+            min_bullets=rng.choice([None, 1, 2]),
+            order_=exp_i)
+        n_exp_bullets = n_bullets // n_experiences + \
+            (exp_i < n_bullets % n_experiences)
+        for group_i in range((n_exp_bullets + 3) // 4):
+            group = GroupData(min=rng.choice([None, None, 1]),
+                              max=rng.choice([None, 2, 3]), order_=group_i)
+            group_bullets = []
+            while len(group_bullets) < min(4, n_exp_bullets - 4 * group_i):
+                text = " ".join(rng.choice(WORDS)
+                                for _ in range(rng.randint(4, 30)))
+                bullet = ResumeBulletItem(
+                    text, len(group_bullets), embed=False)
+                group_bullets.append(bullet)
+                # some bullets only make sense after the bullet before them
+                if len(group_bullets) > 1 and rng.random() < 0.2:
+                    group_bullets[-2].add_dependant(bullet)
+            for bullet in group_bullets:
+                bullets.append(PreProcessedBullet(
+                    experience, (bullet, group), rng.uniform(*similarity_range)))
+    return bullets
+
+
+def score(selected: list[ProcessedData], processed_data: list[ProcessedData]) -> tuple[float, int]:
+    """Total similarity and lines of a selection, each bullet is scored by its own similarity in processed_data."""
+    # dependencies added by the greedy selection carry the sorting data of their dependant
+    similarities = {id(d.bullet): 1 / d.sorting_data.bullet_similarity for d in processed_data}
+    similarity = sum(similarities[id(d.bullet)] for d in selected)
+    lines = sum(calculate_lines(d.bullet.text, DEFAULT_LINE_CHARS_LIM)
+                for d in selected)
+    return similarity, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Number of bullets in each generated data set.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    resume_template = TexResumeTemplate(TEMPLATE_DIR)
+    results = []
+    print(f"{'bullets':>8} {'greedy ms':>10} {'exact ms':>10} {'greedy sim':>11} {'exact sim':>10} {'greedy lines':>13} {'exact lines':>12}")
+    for size in args.sizes:
+        processed_data = process_data(
+            generate_bullets(size, random.Random(args.seed + size)))
+
+        start = time.perf_counter()
+        greedy = select_data(processed_data, resume_template,
+                             DEFAULT_MAX_LINES, DEFAULT_LINE_CHARS_LIM)
+        greedy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            exact = solve(processed_data, resume_template, DEFAULT_MAX_LINES,
+                          DEFAULT_LINE_CHARS_LIM, args.time_limit)
+            status = "ok"
+        except (SolverTimeoutError, InfeasibleError) as e:
+            exact, status = [], str(e)
+        exact_seconds = time.perf_counter() - start
+
+        greedy_similarity, greedy_lines = score(greedy, processed_data)
+        exact_similarity, exact_lines = score(exact, processed_data)
+        results.append({
+            "bullets": size,
+            "greedy_seconds": greedy_seconds,
+            "exact_seconds": exact_seconds,
+            "greedy_similarity": greedy_similarity,
+            "exact_similarity": exact_similarity,
+            "greedy_lines": greedy_lines,
+            "exact_lines": exact_lines,
+            "exact_status": status,
+        })
+        print(f"{size:8} {greedy_seconds * 1000:10.1f} {exact_seconds * 1000:10.1f} {greedy_similarity:11.3f} "
+              f"{exact_similarity:10.3f} {greedy_lines:13} {exact_lines:12}"
+              + ("" if status == "ok" else f"  exact failed: {status}"))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Benchmark for the compact embedding precision modes.
+
+Compiles a generated data file, then for every precision mode reports the memory of the scoring
+matrix, the scoring latency and how well the scores and the selected bullets agree with float32.
+Queries are near a few random bullets so each query has some clearly relevant bullets like a real one.
+
+The stub embeddings are weighted so their leading dimensions carry most of the signal like the
+model's Matryoshka trained dimensions, but the numbers are only indicative. Use --encoder model
+for real numbers.
+
+Usage: python benchmarks/precision.py [--bullets N] [--dim D] [--queries N] [--rescore-top-k K] [--encoder stub|model] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from datagen import StubEncoder, write_data_file
+from optimizer import SRC_DIR, TEMPLATE_DIR
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.compiled_data import compile_data, load_compiled_data
+from gencv.latex_builder import TexResumeTemplate
+from gencv.pipeline import select_resume_data
+from gencv.precision import CompactEmbeddings
+from gencv.utils import TextEncoder
+
+# (precision, dims)
+MODES = [("float32", None), ("float16", None), ("int8", None),
+         ("float32", 512), ("float32", 256), ("int8", 256)]
+TOP_K = 20
+
+
+class QueryEncoder(StubEncoder):
+    """Stub encoder with decaying dimension weights that embeds the benchmark queries as given vectors."""
+
+    def __init__(self, dim: int) -> None:
+        super().__init__(dim)
+        self.weights = (1 / np.sqrt(1 + np.arange(dim) / 32)).astype(np.float32)
+        self.queries: dict[str, np.ndarray] = {}
+
+    def embed_one(self, text: str) -> np.ndarray:
+        if text in self.queries:
+            return self.queries[text]
+        return TextEncoder.normalize(super().embed_one(text) * self.weights)
+
+
+def make_queries(embeddings: np.ndarray, n_queries: int, rng: np.random.Generator) -> list[np.ndarray]:
+    """Query vectors near the mean of a few random bullets."""
+    queries = []
+    for _ in range(n_queries):
+        rows = rng.choice(len(embeddings), size=3, replace=False)
+        vector = TextEncoder.normalize(embeddings[rows]).mean(axis=0)
+        noise = rng.standard_normal(embeddings.shape[1]).astype(np.float32)
+        noise *= np.abs(embeddings).mean(axis=0)
+        queries.append(TextEncoder.normalize(
+            vector / np.linalg.norm(vector) + 0.5 * noise / np.linalg.norm(noise)))
+    return queries
+
+
+def selected_texts(experiences, scoring, resume_template: TexResumeTemplate, query: str) -> set[str]:
+    """Texts of the bullets selected for a query."""
+    return {d.bullet.text for d in select_resume_data(experiences, scoring, resume_template, query)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bullets", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1024,
+                        help="Dimensions of the stub embeddings, the real model has 1024.")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--rescore-top-k", type=int, default=50)
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    encoder = QueryEncoder(args.dim)
+    if args.encoder == "stub":
+        TextEncoder.set_model(encoder)
+    TextEncoder.set_cache(None)
+    TexResumeTemplate.set_cache_dir(None)
+    resume_template = TexResumeTemplate(TEMPLATE_DIR)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, "data.yaml")
+        write_data_file(data_file, args.bullets, args.seed)
+        compile_data(data_file)
+        experiences, embeddings = load_compiled_data(data_file)
+        embeddings = np.asarray(embeddings)
+
+    if args.encoder == "stub":
+        query_vectors = make_queries(
+            embeddings, args.queries, np.random.default_rng(args.seed))
+        queries = [f"query {i}" for i in range(args.queries)]
+        encoder.queries = {TextEncoder.INSTRUCTION + query: vector
+                           for query, vector in zip(queries, query_vectors)}
+    else:
+        rng = random.Random(args.seed)
+        texts = [bullet.text for exp in experiences for bullet, _ in exp.bullets]
+        queries = [" ".join(rng.sample(texts, 3)) for _ in range(args.queries)]
+        query_vectors = [TextEncoder.embed(query).numpy() for query in queries]
+
+    reference = CompactEmbeddings.from_embeddings(embeddings)
+    reference_scores = [reference.similarities(vector) for vector in query_vectors]
+    reference_top = [set(np.argsort(-scores)[:TOP_K]) for scores in reference_scores]
+    reference_selected = [selected_texts(experiences, reference, resume_template, query)
+                          for query in queries]
+
+    results = []
+    print(f"{'mode':>14} {'rescore':>8} {'MB':>8} {'score ms':>9} {'vs f32':>7} {'top-20':>7} {'selected':>9}")
+    for precision, dims in MODES:
+        for rescore_top_k in ([0, args.rescore_top_k] if (precision, dims) != ("float32", None) else [0]):
+            scoring = CompactEmbeddings.from_embeddings(
+                embeddings, precision, dims, rescore_top_k)
+            latencies = []
+            top_recall = []
+            for vector, top in zip(query_vectors, reference_top):
+                start = time.perf_counter()
+                scores = scoring.similarities(vector)
+                latencies.append(time.perf_counter() - start)
+                top_recall.append(
+                    len(top & set(np.argsort(-scores)[:TOP_K])) / TOP_K)
+            agreement = []
+            for query, selected in zip(queries, reference_selected):
+                other = selected_texts(
+                    experiences, scoring, resume_template, query)
+                agreement.append(len(selected & other) /
+                                 max(len(selected | other), 1))
+            score_ms = float(np.median(latencies)) * 1000
+            result = {
+                "precision": precision,
+                "dims": dims or embeddings.shape[1],
+                "rescore_top_k": rescore_top_k,
+                "megabytes": scoring.nbytes / 2 ** 20,
+                "score_ms": score_ms,
+                # smaller modes save memory but aren't always faster to score, float32 is the first mode
+                "score_ms_vs_float32": score_ms / results[0]["score_ms"] if results else 1.0,
+                "top_k_recall": float(np.mean(top_recall)),
+                "selection_jaccard": float(np.mean(agreement)),
+            }
+            results.append(result)
+            mode = f"{precision}/{result['dims']}"
+            print(f"{mode:>14} {rescore_top_k:8} {result['megabytes']:8.1f} {result['score_ms']:9.2f} "
+                  f"{result['score_ms_vs_float32']:6.2f}x {result['top_k_recall']:7.3f} {result['selection_jaccard']:9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"bullets": args.bullets, "encoder": args.encoder, "queries": args.queries,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
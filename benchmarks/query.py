@@ -0,0 +1,151 @@
+"""Benchmark comparing the local query mode to the LLM query mode.
+
+Creates the query and keywords of each job description with the local skills and key phrase
+extractor and with the LLM, and reports how long each mode takes and the Jaccard overlap of the
+bullets selected with the local query and the LLM query. LLM responses aren't cached, and the LLM
+mode is skipped if ollama isn't running. The stub encoder gives random query embeddings, so the
+overlap of dense scoring is only meaningful with --encoder model, hybrid and lexical scoring
+overlap through the keywords either way.
+
+Usage: python benchmarks/query.py [--descriptions PATH] [--datafile PATH] [--bullets N] [--encoder stub|model] [--scoring dense|hybrid|lexical] [--repeat N] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from datagen import StubEncoder, write_data_file
+from optimizer import SRC_DIR, TEMPLATE_DIR
+from suite import timed
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv import description_summerizer
+from gencv.batch import BatchJob, load_jobs
+from gencv.compiled_data import load_compact_embeddings, load_lexical_index, load_or_compile
+from gencv.latex_builder import TexResumeTemplate
+from gencv.lexical import LexicalQuery
+from gencv.pipeline import score_resume_data, select_processed_data
+from gencv.utils import TextEncoder
+
+DESCRIPTIONS = [
+    BatchJob(name="backend", description="""
+        We are looking for a Backend Software Engineer to build the services behind our data platform.
+        Requirements: 3+ years of experience with Python or Go, REST API design and PostgreSQL.
+        Experience with Docker, Kubernetes and AWS. Familiarity with Kafka and distributed systems is a plus.
+        Strong communication skills and the ability to work on a cross-functional team.
+        """),
+    BatchJob(name="ml", description="""
+        Machine Learning Engineer Intern
+        - Train and evaluate deep learning models with PyTorch or TensorFlow
+        - Build data pipelines with pandas, SQL and Spark
+        - Deploy models with Docker and CI/CD
+        Qualifications: coursework in statistics, linear algebra and machine learning, experience with
+        computer vision or natural language processing, excellent problem solving skills.
+        """),
+    BatchJob(name="process", description="""
+        Required Knowledge, Skills and Abilities
+        Basic knowledge of AUTOCAD or comparable program
+        Familiarity with all Microsoft Office tools
+        Basic understanding of chemical process equipment (pumps, valves, motors, & controls)
+        Passion for safety
+        Drive to improve
+        Willingness to learn
+        Final presentation of Intern activities & learnings
+        """),
+    BatchJob(name="embedded", description="""
+        Embedded Firmware Developer. You will write C and C++ firmware for ARM microcontrollers running
+        an RTOS, bring up new PCB designs, debug hardware with oscilloscopes and logic analyzers, and
+        write Python test automation. Knowledge of motor control, signal processing and CAN is an asset.
+        """),
+]
+
+
+def summerize(description: str, mode: str) -> tuple[str, list[str]]:
+    """Create the query and keywords of a description in a query mode."""
+    description_summerizer.set_query_mode(mode)
+    return description_summerizer.gen_resume_query(description), description_summerizer.extract_keywords(description)
+
+
+def select_bullets(data_file: str, query: str, keywords: list[str], scoring: str, resume_template: TexResumeTemplate) -> set[tuple[str, str]]:
+    """Experience ids and texts of the bullets selected for a query."""
+    experiences, embeddings = load_or_compile(data_file)
+    compact = load_compact_embeddings(data_file, embeddings)
+    lexical = None if scoring == "dense" else LexicalQuery(load_lexical_index(data_file), keywords, scoring)
+    processed = score_resume_data(experiences, compact, query, lexical)
+    return {(d.experience.id, d.bullet.text) for d in select_processed_data(processed, resume_template)}
+
+
+def jaccard(a: set, b: set) -> float:
+    """Size of the intersection over the size of the union, 1 if both are empty."""
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--descriptions",
+                        help="JSONL file or folder of job descriptions, defaults to the built in samples.")
+    parser.add_argument("--datafile", help="Data file to select bullets from, defaults to a generated one.")
+    parser.add_argument("--bullets", type=int, default=1_000, help="Bullets in the generated data file.")
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub")
+    parser.add_argument("--dim", type=int, default=1024,
+                        help="Dimensions of the stub embeddings, the real model has 1024.")
+    parser.add_argument("--scoring", choices=["dense", "hybrid", "lexical"], default="hybrid")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of the local mode, the fastest is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.descriptions) if args.descriptions else DESCRIPTIONS
+    if args.encoder == "stub":
+        TextEncoder.set_model(StubEncoder(args.dim))
+    TextEncoder.set_cache(None)
+    description_summerizer.set_cache(None)
+    resume_template = TexResumeTemplate(TEMPLATE_DIR)
+
+    results = []
+    llm_available = True
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = args.datafile
+        if data_file is None:
+            data_file = os.path.join(work_dir, "data.yaml")
+            write_data_file(data_file, args.bullets, args.seed)
+        load_or_compile(data_file)
+        if args.encoder == "stub" and args.scoring == "dense":
+            print("The overlap of dense scoring with the stub encoder is random, use --encoder model.")
+
+        print(f"{'job':>16} {'local ms':>9} {'llm ms':>9} {'overlap':>8}")
+        for job in jobs:
+            local_seconds, (local_query, local_keywords) = timed(
+                lambda job=job: summerize(job.description, "local"), args.repeat)
+            result = {"name": job.name, "local_seconds": local_seconds,
+                      "local_query": local_query, "local_keywords": local_keywords}
+            local_selected = select_bullets(data_file, local_query, local_keywords, args.scoring, resume_template)
+
+            if llm_available:
+                start = time.perf_counter()
+                try:
+                    llm_query, llm_keywords = summerize(job.description, "llm")
+                    llm_seconds = time.perf_counter() - start
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"Skipping the LLM mode, {e}")
+                    llm_available = False
+                else:
+                    llm_selected = select_bullets(data_file, llm_query, llm_keywords, args.scoring, resume_template)
+                    result.update({"llm_seconds": llm_seconds, "llm_query": llm_query,
+                                   "llm_keywords": llm_keywords, "overlap": jaccard(local_selected, llm_selected)})
+            results.append(result)
+            llm_ms = f"{result['llm_seconds'] * 1000:9.1f}" if "llm_seconds" in result else f"{'-':>9}"
+            overlap = f"{result['overlap']:8.2f}" if "overlap" in result else f"{'-':>8}"
+            print(f"{job.name:>16} {local_seconds * 1000:9.2f} {llm_ms} {overlap}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"encoder": args.encoder, "scoring": args.scoring, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Differential check and benchmark for the greedy bullet selection.
+
+Runs the indexed select_data and the original exception based implementation on random data sets
+with different line budgets, fails if they ever select different bullets, and reports the speedup.
+The differential cases also run with pytest in tests/test_selection.py.
+
+Usage: python benchmarks/selection.py [--sizes N ...] [--cases N] [--seed SEED]
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+
+from optimizer import SRC_DIR, TEMPLATE_DIR, generate_bullets
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.latex_builder import TexResumeTemplate
+from gencv.pipeline import DEFAULT_LINE_CHARS_LIM, DEFAULT_MAX_LINES
+from gencv.resumeitems import (
+    BreaksConstraintError, GroupData, ProcessedData, ResumeExperienceItem,
+    log_processed_data, process_data, select_data)
+from gencv.utils import calculate_lines
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 50_000]
+DEFAULT_CASES = 200
+
+
+def reference_select_data(processed_datas: list[ProcessedData], resume_template: TexResumeTemplate, max_lines, line_char_lim) -> list[ProcessedData]:
+    """The selection engine before it was indexed, kept verbatim as the reference for the differential check."""
+    logging.debug(
+        f"selecting data {processed_datas}, {resume_template}, {max_lines}, {line_char_lim}")
+    selected_datas: list[ProcessedData] = []
+    selected_datas_set: set[str] = set()
+    experience_bullet_selection_counter = {
+        d.experience.id: 0 for d in processed_datas}
+    group_bullet_selection_counter = {d.group.id: 0 for d in processed_datas}
+    total_lines_counter = 0
+    total_experience_type_selection_counter = {
+        d[0].placetype: set() for d in resume_template.args}
+    selected_experience_ids = set()
+
+    # select most similar experience according to amount of experience per type outlined in templates
+    for d in sorted(processed_datas, key=lambda x: (x.sorting_data.experience_similarity, x.sorting_data.experience_id)):
+        if d.experience.experience_type not in total_experience_type_selection_counter:
+            continue
+        elif len(total_experience_type_selection_counter[d.experience.experience_type]) < resume_template.get_experience_args(d.experience.experience_type).n:
+            total_experience_type_selection_counter[d.experience.experience_type].add(
+                d.experience.id)
+            selected_experience_ids.add(d.experience.id)
+
+    # sort by only bullet similarity so best bullets are taken
+    similarity_sorted_data = sorted(
+        processed_datas, key=lambda x: x.sorting_data.bullet_similarity)
+
+    logging.debug("Sorted data:")
+    for d in similarity_sorted_data if logging.getLogger().getEffectiveLevel() <= logging.DEBUG else []:
+        log_processed_data(d)
+
+    def check_experience_selected(experience: ResumeExperienceItem):
+        "Raises error if the type does not exist in the template or if the max amount of experience for that type has been reached."
+        if experience.id not in selected_experience_ids:
+            raise BreaksConstraintError(
+                f"Experience: {experience.id} has not been selected."
+            )
+
+    def check_experience_max(experience: ResumeExperienceItem):
+        """Raises error if experience bullet max is met."""
+        if experience.max_bullets is None:
+            return
+        if experience_bullet_selection_counter[experience.id] >= experience.max_bullets:
+            raise BreaksConstraintError(
+                f"{experience.id} experience type max bullets reached.")
+
+    def check_experience_min(experience: ResumeExperienceItem):
+        """Raises error if experience bullet min is not met."""
+        if experience.min_bullets is None:
+            return
+        if experience_bullet_selection_counter[experience.id] < experience.min_bullets:
+            raise BreaksConstraintError(
+                f"{experience.id} experience type min bullets not met.")
+
+    def check_group_max(group: GroupData):
+        """Raises error if group bullet max is met."""
+        if group.max is None:
+            return
+        if group_bullet_selection_counter[group.id] >= group.max:
+            raise BreaksConstraintError(
+                f"{group} max bullets reached.")
+
+    def check_group_min(group: GroupData):
+        """Raises error if group bullet min is not met."""
+        if group.min is None:
+            return
+        if group_bullet_selection_counter[group.id] < group.min:
+            raise BreaksConstraintError(
+                f"{group} min bullets not reached.")
+
+    def check_lines_max():
+        """Raises error if max lines is met."""
+        if total_lines_counter >= max_lines:
+            raise BreaksConstraintError("Max lines is met.")
+
+    def add_data_to_selection(data: ProcessedData):
+        nonlocal total_lines_counter
+        if data.bullet.dependency is not None:
+            add_data_to_selection(ProcessedData(
+                data.experience, data.bullet.dependency, data.group, data.sorting_data))
+        if data.bullet.text not in selected_datas_set:
+            selected_datas.append(data)
+            selected_datas_set.add(data.bullet.text)
+            total_lines_counter += calculate_lines(
+                data.bullet.text, line_char_lim)
+            experience_bullet_selection_counter[data.experience.id] += 1
+            group_bullet_selection_counter[data.group.id] += 1
+            total_experience_type_selection_counter[data.experience.experience_type].add(
+                data.experience.id)
+
+    # loop through data in order and make sure conditions are not broken
+    # first satisfy min requirement for experiences
+    logging.debug("\nSatisfying min requirements for experiences: ")
+    for data in similarity_sorted_data:
+        log_processed_data(data)
+        try:
+            # could but max lines in a seperate try except cause this function can just return of max lines raises an error. but not really worth it for the perforance boost.
+            check_lines_max()
+            check_experience_selected(data.experience)
+            check_experience_max(data.experience)
+            check_group_max(data.group)
+        except BreaksConstraintError as e:
+            logging.debug(
+                f"For the above bullet the following exception occured: {e} \nNOT ADDING BULLET.")
+            continue
+        try:
+            check_experience_min(data.experience)
+        except BreaksConstraintError as e:
+            logging.debug(
+                f"For the above bullet the following exception occured: {e} \nADDING BULLET.")
+            add_data_to_selection(data)
+            continue
+        logging.debug("No exception occured, NOT ADDING BULLET.")
+
+    # second satisfy min requirement for group
+    logging.debug("\nSatisfying min requirements for groups: ")
+    for data in similarity_sorted_data:
+        log_processed_data(data)
+        try:
+            check_lines_max()
+            check_experience_selected(data.experience)
+            check_experience_max(data.experience)
+            check_group_max(data.group)
+        except BreaksConstraintError as e:
+            logging.debug(
+                f"For the above bullet the following exception occured: {e} \nNOT ADDING BULLET.")
+            continue
+        try:
+            check_group_min(data.group)
+        except BreaksConstraintError as e:
+            logging.debug(
+                f"For the above bullet the following exception occured: {e} \nADDING BULLET.")
+            add_data_to_selection(data)
+            continue
+        logging.debug("No exception occured, NOT ADDING BULLET.")
+
+    # last keep adding bullets until a constraint is met (probably max lines)
+    logging.debug("\nSatisfying min requirements for experiences: ")
+    for data in similarity_sorted_data:
+        log_processed_data(data)
+        try:
+            check_lines_max()
+            check_experience_selected(data.experience)
+            check_experience_max(data.experience)
+            check_group_max(data.group)
+        except BreaksConstraintError as e:
+            logging.debug(
+                f"For the above bullet the following exception occured: {e} \nNOT ADDING BULLET.")
+            continue
+        logging.debug(
+            f"ADDING BULLET.")
+        add_data_to_selection(data)
+
+    return selected_datas
+
+
+def selection_key(selected: list[ProcessedData]) -> list[tuple]:
+    """Comparable form of a selection, the order bullets were added in matters."""
+    return [(d.experience.id, d.bullet.text, d.group.id, d.sorting_data) for d in selected]
+
+
+def check(cases: int, seed: int, resume_template: TexResumeTemplate) -> int:
+    """Compare both implementations on small random cases, returns the number of mismatches."""
+    mismatches = 0
+    for case in range(cases):
+        rng = random.Random(seed + case)
+        # include an experience type that isn't in the template and negative similarities
+        processed_data = process_data(generate_bullets(
+            rng.randint(1, 80), rng, ("job", "project", "award"), (-0.3, 0.9)))
+        max_lines = rng.randint(0, 60)
+        line_char_lim = rng.choice([40, 80, DEFAULT_LINE_CHARS_LIM])
+        expected = reference_select_data(
+            processed_data, resume_template, max_lines, line_char_lim)
+        actual = select_data(processed_data, resume_template,
+                             max_lines, line_char_lim)
+        if selection_key(expected) != selection_key(actual):
+            mismatches += 1
+            print(f"MISMATCH case {case}: max_lines={max_lines} line_char_lim={line_char_lim}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Number of bullets in each benchmarked data set.")
+    parser.add_argument("--cases", type=int, default=DEFAULT_CASES,
+                        help="Number of random differential cases.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # the reference implementation formats debug messages even when they aren't shown
+    logging.getLogger().setLevel(logging.INFO)
+
+    resume_template = TexResumeTemplate(TEMPLATE_DIR)
+    mismatches = check(args.cases, args.seed, resume_template)
+    print(f"{args.cases - mismatches}/{args.cases} differential cases match.")
+
+    print(f"{'bullets':>8} {'reference ms':>13} {'indexed ms':>11} {'speedup':>8}")
+    for size in args.sizes:
+        processed_data = process_data(
+            generate_bullets(size, random.Random(args.seed + size)))
+        timings = []
+        for select in (reference_select_data, select_data):
+            start = time.perf_counter()
+            selected = select(processed_data, resume_template,
+                              DEFAULT_MAX_LINES, DEFAULT_LINE_CHARS_LIM)
+            timings.append(time.perf_counter() - start)
+            if select is reference_select_data:
+                expected = selected
+        if selection_key(expected) != selection_key(selected):
+            mismatches += 1
+            print(f"MISMATCH benchmark with {size} bullets")
+        print(f"{size:8} {timings[0] * 1000:13.1f} {timings[1] * 1000:11.1f} {timings[0] / timings[1]:7.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark for cli startup time.
+
+Runs cli commands that don't need to embed anything and fails if any of them take
+longer than the time budget on average, or if they import a heavy dependency.
+
+Usage: python benchmarks/startup.py [--budget SECONDS] [--repeat N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+CLI = os.path.join(SRC_DIR, "cli.py")
+
+DEFAULT_BUDGET = 1.0
+DEFAULT_REPEAT = 5
+
+# commands that should never load the embedding model or the llm client
+COMMANDS = [
+    ["--help"],
+    ["mkres", "--help"],
+]
+
+HEAVY_MODULES = ["torch", "sentence_transformers",
+                 "transformers", "ollama", "pylatexenc"]
+
+
+def time_command(args: list[str], repeat: int) -> float:
+    """Average wall time of running the cli with the given arguments."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI, *args],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return sum(times) / len(times)
+
+
+def imported_heavy_modules() -> list[str]:
+    """Heavy modules imported by just importing the cli."""
+    script = (
+        "import sys, cli\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=SRC_DIR,
+                            stdout=subprocess.PIPE, check=True, text=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="Max average seconds per command.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+
+    failed = False
+    heavy = imported_heavy_modules()
+    if heavy:
+        print(f"FAIL importing cli loads heavy modules: {', '.join(heavy)}")
+        failed = True
+
+    for command in COMMANDS:
+        elapsed = time_command(command, args.repeat)
+        status = "ok" if elapsed <= args.budget else "FAIL"
+        failed = failed or elapsed > args.budget
+        print(f"{status:4} gencv {' '.join(command):20} {elapsed * 1000:8.1f} ms (budget {args.budget * 1000:.0f} ms)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Benchmark suite timing every stage of tailoring a resume on generated data files.
+
+For each size a data file is generated with datagen.py, then the stages from loading the YAML
+to writing the filled template are timed. Embeddings come from the deterministic stub encoder
+unless --encoder model is given, so the other stages are timed without the model and the
+embedding stages measure the pipeline overhead around the encoder. Results are written as JSON
+so scaling curves can be compared between commits.
+
+Usage: python benchmarks/suite.py [--sizes N ...] [--seed SEED] [--encoder stub|model] [--dim D] [--repeat N] [--exact] [--pdf] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from datagen import StubEncoder, write_data_file
+from optimizer import SRC_DIR, TEMPLATE_DIR
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.compiled_data import compile_data, load_compiled_data
+from gencv.latex_builder import TexResumeTemplate
+from gencv.optimizer import DEFAULT_TIME_LIMIT, select_data_exact
+from gencv.pipeline import to_template_data
+from gencv.resumeitems import compile_yaml, preprocess_bullets, process_data, select_data
+from gencv.utils import TextEncoder, load_yaml
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+QUERY = "python machine learning engineer with robotics and sql experience"
+
+
+def timed(function, repeat: int):
+    """Call a function `repeat` times, returns the fastest time in seconds and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def git_commit() -> str:
+    """Commit the benchmark is run on, None outside of a git checkout."""
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=False)
+    return result.stdout.strip() or None
+
+
+def run_size(size: int, args, work_dir: str, resume_template: TexResumeTemplate) -> dict:
+    """Time every stage on a generated data file with `size` bullets."""
+    data_file = os.path.join(work_dir, f"data{size}.yaml")
+    write_data_file(data_file, size, args.seed)
+    stages: dict[str, float] = {}
+
+    stages["load_yaml"], experiences = timed(
+        lambda: load_yaml(data_file), args.repeat)
+    texts = [point.text for experience in experiences for group in experience.groups
+             for point in group.points] + [dependant.text for experience in experiences
+                                          for group in experience.groups for point in group.points
+                                          for dependant in point.dependants]
+    stages["embed_batch"], _ = timed(
+        lambda: TextEncoder.embed_batch(texts), args.repeat)
+    stages["compile_yaml"], _ = timed(
+        lambda: compile_yaml(data_file), args.repeat)
+    stages["compile_data"], _ = timed(
+        lambda: compile_data(data_file, force=True), args.repeat)
+    # nothing changed so every embedding is reused from the bundle
+    stages["recompile_data"], _ = timed(
+        lambda: compile_data(data_file), args.repeat)
+    stages["load_compiled_data"], (data, embeddings) = timed(
+        lambda: load_compiled_data(data_file), args.repeat)
+
+    normalized_embeddings = TextEncoder.normalize(embeddings)
+    stages["preprocess_bullets"], bullets = timed(
+        lambda: preprocess_bullets(data, QUERY, embedding_matrix=normalized_embeddings), args.repeat)
+    stages["process_data"], processed_data = timed(
+        lambda: process_data(bullets), args.repeat)
+    layout = resume_template.layout
+    count_lines = resume_template.get_line_counter()
+    stages["select_data"], selected_data = timed(
+        lambda: select_data(processed_data, resume_template, layout.max_lines, layout.line_chars_lim,
+                            count_lines), args.repeat)
+    if args.exact:
+        stages["select_data_exact"], _ = timed(
+            lambda: select_data_exact(processed_data, resume_template, layout.max_lines, layout.line_chars_lim,
+                                      DEFAULT_TIME_LIMIT, count_lines), args.repeat)
+    template_data = to_template_data(selected_data)
+    stages["fill"], latex = timed(
+        lambda: resume_template.fill(template_data), args.repeat)
+
+    output_dir = os.path.join(work_dir, "out")
+    stages["to_file_tex"], _ = timed(lambda: TexResumeTemplate.to_file(
+        output_dir, "resume", latex, output_name="resume", output="tex"), args.repeat)
+    if args.pdf:
+        stages["to_file_pdf"], _ = timed(lambda: TexResumeTemplate.to_file(
+            output_dir, "resume", latex, output_name="resume", output="all"), args.repeat)
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {"bullets": size, "experiences": len(experiences), "selected_bullets": len(selected_data),
+            "stages": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Number of bullets in each generated data file.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub",
+                        help="Embed with the deterministic stub or the real embedding model.")
+    parser.add_argument("--dim", type=int, default=256,
+                        help="Dimensions of the stub embeddings.")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Run each stage this many times and keep the fastest.")
+    parser.add_argument("--exact", action="store_true",
+                        help="Also time the exact optimizer.")
+    parser.add_argument("--pdf", action="store_true",
+                        help="Also time building the PDF, needs pdflatex.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if args.encoder == "stub":
+        TextEncoder.set_model(StubEncoder(args.dim))
+    # every stage should do its full work instead of hitting the persistent caches
+    TextEncoder.set_cache(None)
+    TexResumeTemplate.set_cache_dir(None)
+    resume_template = TexResumeTemplate(TEMPLATE_DIR)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            result = run_size(size, args, work_dir, resume_template)
+            results.append(result)
+            print(f"{size} bullets, {result['experiences']} experiences:")
+            for stage, seconds in result["stages"].items():
+                print(f"  {stage:20} {seconds * 1000:10.2f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "encoder": args.encoder,
+                "dim": args.dim if args.encoder == "stub" else None,
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
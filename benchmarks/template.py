@@ -0,0 +1,53 @@
+"""Benchmark for loading and filling resume templates.
+
+Times parsing textemplates/jakes_resume cold, loading it from the parsed template cache, and filling it.
+
+Usage: python benchmarks/template.py [--repeat N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+
+from latexformat import sample_experiences
+from optimizer import SRC_DIR, TEMPLATE_DIR
+
+# pylint: disable=wrong-import-position
+sys.path.insert(0, SRC_DIR)
+from gencv.latex_builder import TexResumeTemplate
+
+DEFAULT_REPEAT = 200
+
+
+def average_ms(function, repeat: int) -> float:
+    """Average milliseconds of calling a function."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+
+    experiences = sample_experiences()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        TexResumeTemplate.set_cache_dir(None)
+        cold = average_ms(lambda: TexResumeTemplate(TEMPLATE_DIR), args.repeat)
+        TexResumeTemplate.set_cache_dir(cache_dir)
+        TexResumeTemplate(TEMPLATE_DIR)
+        warm = average_ms(lambda: TexResumeTemplate(TEMPLATE_DIR), args.repeat)
+        resume_template = TexResumeTemplate(TEMPLATE_DIR)
+        fill = average_ms(
+            lambda: resume_template.fill(experiences), args.repeat)
+
+    print(f"parse template:       {cold:8.3f} ms")
+    print(f"load cached template: {warm:8.3f} ms")
+    print(f"fill template:        {fill:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
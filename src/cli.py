@@ -5,11 +5,9 @@ from typing import Literal, Optional
 from dataclasses import dataclass
 from pydantic import BaseModel
 import typer
-from gencv.resumeitems import (
-    ResumeBulletItem, ResumeExperienceItem,
-    select_data, compile_yaml, preprocess_bullets, process_data)
-from gencv.latex_builder import TexResumeTemplate, ExperienceData, BulletData
-from gencv.description_summerizer import gen_resume_query
+
+# heavy dependencies (torch, sentence transformers, ollama, pylatexenc) are imported
+# inside the commands that need them so the cli starts quickly
 
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -25,28 +23,85 @@ class Config(BaseModel):
     verbose: Optional[bool] = False
     output: Optional[Literal["pdf", "tex", "all"]] = "pdf"
     proxy_dir: Optional[str] = os.path.expanduser("~/.gencv/proxy")
-
-
-with open(os.path.expanduser("~/.gencvrc"), 'r', encoding='utf-8') as file:
-    config_dict = {}
-    for line in file:
-        # Remove whitespace and newline characters
-        line = line.strip()
-        # Skip empty lines or comment lines (if any)
-        if not line or line.startswith("#"):
-            continue
-        # Split by '=' to separate the key and value
-        key, value = line.split('=', 1)
-        # Store in the dictionary
-        config_dict[key.strip()] = value.strip()
-
-    config = Config(**config_dict)
+    cache_dir: Optional[str] = os.path.expanduser("~/.gencv/cache")
+    # torch runs the model with sentence transformers, onnx exports it to ONNX Runtime which is faster on cpu
+    embedding_backend: Optional[Literal["torch", "onnx"]] = "torch"
+    # None is mxbai-embed-large-v1, small is a faster 384 dimensional model, any sentence transformers model works
+    embedding_model: Optional[str] = None
+    # quantize the model weights to int8
+    embedding_quantize: Optional[bool] = False
+    # None lets the backend use every core
+    embedding_threads: Optional[int] = None
+    # None uses the defaults defined on EmbeddingCache and TextEncoder
+    embedding_cache_size: Optional[int] = None
+    embedding_batch_size: Optional[int] = None
+    # precision bullet embeddings are scored at, float16 and int8 use less memory, float16 scores about 2x slower than float32
+    embedding_precision: Optional[Literal["float32", "float16", "int8"]] = "float32"
+    # truncate embeddings to their first dimensions for scoring, e.g. 512 or 256, None keeps all of them
+    embedding_dims: Optional[int] = None
+    # rescore this many of the best bullets with the full precision embeddings, 0 disables rescoring
+    rescore_top_k: Optional[int] = 0
+    # dense scores bullets by embedding, lexical by BM25 over the description keywords without the encoder,
+    # hybrid fuses both
+    scoring: Optional[Literal["dense", "hybrid", "lexical"]] = "dense"
+    # None uses the default defined in the lexical module
+    lexical_weight: Optional[float] = None
+    # only score and select the bullets with the best BM25 scores, 0 keeps every bullet
+    prefilter_top_n: Optional[int] = 0
+    # None uses the defaults defined on ResponseCache
+    llm_cache_size: Optional[int] = None
+    llm_cache_ttl_days: Optional[float] = None
+    # llm summerizes descriptions into queries with the LLM, local extracts skills and key phrases without it
+    query_mode: Optional[Literal["llm", "local"]] = "llm"
+    # None uses the OLLAMA_HOST environment variable or the ollama default
+    ollama_host: Optional[str] = None
+    # None uses the defaults defined on AsyncSummerizer
+    llm_concurrency: Optional[int] = None
+    llm_timeout: Optional[float] = None
+    llm_retries: Optional[int] = None
+    # greedy is fast, exact solves the selection optimally and falls back to greedy after the time limit
+    optimizer: Optional[Literal["greedy", "exact"]] = "greedy"
+    # None uses the default defined in the optimizer module
+    optimizer_time_limit: Optional[float] = None
+    # start pdf builds from a cached format of the template preamble
+    latex_format: Optional[bool] = True
+    synctex: Optional[bool] = True
+    # reuse PDFs built from the same latex, None uses the size limit defined on BuildCache
+    build_cache: Optional[bool] = True
+    build_cache_size_mb: Optional[float] = None
+    # hard link cached PDFs to the output path instead of copying them
+    build_cache_link: Optional[bool] = True
+    server_host: Optional[str] = "127.0.0.1"
+    server_port: Optional[int] = 8765
+
+
+def load_config(path: str = "~/.gencvrc") -> Config:
+    """Load the config file, uses the default config if the file does not exist."""
+    path = os.path.expanduser(path)
+    if not os.path.exists(path):
+        return Config()
+
+    with open(path, 'r', encoding='utf-8') as file:
+        config_dict = {}
+        for line in file:
+            # Remove whitespace and newline characters
+            line = line.strip()
+            # Skip empty lines or comment lines (if any)
+            if not line or line.startswith("#"):
+                continue
+            # Split by '=' to separate the key and value
+            key, value = line.split('=', 1)
+            # Store in the dictionary
+            config_dict[key.strip()] = value.strip()
+
+    return Config(**config_dict)
 
 
 @dataclass(frozen=False)
 class State:
     """Holds program state."""
-    verbose: bool = config.verbose
+    verbose: bool = False
+    config: Config = None
 
 
 state = State()
@@ -59,12 +114,164 @@ def main(
     """
     Global options for the CLI.
     """
-    state.verbose = verbose
+    state.config = load_config()
+    state.verbose = verbose or state.config.verbose
+
+
+def setup_encoder():
+    """Configure the text encoder's backend and model from the config."""
+    from gencv.utils import TextEncoder
+
+    config = state.config
+    TextEncoder.configure(
+        config.embedding_backend, config.embedding_model, quantize=config.embedding_quantize,
+        threads=config.embedding_threads, export_dir=os.path.join(config.cache_dir, "onnx"))
 
 
-def compile_data():
-    '''Compile data file to make sure it's formated properly.'''
-    ...
+def setup_embedding_cache():
+    """Configure the text encoder, create the persistent embedding cache from the config and give it to the encoder."""
+    from gencv.utils import TextEncoder
+    from gencv.cache import EmbeddingCache
+
+    config = state.config
+    # cached embeddings are keyed by the encoder's backend and model
+    setup_encoder()
+    embedding_cache = EmbeddingCache(
+        config.cache_dir, max_entries=config.embedding_cache_size or EmbeddingCache.DEFAULT_MAX_ENTRIES)
+    TextEncoder.set_cache(embedding_cache)
+    return embedding_cache
+
+
+def setup_llm_cache(enabled: bool = True):
+    """Create the persistent LLM response cache from the config and give it to the description summerizer."""
+    from gencv import description_summerizer
+    from gencv.cache import ResponseCache
+
+    if not enabled:
+        description_summerizer.set_cache(None)
+        return None
+    config = state.config
+    llm_cache = ResponseCache(
+        config.cache_dir,
+        max_entries=config.llm_cache_size or ResponseCache.DEFAULT_MAX_ENTRIES,
+        ttl=config.llm_cache_ttl_days * 24 * 60 * 60 if config.llm_cache_ttl_days else ResponseCache.DEFAULT_TTL)
+    description_summerizer.set_cache(llm_cache)
+    return llm_cache
+
+
+def setup_query_mode(query_mode: str = None):
+    """Set how the description summerizer creates queries, the query_mode argument overrides the config."""
+    from gencv import description_summerizer
+
+    query_mode = query_mode or state.config.query_mode
+    if query_mode not in description_summerizer.QUERY_MODES:
+        raise typer.BadParameter(
+            f"Unknown query mode {query_mode}, use llm or local.")
+    description_summerizer.set_query_mode(query_mode)
+
+
+def setup_template_caches():
+    """Cache parsed templates and their font metrics in the cache folder from the config."""
+    from gencv import fontmetrics
+    from gencv.latex_builder import TexResumeTemplate
+
+    TexResumeTemplate.set_cache_dir(
+        os.path.join(state.config.cache_dir, "templates"))
+    fontmetrics.set_cache_dir(os.path.join(state.config.cache_dir, "fonts"))
+
+
+def get_summerizer_options() -> dict:
+    """Get the AsyncSummerizer options set in the config."""
+    config = state.config
+    options = {"host": config.ollama_host, "concurrency": config.llm_concurrency,
+               "timeout": config.llm_timeout, "retries": config.llm_retries}
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def get_optimizer_options(optimizer: str = None) -> dict:
+    """Get the selection optimizer options, the optimizer argument overrides the config."""
+    optimizer = optimizer or state.config.optimizer
+    if optimizer not in ("greedy", "exact"):
+        raise typer.BadParameter(
+            f"Unknown optimizer {optimizer}, use greedy or exact.")
+    options = {"optimizer": optimizer}
+    if state.config.optimizer_time_limit is not None:
+        options["time_limit"] = state.config.optimizer_time_limit
+    return options
+
+
+def setup_build_cache():
+    """Create the PDF build cache from the config, returns None if it is disabled."""
+    from gencv.cache import BuildCache
+
+    config = state.config
+    if not config.build_cache:
+        return None
+    max_bytes = int(config.build_cache_size_mb * 2 ** 20) \
+        if config.build_cache_size_mb is not None else BuildCache.DEFAULT_MAX_BYTES
+    return BuildCache(config.cache_dir, max_bytes=max_bytes, link=config.build_cache_link)
+
+
+def get_build_options() -> dict:
+    """Get the latex build options for TexResumeTemplate.to_file from the config."""
+    config = state.config
+    return {"synctex": config.synctex,
+            "format_dir": os.path.join(config.cache_dir, "formats") if config.latex_format else None,
+            "build_cache": setup_build_cache()}
+
+
+def close_caches(*caches):
+    """Flush and close the caches that are enabled."""
+    for cache in caches:
+        if cache is not None:
+            cache.close()
+
+
+def get_scoring_options() -> dict:
+    """Get the load_compact_embeddings options set in the config."""
+    config = state.config
+    return {"precision": config.embedding_precision, "dims": config.embedding_dims,
+            "rescore_top_k": config.rescore_top_k or 0}
+
+
+def get_lexical_options(scoring: str = None) -> dict:
+    """Get the LexicalQuery options, the scoring argument overrides the config, empty if bullets are only scored by embedding."""
+    config = state.config
+    scoring = scoring or config.scoring
+    if scoring not in ("dense", "hybrid", "lexical"):
+        raise typer.BadParameter(
+            f"Unknown scoring {scoring}, use dense, hybrid or lexical.")
+    if scoring == "dense" and not config.prefilter_top_n:
+        return {}
+    options = {"scoring": scoring, "prefilter_top_n": config.prefilter_top_n or 0}
+    if config.lexical_weight is not None:
+        options["weight"] = config.lexical_weight
+    return options
+
+
+def get_embedding_batch_size() -> int:
+    """Get the embedding batch size from the config."""
+    from gencv.utils import TextEncoder
+
+    return state.config.embedding_batch_size or TextEncoder.DEFAULT_BATCH_SIZE
+
+
+@app.command("compile")
+def compile_data(
+        datafile: str = None,
+        force: bool = typer.Option(False, help="Re-embed every bullet instead of only changed bullets.")):
+    '''Compile data file to make sure it's formated properly and prebuild the data bundle used by mkres.'''
+    from gencv.compiled_data import compile_data as compile_bundle
+
+    datafile = datafile or state.config.datafile
+    embedding_cache = setup_embedding_cache()
+    stats = compile_bundle(
+        datafile, batch_size=get_embedding_batch_size(), force=force)
+    embedding_cache.close()
+    typer.echo(
+        f"Compiled {stats.bullets} bullets to {stats.bundle_dir} ({stats.embedded} embedded, {stats.reused} reused).")
+    if state.verbose:
+        typer.echo(embedding_cache.stats())
 
 
 def select_projects():
@@ -85,81 +292,462 @@ def mkres(
         template: str,
         desc: str,
         outname: str = None,
-        outdir: str = config.output_dir,
+        outdir: str = None,
         output: str = "pdf",
         as_query: bool = False,
-        datafile: str = config.datafile,
-        template_dir: str = config.template_dir):
+        datafile: str = None,
+        template_dir: str = None,
+        optimizer: str = typer.Option(
+            None, help="Bullet selection optimizer, greedy or exact, defaults to the config."),
+        scoring: str = typer.Option(
+            None, help="Score bullets by embedding (dense), by description keywords (lexical) or both (hybrid), defaults to the config."),
+        query_mode: str = typer.Option(
+            None, help="Create the query with the LLM (llm) or from the skills and key phrases in the description (local), defaults to the config."),
+        remote: bool = typer.Option(
+            False, help="Delegate to the gencv serve daemon if it's running, it uses its own data file, templates and settings so options that change them can't be combined with it."),
+        no_llm_cache: bool = typer.Option(
+            False, "--no-llm-cache", help="Always call the LLM instead of using cached responses."),
+        profile: str = typer.Option(
+            None, help="Write the time, memory and cache hit rates of each stage to this JSON file and a Chrome trace next to it.")):
     '''Generate resume.'''
-
-    # this stuff should be defined on the template
-    LINE_CHARS_LIM = 120
-    MAX_LINES = 31
+    if remote:
+        # the daemon was started with its own data file, templates and settings
+        local_options = {"--datafile": datafile, "--template-dir": template_dir, "--optimizer": optimizer,
+                         "--scoring": scoring, "--query-mode": query_mode, "--no-llm-cache": no_llm_cache or None,
+                         "--profile": profile}
+        rejected = [name for name, value in local_options.items() if value is not None]
+        if rejected:
+            raise typer.BadParameter(
+                f"{', '.join(rejected)} can't be used with --remote, the daemon uses the options it was started with.")
+
+    config = state.config
+    outdir = outdir or config.output_dir
+    datafile = datafile or config.datafile
+    template_dir = template_dir or config.template_dir
+    optimizer_options = get_optimizer_options(optimizer)
+    lexical_options = get_lexical_options(scoring)
+
+    if remote:
+        from gencv.client import MkresRequest, is_running, post
+        if is_running(config.server_host, config.server_port):
+            try:
+                response = post("/mkres", MkresRequest(
+                    template=template, desc=desc, as_query=as_query,
+                    outdir=os.path.abspath(outdir), outname=outname, output=output),
+                    host=config.server_host, port=config.server_port)
+            except RuntimeError as e:
+                typer.echo(f"gencv serve failed to generate resume: {e}")
+                raise typer.Exit(code=1)
+            if state.verbose:
+                typer.echo(f"Generated query: '{response['query']}'")
+            typer.echo(f"Resume generated at {response['path']}.")
+            return
+        if state.verbose:
+            typer.echo("gencv serve is not running, generating resume locally.")
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from gencv.resumeitems import select_data
+    from gencv.optimizer import select_data_exact, DEFAULT_TIME_LIMIT
+    from gencv.compiled_data import load_compact_embeddings, load_lexical_index, load_or_compile
+    from gencv.batch import build_in_proxy
+    from gencv.latex_builder import TexResumeTemplate
+    from gencv.lexical import LexicalQuery
+    from gencv.pipeline import score_resume_data, to_template_data
+    from gencv.description_summerizer import extract_keywords, gen_resume_query
+    from gencv.utils import TextEncoder
+    from gencv import profiling
+
+    profiler = None
+    if profile is not None:
+        profiler = profiling.Profiler("mkres")
+        profiling.set_profiler(profiler)
+
+    # lexical scoring never embeds the query so it doesn't need the model
+    load_model = lexical_options.get("scoring") != "lexical"
     if not state.verbose:
-        progressbar = typer.progressbar(length=7)
+        progressbar = typer.progressbar(length=7 + bool(lexical_options) + load_model)
     else:
         progressbar = None
 
-    # load template into program
-    resume_template = TexResumeTemplate(os.path.join(template_dir, template))
+    embedding_cache = setup_embedding_cache()
+    setup_template_caches()
+    setup_query_mode(query_mode)
+    llm_cache = setup_llm_cache(not no_llm_cache)
+    build_options = get_build_options()
+
+    try:
+        if state.verbose:
+            typer.echo(
+                "Loading template, compiling resume data and generating query from description...")
+        # the llm calls, the model load, the data compile (embedding) and the template parsing don't
+        # depend on each other so they run concurrently, the model and http calls release the GIL
+        pool = ThreadPoolExecutor(max_workers=5)
+        try:
+            # load template into program
+            template_future = pool.submit(
+                profiling.run_stage, "template_load", TexResumeTemplate, os.path.join(template_dir, template))
+            # load compiled data bundle into program as python objects, recompiles if the yaml file changed
+            data_future = pool.submit(
+                profiling.run_stage, "yaml_compile", load_or_compile, datafile, batch_size=get_embedding_batch_size())
+            # generate resume query, lexical scoring only needs the keywords
+            query_future = pool.submit(
+                profiling.run_stage, "llm_query", lambda: desc if as_query else (
+                    gen_resume_query(desc) if lexical_options.get("scoring") != "lexical" else None))
+            stage_messages = {
+                template_future: "Loaded resume template.",
+                data_future: "Compiled resume data.",
+                query_future: "Generated resume data query from description.",
+            }
+            if lexical_options:
+                keywords_future = pool.submit(
+                    profiling.run_stage, "llm_keywords", lambda: [desc] if as_query else extract_keywords(desc))
+                stage_messages[keywords_future] = "Extracted keywords from description."
+            if load_model:
+                # loading the model takes seconds, load it while waiting on the llm instead of when the query is scored
+                model_future = pool.submit(profiling.run_stage, "model_load", TextEncoder.get_model)
+                stage_messages[model_future] = "Loaded embedding model."
+            for future in as_completed(stage_messages):
+                # raise errors as soon as any stage fails
+                future.result()
+                update_console_progress(stage_messages[future], progressbar)
+        finally:
+            # doesn't wait for the other stages if one failed, the stages that haven't started are cancelled
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        resume_template = template_future.result()
+        data, embeddings = data_future.result()
+        query = query_future.result()
+        if llm_cache is not None:
+            llm_cache.flush()
+        lexical = None
+        if lexical_options:
+            lexical = LexicalQuery(load_lexical_index(datafile), keywords_future.result(), **lexical_options)
+        if state.verbose:
+            if query is not None:
+                typer.echo(f"Generated query: '{query}'")
+            if lexical is not None:
+                typer.echo(f"Keywords: {', '.join(lexical.keywords)}")
+            if llm_cache is not None:
+                typer.echo(llm_cache.stats())
+
+        update_console_progress("Querying and ranking resume bullet points..", progressbar)
+        with profiling.stage("scoring"):
+            processed_data = score_resume_data(
+                data, load_compact_embeddings(datafile, embeddings, **get_scoring_options()), query, lexical)
+        embedding_cache.flush()
+        if state.verbose:
+            typer.echo(embedding_cache.stats())
+
+        update_console_progress(
+            "Selecting best bullet points for experiences...", progressbar)
+        # the line budget and font are declared on the template
+        layout = resume_template.layout
+        with profiling.stage("selection"):
+            if optimizer_options["optimizer"] == "exact":
+                selected_data = select_data_exact(
+                    processed_data, resume_template, layout.max_lines, layout.line_chars_lim,
+                    optimizer_options.get("time_limit", DEFAULT_TIME_LIMIT), resume_template.get_line_counter())
+            else:
+                selected_data = select_data(
+                    processed_data, resume_template, layout.max_lines, layout.line_chars_lim,
+                    resume_template.get_line_counter())
+
+        template_data = to_template_data(selected_data)
+
+        # need to make this data interface into the resume template
+
+        update_console_progress("Filling resume template...", progressbar)
+        with profiling.stage("fill"):
+            resume = resume_template.fill(template_data)
+
+        update_console_progress("Generating PDF...", progressbar)
+        with profiling.stage("latex"):
+            build_in_proxy(outdir, template, resume, config.proxy_dir, output, output_name=outname,
+                           build_options=build_options, assets_hash=resume_template.asset_hash)
+
+        if profiler is not None:
+            for cache in (embedding_cache, llm_cache, build_options["build_cache"]):
+                if cache is not None:
+                    profiler.record_cache(cache)
+            profiling.set_profiler(None)
+            profiler.write(profile)
+            typer.echo(
+                f"Profile written to {profile} and {profiling.Profiler.trace_path(profile)}.")
+    finally:
+        close_caches(embedding_cache, llm_cache, build_options["build_cache"])
 
-    update_console_progress("Compiling resume data...", progressbar)
-    # load yaml file into program as python objects
-    data = compile_yaml(datafile)
 
-    update_console_progress(
-        "Generating resume data query from description...", progressbar)
-    # generate resume query
-    query = gen_resume_query(desc) if not as_query else desc
-    if state.verbose:
-        typer.echo(f"Generated query: '{query}'")
-
-    update_console_progress("Querying resume bullet points..", progressbar)
-    bullets = preprocess_bullets(data, query)
-
-    update_console_progress("Ranking experiences...", progressbar)
-    processed_data = process_data(bullets)
-
-    update_console_progress(
-        "Selecting best bullet points for experiences...", progressbar)
-    selected_data = select_data(
-        processed_data, resume_template, MAX_LINES, LINE_CHARS_LIM)
-
-    # sort selected data based on order and similarity
-    selected_data = sorted(selected_data, key=lambda x: x.sorting_data)
-
-    exp_id_data_map: dict[str, tuple[ResumeExperienceItem,
-                                     list[ResumeBulletItem]]] = {}
-    for d in selected_data:
-        if d.experience.id not in exp_id_data_map:
-            exp_id_data_map[d.experience.id] = (d.experience, [])
-        exp_id_data_map[d.experience.id][1].append(d.bullet)
-
-    template_data: list[ExperienceData] = []
-    for _, (experience, bullets) in exp_id_data_map.items():
-        template_bullets = []
-        for b in bullets:
-            template_bullets.append(BulletData(b.text, b.bold))
-        template_experience = ExperienceData(
-            id=experience.id,
-            experience_type=experience.experience_type,
-            bullets=template_bullets,
-            metatext1=experience.metatext1,
-            metatext2=experience.metatext2,
-            metatext3=experience.metatext3,
-            metatext4=experience.metatext4,
-            metatext5=experience.metatext5
-        )
-        template_data.append(template_experience)
-
-    # need to make this data interface into the resume template
-
-    update_console_progress("Filling resume template...", progressbar)
-    resume = resume_template.fill(template_data)
-
-    update_console_progress("Generating PDF...", progressbar)
-    TexResumeTemplate.to_file(
-        outdir, template, resume, output_name=outname, proxy_dir=config.proxy_dir, output=output)
+@app.command()
+def batch(
+        jobs: str,
+        template: str = typer.Option(
+            None, help="Template for jobs that don't name one."),
+        outdir: str = None,
+        output: str = "pdf",
+        workers: int = typer.Option(
+            None, help="Max latex compilers running at once, defaults to the cpu count."),
+        report: str = typer.Option(
+            None, help="Write the per job status report to this JSON file."),
+        optimizer: str = typer.Option(
+            None, help="Bullet selection optimizer, greedy or exact, defaults to the config."),
+        scoring: str = typer.Option(
+            None, help="Score bullets by embedding (dense), by description keywords (lexical) or both (hybrid), defaults to the config."),
+        query_mode: str = typer.Option(
+            None, help="Create the query with the LLM (llm) or from the skills and key phrases in the description (local), defaults to the config."),
+        datafile: str = None,
+        template_dir: str = None,
+        no_llm_cache: bool = typer.Option(
+            False, "--no-llm-cache", help="Always call the LLM instead of using cached responses.")):
+    '''Generate resumes for many job descriptions, JOBS is a JSONL file or a folder of description text files.'''
+    import json
+    from gencv.batch import BatchJob, BatchResult, load_jobs, run_batch
+    from gencv.compiled_data import load_compact_embeddings, load_lexical_index, load_or_compile
+    from gencv.latex_builder import TexResumeTemplate
+    from gencv.lexical import LexicalQuery
+    from gencv.description_summerizer import extract_keywords_many, gen_resume_queries
+    from gencv.pipeline import tailor_resume
+
+    config = state.config
+    outdir = outdir or config.output_dir
+    datafile = datafile or config.datafile
+    template_dir = template_dir or config.template_dir
+
+    batch_jobs = load_jobs(jobs, default_template=template)
+    optimizer_options = get_optimizer_options(optimizer)
+    lexical_options = get_lexical_options(scoring)
+    embedding_cache = setup_embedding_cache()
+    setup_template_caches()
+    setup_query_mode(query_mode)
+    llm_cache = setup_llm_cache(not no_llm_cache)
+    build_options = get_build_options()
+
+    try:
+        # compile data and parse each template once for every job
+        data, embeddings = load_or_compile(
+            datafile, batch_size=get_embedding_batch_size())
+        normalized_embeddings = load_compact_embeddings(
+            datafile, embeddings, **get_scoring_options())
+        lexical_index = load_lexical_index(datafile) if lexical_options else None
+        templates: dict[str, TexResumeTemplate] = {}
+
+        # generate every query up front with concurrent requests instead of one round trip per job
+        llm_jobs = [job for job in batch_jobs if not job.as_query]
+        queries: dict[str, str | Exception] = {}
+        if lexical_options.get("scoring") != "lexical":
+            if state.verbose:
+                typer.echo(f"Generating queries for {len(llm_jobs)} descriptions...")
+            queries = dict(zip(
+                (job.name for job in llm_jobs),
+                gen_resume_queries([job.description for job in llm_jobs],
+                                   return_exceptions=True, **get_summerizer_options())))
+        keywords: dict[str, list[str] | Exception] = {}
+        if lexical_options:
+            if state.verbose:
+                typer.echo(f"Extracting keywords from {len(llm_jobs)} descriptions...")
+            keywords = dict(zip(
+                (job.name for job in llm_jobs),
+                extract_keywords_many([job.description for job in llm_jobs],
+                                      return_exceptions=True, **get_summerizer_options())))
+
+        def tailor(job: BatchJob) -> str:
+            if job.template not in templates:
+                templates[job.template] = TexResumeTemplate(
+                    os.path.join(template_dir, job.template))
+            query = job.description if job.as_query else queries.get(job.name)
+            if isinstance(query, Exception):
+                raise query
+            if state.verbose and query is not None:
+                typer.echo(f"{job.name}: generated query '{query}'")
+            lexical = None
+            if lexical_options:
+                job_keywords = [job.description] if job.as_query else keywords[job.name]
+                if isinstance(job_keywords, Exception):
+                    raise job_keywords
+                lexical = LexicalQuery(lexical_index, job_keywords, **lexical_options)
+            return tailor_resume(data, normalized_embeddings, templates[job.template], query,
+                                 lexical=lexical, **optimizer_options)
+
+        def echo_result(result: BatchResult):
+            status = "ok" if result.ok else "FAILED"
+            typer.echo(
+                f"{status:6} {result.name} ({result.seconds:.1f}s): {result.detail}")
+
+        results = run_batch(batch_jobs, tailor, outdir, config.proxy_dir,
+                            output=output, workers=workers, on_result=echo_result,
+                            build_options=build_options,
+                            assets_hash=lambda job: templates[job.template].asset_hash)
+    finally:
+        close_caches(embedding_cache, llm_cache, build_options["build_cache"])
+    if llm_cache is not None and state.verbose:
+        typer.echo(llm_cache.stats())
+
+    n_ok = sum(result.ok for result in results)
+    typer.echo(f"{n_ok}/{len(results)} resumes generated.")
+    if report is not None:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump([result._asdict() for result in results], f, indent=2)
+    if n_ok != len(results):
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def watch(
+        template: str,
+        desc: str = typer.Argument(
+            ..., help="File with the job description, or the query with --as-query."),
+        outname: str = None,
+        outdir: str = None,
+        output: str = "pdf",
+        as_query: bool = False,
+        datafile: str = None,
+        template_dir: str = None,
+        optimizer: str = typer.Option(
+            None, help="Bullet selection optimizer, greedy or exact, defaults to the config."),
+        scoring: str = typer.Option(
+            None, help="Score bullets by embedding (dense), by description keywords (lexical) or both (hybrid), defaults to the config."),
+        query_mode: str = typer.Option(
+            None, help="Create the query with the LLM (llm) or from the skills and key phrases in the description (local), defaults to the config."),
+        interval: float = typer.Option(
+            0.25, help="Seconds between checks for changed files."),
+        no_llm_cache: bool = typer.Option(
+            False, "--no-llm-cache", help="Always call the LLM instead of using cached responses.")):
+    '''Regenerate a resume whenever the data file, the template or the description file changes.'''
+    from gencv.watch import ResumeWatcher, WatchUpdate
+
+    config = state.config
+    outdir = outdir or config.output_dir
+    template_dir = template_dir or config.template_dir
+
+    embedding_cache = setup_embedding_cache()
+    setup_template_caches()
+    setup_query_mode(query_mode)
+    llm_cache = setup_llm_cache(not no_llm_cache)
+    build_options = get_build_options()
+    watcher = ResumeWatcher(
+        datafile or config.datafile,
+        os.path.join(template_dir, template),
+        desc,
+        outdir,
+        outname or template,
+        config.proxy_dir,
+        output=output,
+        as_query=as_query,
+        batch_size=get_embedding_batch_size(),
+        optimizer_options=get_optimizer_options(optimizer),
+        scoring_options=get_scoring_options(),
+        lexical_options=get_lexical_options(scoring),
+        build_options=build_options)
+
+    def echo_update(changed: list[str], update: WatchUpdate):
+        result = f"updated {update.path}" if update.path is not None else "output unchanged"
+        typer.echo(
+            f"{', '.join(changed)} changed: {result} ({update.seconds:.2f}s, reran {', '.join(update.stages) or 'nothing'}).")
+        if state.verbose and "query" in update.stages:
+            typer.echo(f"Query: '{watcher.query}'")
+
+    def echo_error(error: Exception):
+        typer.echo(f"Failed to regenerate resume: {error}")
+
+    typer.echo(
+        f"Watching {watcher.inputs['data']}, {watcher.inputs['template']} and {desc}, press Ctrl+C to stop.")
+    try:
+        watcher.watch(echo_update, echo_error, interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_caches(embedding_cache, llm_cache, build_options["build_cache"])
+
+
+cache_app = typer.Typer(help="Inspect and prune the on-disk caches.")
+app.add_typer(cache_app, name="cache")
+
+
+def format_size(size: int) -> str:
+    """Format a size in bytes for printing."""
+    return f"{size / 2 ** 20:.1f} MB"
+
+
+@cache_app.command("stats")
+def cache_stats():
+    """Print how many entries each cache holds and how much space the build cache takes up."""
+    from gencv.cache import BuildCache, EmbeddingCache, ResponseCache
+
+    config = state.config
+    typer.echo(f"Cache folder: {config.cache_dir}")
+    # only counted, closing without a flush never evicts entries
+    for cache in (EmbeddingCache(config.cache_dir), ResponseCache(config.cache_dir)):
+        typer.echo(f"{cache.NAME}: {len(cache)} entries.")
+        cache.close(flush=False)
+    build_cache = setup_build_cache() or BuildCache(config.cache_dir)
+    typer.echo(f"{build_cache.NAME}: {len(build_cache)} PDFs, "
+               f"{format_size(build_cache.total_size())} of {format_size(build_cache.max_bytes)}.")
+    build_cache.close(flush=False)
+
+
+@cache_app.command("prune")
+def cache_prune(
+        max_size: float = typer.Option(
+            None, help="Evict built PDFs until the build cache takes up at most this many MB, defaults to the config limit."),
+        clear: bool = typer.Option(False, "--all", help="Remove every built PDF.")):
+    """Evict least recently used entries until every cache is under its size limit."""
+    from gencv.cache import BuildCache
+
+    config = state.config
+    embedding_cache = setup_embedding_cache()
+    embedding_cache.close()
+    llm_cache = setup_llm_cache()
+    llm_cache.close()
+    build_cache = setup_build_cache() or BuildCache(config.cache_dir)
+    max_bytes = 0 if clear else int(
+        max_size * 2 ** 20) if max_size is not None else None
+    evicted, freed = build_cache.evict(max_bytes)
+    build_cache.close()
+    typer.echo(
+        f"Evicted {evicted} PDFs from the build cache, freed {format_size(freed)}.")
+
+
+@app.command()
+def serve(
+        host: str = None,
+        port: int = None,
+        datafile: str = None,
+        template_dir: str = None,
+        query_mode: str = typer.Option(
+            None, help="Create the query with the LLM (llm) or from the skills and key phrases in the description (local), defaults to the config."),
+        no_llm_cache: bool = typer.Option(
+            False, "--no-llm-cache", help="Always call the LLM instead of using cached responses.")):
+    '''Run a local daemon that keeps the model, data and templates loaded for mkres --remote.'''
+    from gencv.server import ResumeService, serve as serve_forever
+
+    config = state.config
+    host = host or config.server_host
+    port = port or config.server_port
+
+    embedding_cache = setup_embedding_cache()
+    setup_template_caches()
+    setup_query_mode(query_mode)
+    llm_cache = setup_llm_cache(not no_llm_cache)
+    build_options = get_build_options()
+    try:
+        service = ResumeService(
+            datafile or config.datafile,
+            template_dir or config.template_dir,
+            config.proxy_dir,
+            batch_size=get_embedding_batch_size(),
+            optimizer_options=get_optimizer_options(),
+            scoring_options=get_scoring_options(),
+            lexical_options=get_lexical_options(),
+            build_options=build_options,
+            verbose=state.verbose)
+        typer.echo("Loading model and data...")
+        service.warm_up()
+        embedding_cache.flush()
+        typer.echo(f"Serving on http://{host}:{port}")
+        serve_forever(service, host, port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_caches(embedding_cache, llm_cache, build_options["build_cache"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+"Module for tailoring resumes to many job descriptions in one process."
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Literal, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from gencv.latex_builder import TexResumeTemplate
+
+
+class BatchJob(BaseModel):
+    """A job description to tailor a resume to."""
+    name: str
+    description: str
+    template: Optional[str] = None
+    # use the description as the query instead of generating one
+    as_query: Optional[bool] = False
+
+
+class BatchResult(NamedTuple):
+    """Status of a finished batch job."""
+    name: str
+    ok: bool
+    # output path if the job succeeded otherwise the error message
+    detail: str
+    seconds: float
+
+
+def load_jobs(path: str, default_template: str = None) -> list[BatchJob]:
+    """Load jobs from a JSONL file or a folder of description text files named after the job."""
+    jobs: list[BatchJob] = []
+    if os.path.isdir(path):
+        for filename in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(filename)
+            if ext not in (".txt", ".md"):
+                continue
+            with open(os.path.join(path, filename), "r", encoding="utf-8") as f:
+                jobs.append(BatchJob(name=name, description=f.read()))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                jobs.append(BatchJob(**json.loads(line)))
+
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Batch job names must be unique.")
+
+    for job in jobs:
+        if job.template is None:
+            job.template = default_template
+        if job.template is None:
+            raise ValueError(
+                f"Job {job.name} has no template and no default template was given.")
+    return jobs
+
+
+def build_in_proxy(
+        output_dir: str,
+        filename: str,
+        latex: str,
+        proxy_dir: str,
+        output: Literal["pdf", "tex", "all"],
+        output_name: str = None,
+        build_options: dict = None,
+        assets_hash: str = "") -> str:
+    """Build a filled template with TexResumeTemplate.to_file in a private folder under `proxy_dir` that is always removed."""
+    # every build gets a new empty folder, to_file refuses to build in a folder with files left behind
+    os.makedirs(proxy_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix="build-", dir=proxy_dir)
+    try:
+        return TexResumeTemplate.to_file(
+            output_dir, filename, latex, output_name=output_name, proxy_dir=build_dir, output=output,
+            assets_hash=assets_hash, **(build_options or {}))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def render(
+        latex: str,
+        job_name: str,
+        output_dir: str,
+        proxy_dir: str,
+        output: Literal["pdf", "tex", "all"],
+        build_options: dict = None,
+        assets_hash: str = "") -> str:
+    """Render a filled template, each job builds in its own proxy folder so renders can run in parallel."""
+    path = build_in_proxy(output_dir, job_name, latex, proxy_dir, output,
+                          output_name=job_name, build_options=build_options, assets_hash=assets_hash)
+    if not os.path.exists(path):
+        raise RuntimeError(f"{path} was not generated.")
+    return path
+
+
+def run_batch(
+        jobs: list[BatchJob],
+        tailor: Callable[[BatchJob], str],
+        output_dir: str,
+        proxy_dir: str,
+        output: Literal["pdf", "tex", "all"] = "pdf",
+        workers: int = None,
+        on_result: Callable[[BatchResult], None] = None,
+        build_options: dict = None,
+        assets_hash: Callable[[BatchJob], str] = None) -> list[BatchResult]:
+    """Tailor a resume for every job and render them in a bounded pool of latex workers.
+
+    `tailor` turns a job into filled latex and runs in this process so the encoder stays warm.
+    Rendering is bound by the latex compiler subprocesses so the pool uses threads that each
+    wait on one compiler process at a time. `build_options` are passed to TexResumeTemplate.to_file,
+    `assets_hash` gets the hash of a tailored job's template assets for the build cache.
+    """
+    workers = workers or os.cpu_count() or 1
+    results: dict[str, BatchResult] = {}
+
+    def record(result: BatchResult):
+        results[result.name] = result
+        if on_result is not None:
+            on_result(result)
+
+    def render_done(job: BatchJob, start: float, future: Future):
+        try:
+            record(BatchResult(job.name, True, future.result(),
+                   time.perf_counter() - start))
+        except Exception as e:  # pylint: disable=broad-except
+            record(BatchResult(job.name, False, str(e),
+                   time.perf_counter() - start))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            start = time.perf_counter()
+            try:
+                latex = tailor(job)
+            except Exception as e:  # pylint: disable=broad-except
+                record(BatchResult(job.name, False, str(e),
+                       time.perf_counter() - start))
+                continue
+            future = pool.submit(render, latex, job.name, output_dir, proxy_dir, output,
+                                 build_options, assets_hash(job) if assets_hash is not None else "")
+            future.add_done_callback(
+                lambda f, job=job, start=start: render_done(job, start, f))
+
+    return [results[job.name] for job in jobs]
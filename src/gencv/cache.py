@@ -0,0 +1,299 @@
+"Module containing persistent on-disk caches used to skip repeated work between runs."
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+
+def hash_text(*parts: str) -> str:
+    """Hash text parts into a hex digest that can be used as a cache key."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        # seperator so ("ab", "c") and ("a", "bc") hash differently
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class SqliteCache:
+    """Base class for key value caches stored in a sqlite table with least recently used eviction.
+
+    Subclasses define the table name and value columns. When the cache holds more than
+    `max_entries` entries the least recently used ones are evicted on flush.
+    """
+    NAME = "Cache"
+    FILENAME: str = None
+    TABLE: str = None
+    # column definitions for the cached value
+    COLUMNS: str = None
+    DEFAULT_MAX_ENTRIES = 50_000
+
+    def __init__(self, cache_dir: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, self.FILENAME)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # the connection is shared between threads, e.g. by the daemon, so access is serialized with a lock
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                key TEXT PRIMARY KEY,
+                {self.COLUMNS},
+                last_used REAL NOT NULL
+            )""")
+        self._connection.commit()
+
+    def _get_row(self, key: str, columns: str) -> Optional[tuple]:
+        "Get the value columns of an entry and mark it as used, counts hits and misses."
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {columns} FROM {self.TABLE} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute(
+                f"UPDATE {self.TABLE} SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def _put_row(self, key: str, columns: str, values: tuple):
+        "Insert or replace an entry."
+        placeholders = ", ".join("?" * (len(values) + 2))
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} (key, {columns}, last_used) VALUES ({placeholders})",
+                (key, *values, time.time()))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    def evict(self):
+        "Evict least recently used entries until the cache is under its size limit."
+        overflow = len(self) - self.max_entries
+        if overflow <= 0:
+            return
+        with self._lock:
+            self._connection.execute(
+                f"""DELETE FROM {self.TABLE} WHERE key IN (
+                    SELECT key FROM {self.TABLE} ORDER BY last_used ASC LIMIT ?
+                )""", (overflow,))
+
+    def flush(self):
+        "Evict overflowing entries and write pending changes to disk."
+        self.evict()
+        with self._lock:
+            self._connection.commit()
+
+    def close(self, flush: bool = True):
+        "Close the cache, flushes it first unless `flush` is False, e.g. when it was only read from."
+        if flush:
+            self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def stats(self) -> str:
+        "Get a human readable summary of the hit/miss counters."
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"{self.NAME}: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)."
+
+
+class EmbeddingCache(SqliteCache):
+    """Content addressed cache for text embeddings stored in a sqlite database.
+
+    Entries are keyed by the encoder's backend and model key, the instruction prefix and a hash
+    of the text, so changing any of them will never return a stale embedding.
+    """
+    NAME = "Embedding cache"
+    FILENAME = "embeddings.sqlite3"
+    TABLE = "embeddings"
+    COLUMNS = "dtype TEXT NOT NULL, vector BLOB NOT NULL"
+
+    @staticmethod
+    def make_key(model_name: str, instruction: str, text: str) -> str:
+        "Create the cache key for an embedding."
+        return hash_text(model_name, instruction, text)
+
+    def get(self, model_name: str, instruction: str, text: str) -> Optional[np.ndarray]:
+        "Get a cached embedding, returns None if the embedding is not cached."
+        row = self._get_row(self.make_key(
+            model_name, instruction, text), "dtype, vector")
+        if row is None:
+            return None
+        dtype, vector = row
+        # copy so the returned array is writable and doesn't reference the sqlite buffer
+        return np.frombuffer(vector, dtype=dtype).copy()
+
+    def put(self, model_name: str, instruction: str, text: str, embedding: np.ndarray):
+        "Add an embedding to the cache."
+        embedding = np.ascontiguousarray(embedding)
+        self._put_row(self.make_key(model_name, instruction, text), "dtype, vector",
+                      (embedding.dtype.str, embedding.tobytes()))
+
+
+class ResponseCache(SqliteCache):
+    """Cache for LLM responses stored in a sqlite database.
+
+    Entries are keyed by the model, a hash of the prompt template, the generation options
+    and a hash of the description. Entries older than `ttl` seconds are treated as misses.
+    """
+    NAME = "LLM cache"
+    FILENAME = "llm_responses.sqlite3"
+    TABLE = "responses"
+    COLUMNS = "response TEXT NOT NULL, created REAL NOT NULL"
+    DEFAULT_MAX_ENTRIES = 5_000
+    DEFAULT_TTL = 30 * 24 * 60 * 60
+
+    def __init__(self, cache_dir: str, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL) -> None:
+        super().__init__(cache_dir, max_entries)
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: dict, description: str) -> str:
+        "Create the cache key for a response."
+        return hash_text(model, hash_text(prompt), json.dumps(options, sort_keys=True), hash_text(description))
+
+    def get(self, model: str, prompt: str, options: dict, description: str) -> Optional[str]:
+        "Get a cached response, returns None if the response is not cached or expired."
+        row = self._get_row(self.make_key(
+            model, prompt, options, description), "response, created")
+        if row is None:
+            return None
+        response, created = row
+        if time.time() - created > self.ttl:
+            # count expired entries as misses, they are removed on the next evict
+            self.hits -= 1
+            self.misses += 1
+            return None
+        return response
+
+    def put(self, model: str, prompt: str, options: dict, description: str, response: str):
+        "Add a response to the cache."
+        self._put_row(self.make_key(model, prompt, options, description),
+                      "response, created", (response, time.time()))
+
+    def evict(self):
+        "Remove expired responses then evict least recently used responses."
+        with self._lock:
+            self._connection.execute(
+                f"DELETE FROM {self.TABLE} WHERE created < ?", (time.time() - self.ttl,))
+        super().evict()
+
+
+def place_file(source: str, destination: str, link: bool = True):
+    """Put a copy of a file at the destination, hard linked when possible.
+
+    The file is placed under a temporary name and moved into place, so an existing destination
+    is replaced instead of written through, which would change every file linked to it.
+    """
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return
+    tmp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if not link:
+            raise OSError
+        os.link(source, tmp_path)
+    except OSError:
+        # hard links don't work across file systems or on some file systems
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+class BuildCache(SqliteCache):
+    """Content addressed cache for built PDFs.
+
+    Entries are keyed by the filled latex, a hash of the template assets and the compiler, so
+    building the same resume again just places the cached PDF at the output path. The PDFs are
+    stored next to the database and the least recently used ones are evicted once they take up
+    more than `max_bytes`.
+    """
+    NAME = "Build cache"
+    FILENAME = "builds.sqlite3"
+    TABLE = "builds"
+    COLUMNS = "size INTEGER NOT NULL"
+    DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES, link: bool = True) -> None:
+        super().__init__(cache_dir)
+        self.files_dir = os.path.join(cache_dir, "builds")
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.link = link
+
+    @staticmethod
+    def make_key(latex: str, assets_hash: str, compiler: str) -> str:
+        "Create the cache key for a build."
+        return hash_text(compiler, assets_hash, hash_text(latex))
+
+    def file_path(self, key: str) -> str:
+        "Path the PDF of an entry is stored at."
+        return os.path.join(self.files_dir, f"{key}.pdf")
+
+    def get(self, key: str, destination: str) -> bool:
+        "Place the cached PDF of a build at the destination, returns False if the build is not cached."
+        row = self._get_row(key, "size")
+        if row is not None and not os.path.exists(self.file_path(key)):
+            # the file was deleted outside of the cache
+            self.hits -= 1
+            self.misses += 1
+            with self._lock:
+                self._connection.execute(
+                    f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+            row = None
+        with self._lock:
+            self._connection.commit()
+        if row is None:
+            return False
+        place_file(self.file_path(key), destination, self.link)
+        return True
+
+    def put(self, key: str, pdf_path: str):
+        "Add a built PDF to the cache."
+        # copied so later builds writing to the same path never change the cached file
+        tmp_path = f"{self.file_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(pdf_path, tmp_path)
+        os.replace(tmp_path, self.file_path(key))
+        self._put_row(key, "size", (os.path.getsize(pdf_path),))
+        self.flush()
+
+    def total_size(self) -> int:
+        "Bytes taken up by the cached PDFs."
+        with self._lock:
+            return self._connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()[0]
+
+    def evict(self, max_bytes: int = None) -> tuple[int, int]:
+        """Evict least recently used PDFs until the cache takes up at most `max_bytes`, defaults to the size limit.
+
+        Returns the number of evicted entries and the bytes freed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, size FROM {self.TABLE} ORDER BY last_used DESC").fetchall()
+            kept = 0
+            evicted: list[tuple[str, int]] = []
+            for key, size in rows:
+                # everything used before the first entry that doesn't fit is evicted too
+                if not evicted and kept + size <= max_bytes:
+                    kept += size
+                else:
+                    evicted.append((key, size))
+            self._connection.executemany(
+                f"DELETE FROM {self.TABLE} WHERE key = ?", [(key,) for key, _ in evicted])
+        for key, _ in evicted:
+            try:
+                os.remove(self.file_path(key))
+            except FileNotFoundError:
+                pass
+        return len(evicted), sum(size for _, size in evicted)
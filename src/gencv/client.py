@@ -0,0 +1,48 @@
+"""Module for talking to the gencv daemon, only uses light dependencies so the cli can delegate to the daemon quickly."""
+
+import json
+import urllib.error
+import urllib.request
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class PreviewRequest(BaseModel):
+    """Request for selecting bullets for a description."""
+    template: str
+    desc: str
+    as_query: Optional[bool] = False
+
+
+class MkresRequest(PreviewRequest):
+    """Request for generating a resume."""
+    outdir: str
+    outname: Optional[str] = None
+    output: Optional[Literal["pdf", "tex", "all"]] = "pdf"
+
+
+def is_running(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 0.5) -> bool:
+    "Check if the daemon is running."
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def post(path: str, request: BaseModel, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> dict:
+    "Send a request to the daemon, raises RuntimeError if the daemon fails to handle it."
+    http_request = urllib.request.Request(
+        f"http://{host}:{port}{path}",
+        data=request.model_dump_json().encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST")
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read()).get("error")) from e
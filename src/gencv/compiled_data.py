@@ -0,0 +1,293 @@
+"""Module for compiling the data file into a bundle that can be loaded in milliseconds.
+
+A bundle is a folder next to the data file (`data.yaml` -> `data.gencv/`) holding
+`index.json` with flattened experience, group and bullet tables and `embeddings.npy`
+with one row per bullet, in the same order as the bullets table. Compact copies of the
+embeddings used for scoring are cached in the bundle as `embeddings.<precision>.<dims>.npz`
+and the BM25 index over the bullet texts is saved as `lexical.npz`.
+"""
+
+import hashlib
+import json
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from gencv.cache import hash_text
+from gencv.lexical import BM25Index
+from gencv.precision import CompactEmbeddings, Precision
+from gencv.resumeitems import EmbeddingStore, ResumeBulletItem, ResumeExperienceItem, GroupData
+from gencv.utils import TextEncoder, load_yaml
+
+BUNDLE_VERSION = 1
+INDEX_FILENAME = "index.json"
+EMBEDDINGS_FILENAME = "embeddings.npy"
+COMPACT_PREFIX = "embeddings."
+COMPACT_EXT = ".npz"
+LEXICAL_FILENAME = "lexical.npz"
+
+
+class CompiledData(NamedTuple):
+    """Compiled experiences and the embedding matrix of their bullets."""
+    experiences: list[ResumeExperienceItem]
+    # row i is the embedding of the i-th bullet when iterating experience bullets in order
+    embeddings: np.ndarray
+
+
+class CompileStats(NamedTuple):
+    """Summary of a compile."""
+    bundle_dir: str
+    bullets: int
+    embedded: int
+    reused: int
+
+
+def get_bundle_dir(data_file: str) -> str:
+    "Get the folder the bundle for a data file is stored in."
+    return os.path.splitext(os.path.abspath(data_file))[0] + ".gencv"
+
+
+def hash_file(path: str) -> str:
+    "Hash the contents of a file."
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def read_index(bundle_dir: str) -> Optional[dict]:
+    "Read the bundle index, returns None if there is no bundle."
+    index_path = os.path.join(bundle_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def index_matches_encoder(index: dict) -> bool:
+    "Check if a bundle was embedded with the current encoder settings."
+    return index.get("version") == BUNDLE_VERSION \
+        and index.get("model") == TextEncoder.model_key() \
+        and index.get("instruction") == TextEncoder.INSTRUCTION
+
+
+def is_up_to_date(data_file: str) -> bool:
+    "Check if the bundle for a data file exists and matches the current data file."
+    index = read_index(get_bundle_dir(data_file))
+    return index is not None \
+        and index_matches_encoder(index) \
+        and index["data_hash"] == hash_file(data_file)
+
+
+def build_tables(data_file: str) -> tuple[list[dict], list[dict], list[dict]]:
+    """Validate the data file and flatten it into experience, group and bullet tables.
+
+    Bullets are in the same order compile_yaml adds them to their experience.
+    """
+    experiences_table: list[dict] = []
+    groups_table: list[dict] = []
+    bullets_table: list[dict] = []
+
+    for exp_i, data in enumerate(load_yaml(data_file)):
+        experiences_table.append({
+            "id": data.id,
+            "type": data.type,
+            "metatext1": data.metatext1,
+            "metatext2": data.metatext2,
+            "metatext3": data.metatext3,
+            "metatext4": data.metatext4,
+            "metatext5": data.metatext5,
+            "min_points": data.min_points,
+            "max_points": data.max_points,
+            "order": data.order,
+            "order_": exp_i,
+        })
+        for grp_i, bullet_group in enumerate(data.groups):
+            group_row = len(groups_table)
+            groups_table.append({
+                "experience": exp_i,
+                "min": bullet_group.min,
+                "max": bullet_group.max,
+                "order_": grp_i,
+            })
+            for blt_i, point in enumerate(bullet_group.points):
+                dependency_row = len(bullets_table)
+                bullets_table.append({
+                    "text": point.text,
+                    "bold": point.bold,
+                    "order": point.order if point.order is not None else ResumeBulletItem.DEFAULT_ORDER,
+                    "order_": blt_i,
+                    "group": group_row,
+                    "dependency": None,
+                    "hash": hash_text(point.text),
+                })
+                for dependant in point.dependants:
+                    bullets_table.append({
+                        "text": dependant.text,
+                        "bold": dependant.bold,
+                        # dependants are pushed one after their dependency
+                        "order": ResumeBulletItem.DEFAULT_ORDER + 1,
+                        "order_": dependant.order,
+                        "group": group_row,
+                        "dependency": dependency_row,
+                        "hash": hash_text(dependant.text),
+                    })
+    return experiences_table, groups_table, bullets_table
+
+
+def compile_data(data_file: str, batch_size: int = TextEncoder.DEFAULT_BATCH_SIZE, force: bool = False) -> CompileStats:
+    """Compile the data file into a bundle, only bullets whose text changed since the last compile are embedded."""
+    bundle_dir = get_bundle_dir(data_file)
+    data_hash = hash_file(data_file)
+    experiences_table, groups_table, bullets_table = build_tables(data_file)
+
+    # find embeddings that can be reused from the previous bundle
+    previous_rows: dict[str, np.ndarray] = {}
+    previous_index = None if force else read_index(bundle_dir)
+    if previous_index is not None and index_matches_encoder(previous_index):
+        previous_embeddings = np.load(os.path.join(
+            bundle_dir, EMBEDDINGS_FILENAME), mmap_mode="r")
+        for row, bullet in enumerate(previous_index["bullets"]):
+            previous_rows[bullet["hash"]] = previous_embeddings[row]
+
+    missing = [bullet["text"] for bullet in bullets_table
+               if bullet["hash"] not in previous_rows]
+    new_rows = dict(zip((hash_text(text) for text in missing),
+                        TextEncoder.embed_batch(missing, batch_size=batch_size)))
+
+    rows = [previous_rows[bullet["hash"]] if bullet["hash"] in previous_rows
+            else new_rows[bullet["hash"]].numpy() for bullet in bullets_table]
+    embeddings = np.stack(rows).astype(np.float32) if rows \
+        else np.zeros((0, 0), dtype=np.float32)
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    # write to temporary files and swap them in so a failed compile never leaves a broken bundle
+    embeddings_path = os.path.join(bundle_dir, EMBEDDINGS_FILENAME)
+    with open(embeddings_path + ".tmp", "wb") as f:
+        np.save(f, embeddings)
+    index_path = os.path.join(bundle_dir, INDEX_FILENAME)
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": BUNDLE_VERSION,
+            "model": TextEncoder.model_key(),
+            "instruction": TextEncoder.INSTRUCTION,
+            "data_hash": data_hash,
+            "experiences": experiences_table,
+            "groups": groups_table,
+            "bullets": bullets_table,
+        }, f)
+    lexical_path = os.path.join(bundle_dir, LEXICAL_FILENAME)
+    with open(lexical_path + ".tmp", "wb") as f:
+        np.savez(f, **BM25Index.build([bullet["text"] for bullet in bullets_table]).to_arrays())
+    os.replace(embeddings_path + ".tmp", embeddings_path)
+    os.replace(lexical_path + ".tmp", lexical_path)
+    os.replace(index_path + ".tmp", index_path)
+    # compact copies are made from the old embeddings
+    for filename in os.listdir(bundle_dir):
+        if filename.startswith(COMPACT_PREFIX) and filename.endswith(COMPACT_EXT):
+            os.remove(os.path.join(bundle_dir, filename))
+
+    return CompileStats(bundle_dir, len(bullets_table), len(missing), len(bullets_table) - len(missing))
+
+
+def load_compiled_data(data_file: str) -> CompiledData:
+    """Load a compiled bundle into resume items, the embedding matrix is memory mapped."""
+    bundle_dir = get_bundle_dir(data_file)
+    index = read_index(bundle_dir)
+    if index is None:
+        raise FileNotFoundError(
+            f"No compiled bundle for {data_file}. Run `gencv compile` first.")
+    if not index_matches_encoder(index):
+        raise ValueError(
+            f"Bundle {bundle_dir} was compiled with a different encoder, recompile it.")
+
+    # copy on write so rows can be wrapped as tensors without copying or modifying the file
+    embeddings = np.load(os.path.join(
+        bundle_dir, EMBEDDINGS_FILENAME), mmap_mode="c")
+
+    experiences: list[ResumeExperienceItem] = []
+    for exp in index["experiences"]:
+        experiences.append(ResumeExperienceItem(
+            id=exp["id"],
+            order_=exp["order_"],
+            experience_type=exp["type"],
+            metatext1=exp["metatext1"],
+            metatext2=exp["metatext2"],
+            metatext3=exp["metatext3"],
+            metatext4=exp["metatext4"],
+            metatext5=exp["metatext5"],
+            min_bullets=exp["min_points"],
+            max_bullets=exp["max_points"],
+            order=exp["order"]
+        ))
+
+    store = EmbeddingStore(embeddings)
+    groups = [GroupData(min=grp["min"], max=grp["max"], order_=grp["order_"])
+              for grp in index["groups"]]
+    group_bullets: list[list[ResumeBulletItem]] = [[] for _ in groups]
+    bullet_items: list[ResumeBulletItem] = []
+    for row, blt in enumerate(index["bullets"]):
+        bullet_item = ResumeBulletItem(
+            blt["text"], order_=blt["order_"], order=blt["order"], bold=blt["bold"], embed=False)
+        bullet_item.attach(store, row)
+        if blt["dependency"] is not None:
+            bullet_items[blt["dependency"]].add_dependant(bullet_item)
+        bullet_items.append(bullet_item)
+        group_bullets[blt["group"]].append(bullet_item)
+
+    for grp, group_data, bullets in zip(index["groups"], groups, group_bullets):
+        experiences[grp["experience"]].add_group(bullets, group_data)
+
+    return CompiledData(experiences, embeddings)
+
+
+def load_compact_embeddings(data_file: str, embeddings: np.ndarray, precision: Precision = "float32", dims: int = None, rescore_top_k: int = 0) -> CompactEmbeddings:
+    """Get the compact embeddings of a compiled bundle for scoring, they are cached in the bundle after the first load.
+
+    `embeddings` is the full precision matrix of the bundle, the top `rescore_top_k` bullets are rescored with it.
+    """
+    if precision == "float32" and dims is None:
+        # nothing to cache, normalizing is as fast as loading
+        return CompactEmbeddings.from_embeddings(embeddings)
+    compact_path = os.path.join(get_bundle_dir(
+        data_file), f"{COMPACT_PREFIX}{precision}.{dims or 'full'}{COMPACT_EXT}")
+    if os.path.exists(compact_path):
+        with np.load(compact_path) as arrays:
+            return CompactEmbeddings.from_arrays(arrays, precision, dims, embeddings, rescore_top_k)
+    compact = CompactEmbeddings.from_embeddings(
+        embeddings, precision, dims, rescore_top_k)
+    tmp_path = f"{compact_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **compact.to_arrays())
+    os.replace(tmp_path, compact_path)
+    return compact
+
+
+def save_lexical_index(path: str, index: BM25Index):
+    "Save a BM25 index, the file is swapped in so readers never see a partial index."
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **index.to_arrays())
+    os.replace(tmp_path, path)
+
+
+def load_lexical_index(data_file: str) -> BM25Index:
+    "Load the BM25 index of a compiled bundle, it is built from the bundle index if the bundle predates it."
+    bundle_dir = get_bundle_dir(data_file)
+    lexical_path = os.path.join(bundle_dir, LEXICAL_FILENAME)
+    if os.path.exists(lexical_path):
+        with np.load(lexical_path) as arrays:
+            return BM25Index.from_arrays(arrays)
+    index = read_index(bundle_dir)
+    if index is None:
+        raise FileNotFoundError(
+            f"No compiled bundle for {data_file}. Run `gencv compile` first.")
+    lexical_index = BM25Index.build([bullet["text"] for bullet in index["bullets"]])
+    save_lexical_index(lexical_path, lexical_index)
+    return lexical_index
+
+
+def load_or_compile(data_file: str, batch_size: int = TextEncoder.DEFAULT_BATCH_SIZE) -> CompiledData:
+    "Load the compiled bundle for a data file, recompiling it first if the data file changed."
+    if not is_up_to_date(data_file):
+        compile_data(data_file, batch_size=batch_size)
+    return load_compiled_data(data_file)
@@ -1,43 +1,215 @@
+import asyncio
+from typing import Literal, Optional
+
+import httpx
 import ollama
 
+from gencv.cache import ResponseCache
+from gencv.keyphrases import local_keywords, local_resume_query
 
-def gen_resume_query(description: str):
-    """Create a textual query from description."""
-    prompt = """
+MODEL = "llama3.1:8b"
+# fixed generation options so the same description always gets a comparable response,
+# which is what makes caching responses valid
+OPTIONS = {"temperature": 0, "seed": 0}
+
+RESUME_QUERY_PROMPT = """
     Your job is to summerize the qualification listed in a job description into a text search query.
     An example of a query that you would respond with is: 'Embedded systems engineering, 
     mechanical engineering, knowledge of gradient desent, and comfortable with vs code'.
     Respond with ONLY the query, make sure to include ALL technical and soft requirements, do NOT make up any information you do not have. 
     The job description you are summerizing is written below: \n\n
     """
-    stream = ollama.chat(
-        model='llama3.1:8b',
-        messages=[{'role': 'user', 'content': prompt + description}],
-        stream=False,
-    )
-
-    return stream["message"]["content"]
 
-
-def extract_keywords(description: str):
-    """Extracts keywords from the description."""
-    prompt = """
+KEYWORDS_PROMPT = """
     Your job is to summerize the requirements listed in a job description into CSV.
     An example of a query that you would respond with is: 'Python, C++, AutoCAD, SolidWorks, Communication'.
     Respond with ONLY the query, make sure to include ALL requirements, and simplify the list with only the most critical words. 
     The job description you are summerizing is written below: \n\n
     """
+
+QueryMode = Literal["llm", "local"]
+QUERY_MODES = ("llm", "local")
+
+# persistent response cache, disabled when None
+cache: Optional[ResponseCache] = None
+# llm summerizes descriptions with the LLM, local extracts skills and key phrases without it
+query_mode: QueryMode = "llm"
+
+
+def set_cache(response_cache: Optional[ResponseCache]):
+    """Set the cache used to look up responses before calling the LLM."""
+    global cache  # pylint: disable=global-statement
+    cache = response_cache
+
+
+def set_query_mode(mode: QueryMode):
+    """Set how queries and keywords are created from descriptions."""
+    global query_mode  # pylint: disable=global-statement
+    if mode not in QUERY_MODES:
+        raise ValueError(f"Unknown query mode {mode}, use llm or local.")
+    query_mode = mode
+
+
+def chat(prompt: str, description: str) -> str:
+    """Send the prompt followed by the description to the LLM, uses the cached response if there is one."""
+    if cache is not None:
+        cached = cache.get(MODEL, prompt, OPTIONS, description)
+        if cached is not None:
+            return cached
+
     stream = ollama.chat(
-        model='llama3.1:8b',
+        model=MODEL,
         messages=[{'role': 'user', 'content': prompt + description}],
         stream=False,
+        options=OPTIONS,
     )
-    keywords = stream["message"]["content"].lower().replace(
-        ".", "").split(", ")
+    response = stream["message"]["content"]
+
+    if cache is not None:
+        cache.put(MODEL, prompt, OPTIONS, description, response)
+    return response
+
+
+def gen_resume_query(description: str):
+    """Create a textual query from description."""
+    if query_mode == "local":
+        return local_resume_query(description)
+    return chat(RESUME_QUERY_PROMPT, description)
+
+
+def parse_keywords(response: str) -> list[str]:
+    """Parse the CSV keyword response from the LLM."""
+    return response.lower().replace(".", "").split(", ")
+
+
+def extract_keywords(description: str):
+    """Extracts keywords from the description."""
+    if query_mode == "local":
+        return local_keywords(description)
+    keywords = parse_keywords(chat(KEYWORDS_PROMPT, description))
 
     return keywords
 
 
+class AsyncSummerizer:
+    """Summerizes many descriptions concurrently through one shared ollama.AsyncClient.
+
+    The client keeps its http connections open between requests, at most `concurrency` requests
+    are in flight at once, every request is limited to `timeout` seconds and failed requests
+    are retried `retries` times with exponential backoff. Uses the module response cache.
+    Should be used as an async context manager so the connections are closed.
+    """
+    DEFAULT_CONCURRENCY = 4
+    DEFAULT_TIMEOUT = 120.0
+    DEFAULT_RETRIES = 2
+    DEFAULT_BACKOFF = 0.5
+
+    def __init__(
+            self,
+            host: str = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            timeout: float = DEFAULT_TIMEOUT,
+            retries: int = DEFAULT_RETRIES,
+            backoff: float = DEFAULT_BACKOFF) -> None:
+        self.client = ollama.AsyncClient(host=host, timeout=timeout)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    async def __aenter__(self) -> "AsyncSummerizer":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.client.close()
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Check if a failed request should be retried."""
+        if isinstance(error, ollama.ResponseError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, (ConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+    async def chat(self, prompt: str, description: str) -> str:
+        """Send the prompt followed by the description to the LLM, uses the cached response if there is one."""
+        if cache is not None:
+            cached = cache.get(MODEL, prompt, OPTIONS, description)
+            if cached is not None:
+                return cached
+
+        for attempt in range(self.retries + 1):
+            async with self.semaphore:
+                try:
+                    stream = await asyncio.wait_for(self.client.chat(
+                        model=MODEL,
+                        messages=[{'role': 'user',
+                                   'content': prompt + description}],
+                        stream=False,
+                        options=OPTIONS,
+                    ), timeout=self.timeout)
+                    break
+                except Exception as e:  # pylint: disable=broad-except
+                    if attempt == self.retries or not self.is_retryable(e):
+                        raise
+            # back off without holding a slot so other requests can run meanwhile
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+        response = stream["message"]["content"]
+
+        if cache is not None:
+            cache.put(MODEL, prompt, OPTIONS, description, response)
+        return response
+
+    async def gen_resume_query(self, description: str) -> str:
+        """Create a textual query from description."""
+        if query_mode == "local":
+            return local_resume_query(description)
+        return await self.chat(RESUME_QUERY_PROMPT, description)
+
+    async def extract_keywords(self, description: str) -> list[str]:
+        """Extracts keywords from the description."""
+        if query_mode == "local":
+            return local_keywords(description)
+        return parse_keywords(await self.chat(KEYWORDS_PROMPT, description))
+
+    async def gen_resume_queries(self, descriptions: list[str], return_exceptions: bool = False) -> list[str]:
+        """Create a textual query for every description concurrently.
+
+        If `return_exceptions` is set, failed descriptions get their exception instead of a query.
+        """
+        return await asyncio.gather(
+            *(self.gen_resume_query(description) for description in descriptions), return_exceptions=return_exceptions)
+
+    async def extract_keywords_many(self, descriptions: list[str], return_exceptions: bool = False) -> list[list[str]]:
+        """Extract the keywords of every description concurrently.
+
+        If `return_exceptions` is set, failed descriptions get their exception instead of keywords.
+        """
+        return await asyncio.gather(
+            *(self.extract_keywords(description) for description in descriptions), return_exceptions=return_exceptions)
+
+    async def summerize(self, description: str) -> tuple[str, list[str]]:
+        """Create the query and extract the keywords of a description concurrently."""
+        query, keywords = await asyncio.gather(
+            self.gen_resume_query(description), self.extract_keywords(description))
+        return query, keywords
+
+
+def gen_resume_queries(descriptions: list[str], return_exceptions: bool = False, **summerizer_options) -> list[str]:
+    """Create a textual query for every description, requests run concurrently through an AsyncSummerizer."""
+    async def run():
+        async with AsyncSummerizer(**summerizer_options) as summerizer:
+            return await summerizer.gen_resume_queries(descriptions, return_exceptions=return_exceptions)
+    return asyncio.run(run())
+
+
+def extract_keywords_many(descriptions: list[str], return_exceptions: bool = False, **summerizer_options) -> list[list[str]]:
+    """Extract the keywords of every description, requests run concurrently through an AsyncSummerizer."""
+    async def run():
+        async with AsyncSummerizer(**summerizer_options) as summerizer:
+            return await summerizer.extract_keywords_many(descriptions, return_exceptions=return_exceptions)
+    return asyncio.run(run())
+
+
 # print(gen_resume_query("""
 # Required Knowledge, Skills and Abilities
 # Basic knowledge of AUTOCAD or comparable program
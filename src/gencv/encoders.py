@@ -0,0 +1,161 @@
+"""Module for the backends TextEncoder runs embedding models with.
+
+Backends have a sentence transformers style `encode` method. The torch backend runs the model
+with sentence transformers, the onnx backend exports the model to ONNX once and runs it with
+ONNX Runtime, which is faster on CPUs, optionally with its weights quantized to int8. Each
+backend, model and quantization has its own key that embedding caches and compiled bundles are
+stored under so their embeddings are never mixed.
+"""
+
+import json
+import os
+from typing import Literal, Optional
+
+import numpy as np
+
+Backend = Literal["torch", "onnx"]
+BACKENDS = ("torch", "onnx")
+DEFAULT_MODEL = "mixedbread-ai/mxbai-embed-large-v1"
+# 384 dimensional model that is several times faster on cpu, it's trained with the same query instruction
+SMALL_MODEL = "BAAI/bge-small-en-v1.5"
+MODEL_ALIASES = {"default": DEFAULT_MODEL, "small": SMALL_MODEL}
+# longest input in tokens, the models above are trained on up to 512 tokens
+MAX_LENGTH = 512
+ONNX_OPSET = 17
+
+
+def resolve_model(model_name: Optional[str]) -> str:
+    "Get the model name for a model name or alias, None is the default model."
+    if model_name is None:
+        return DEFAULT_MODEL
+    return MODEL_ALIASES.get(model_name, model_name)
+
+
+def backend_key(backend: Backend, model_name: str, quantize: bool = False) -> str:
+    """Key embeddings made by a backend and model are stored under.
+
+    The unquantized torch backend is keyed by the bare model name so caches and bundles made
+    before backends were added stay valid.
+    """
+    if backend == "torch" and not quantize:
+        return model_name
+    return f"{model_name}@{backend}{'-int8' if quantize else ''}"
+
+
+def export_onnx(model_name: str, export_dir: str, quantize: bool = False) -> str:
+    "Export a model to ONNX and quantize its weights to int8 if asked, returns the model file, exports are reused."
+    model_dir = os.path.join(export_dir, model_name.replace("/", "__"))
+    path = os.path.join(model_dir, "model.onnx")
+    if not os.path.exists(path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        model = AutoModel.from_pretrained(model_name).eval()
+        inputs = dict(AutoTokenizer.from_pretrained(
+            model_name)(["export"], return_tensors="pt"))
+        axes = {0: "batch", 1: "sequence"}
+        os.makedirs(model_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model, (inputs,), tmp_path, input_names=list(inputs), output_names=["last_hidden_state"],
+                dynamic_axes={name: axes for name in [*inputs, "last_hidden_state"]}, opset_version=ONNX_OPSET)
+        os.replace(tmp_path, path)
+    if not quantize:
+        return path
+
+    quantized_path = os.path.join(model_dir, "model.int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+        quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+    return quantized_path
+
+
+def pooling_mode(model_name: str) -> Literal["cls", "mean"]:
+    "Get how a sentence transformers model pools token embeddings, models without a pooling config are mean pooled."
+    from huggingface_hub import hf_hub_download
+    from huggingface_hub.utils import EntryNotFoundError
+
+    try:
+        config_path = hf_hub_download(model_name, "1_Pooling/config.json")
+    except EntryNotFoundError:
+        return "mean"
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return "cls" if config.get("pooling_mode_cls_token") else "mean"
+
+
+class TorchBackend:
+    """Runs a model with sentence transformers in PyTorch, quantize converts its linear layers to dynamic int8."""
+
+    def __init__(self, model_name: str, quantize: bool = False, threads: int = None) -> None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        if quantize:
+            self.model = torch.quantization.quantize_dynamic(
+                self.model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts, batch_size: int = 32, **_):
+        "Embed a text or a list of texts."
+        return self.model.encode(texts, batch_size=batch_size)
+
+
+class OnnxBackend:
+    """Runs a model exported to ONNX with ONNX Runtime on the CPU."""
+
+    def __init__(self, model_name: str, export_dir: str, quantize: bool = False, threads: int = None) -> None:
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            export_onnx(model_name, export_dir, quantize), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        # the hidden size is the only fixed axis of the output
+        self.dim: int = self.session.get_outputs()[0].shape[-1]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.pooling = pooling_mode(model_name)
+
+    def encode_batch(self, texts: list[str]) -> np.ndarray:
+        "Embed a batch of texts with one session run."
+        inputs = self.tokenizer(texts, padding=True, truncation=True,
+                                max_length=MAX_LENGTH, return_tensors="np")
+        hidden = self.session.run(None, {name: value.astype(np.int64) for name, value in inputs.items()
+                                         if name in self.input_names})[0]
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1)
+
+    def encode(self, texts, batch_size: int = 32, **_):
+        "Embed a text or a list of texts."
+        if isinstance(texts, str):
+            return self.encode_batch([texts])[0]
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        # batch texts of similar length together so there is less padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self.encode_batch([texts[i] for i in rows])
+        return embeddings
+
+
+def load_backend(backend: Backend, model_name: str, quantize: bool = False, threads: int = None, export_dir: str = None):
+    "Load a model with a backend, ONNX exports are stored in `export_dir`."
+    if backend == "torch":
+        return TorchBackend(model_name, quantize, threads)
+    if backend == "onnx":
+        if export_dir is None:
+            raise ValueError("The onnx backend needs a folder to export models to.")
+        return OnnxBackend(model_name, export_dir, quantize, threads)
+    raise ValueError(
+        f"Unknown embedding backend {backend}, use one of {', '.join(BACKENDS)}.")
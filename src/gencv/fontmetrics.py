@@ -0,0 +1,243 @@
+"""Module for estimating how many lines a bullet takes up using the template font's glyph widths.
+
+Glyph advance widths are read from TFM or AFM font metric files and cached on disk as JSON keyed by
+a hash of the metric file, so each font is only parsed once. Fonts are found by path or with kpsewhich.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import subprocess
+from typing import Callable, Optional
+
+from gencv.utils import TemplateLayout
+
+# folder the parsed metrics are cached in, disabled when None
+cache_dir: Optional[str] = None
+
+# fonts whose metrics couldn't be found, they're only warned about once
+missing_fonts: set[str] = set()
+# bounds the line counts and word widths memoized by each LineEstimator, long running daemons see many bullets
+LINE_CACHE_SIZE = 8192
+WORD_CACHE_SIZE = 8192
+
+# (text, bold keywords) -> lines
+LineCounter = Callable[[str, Optional[list[str]]], int]
+
+POINTS_PER_UNIT = {"pt": 1.0, "bp": 72.27 / 72, "in": 72.27,
+                   "cm": 72.27 / 2.54, "mm": 72.27 / 25.4}
+
+
+def set_cache_dir(path: Optional[str]):
+    """Set the folder parsed font metrics are cached in."""
+    global cache_dir  # pylint: disable=global-statement
+    cache_dir = path
+
+
+def parse_dimension(dimension: str) -> float:
+    """Convert a TeX dimension like 7in or 505pt to points."""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*(pt|bp|in|cm|mm)\s*", dimension)
+    if match is None:
+        raise ValueError(
+            f"Invalid dimension {dimension}, use a number followed by pt, bp, in, cm or mm.")
+    return float(match.group(1)) * POINTS_PER_UNIT[match.group(2)]
+
+
+class FontMetrics:
+    """Glyph advance widths of a font, in ems so they scale with the font size."""
+
+    def __init__(self, widths: dict[str, float], space: float) -> None:
+        self.widths = widths
+        self.space = space
+        # used for glyphs the font doesn't have
+        self.default = sum(widths.values()) / len(widths) if widths else 0.5
+
+    def width(self, char: str) -> float:
+        "Get the width of a character in ems."
+        return self.widths.get(char, self.default)
+
+    def to_dict(self) -> dict:
+        "Convert to a JSON serializable dict."
+        return {"widths": self.widths, "space": self.space}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FontMetrics":
+        "Load from a dict created by to_dict."
+        return cls(data["widths"], data["space"])
+
+
+def parse_afm(path: str) -> FontMetrics:
+    """Parse the character widths of an Adobe font metrics file."""
+    widths: dict[str, float] = {}
+    space = None
+    with open(path, "r", encoding="latin-1") as f:
+        for line in f:
+            if not line.startswith("C "):
+                continue
+            fields = dict(field.strip().split(" ", 1)
+                          for field in line.split(";") if field.strip())
+            code, width = int(fields["C"]), float(fields["WX"]) / 1000
+            if fields.get("N") == "space":
+                space = width
+            elif 32 < code < 127:
+                widths[chr(code)] = width
+    if space is None:
+        # common default for fonts without a space glyph
+        space = 0.25
+    return FontMetrics(widths, space)
+
+
+def parse_tfm(path: str) -> FontMetrics:
+    """Parse the character widths of a TeX font metric file.
+
+    Character codes are mapped to ASCII, which the printable range of the OT1 and T1 encodings mostly follows.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    # lengths in 4 byte words of each table, see the TFtoPL documentation for the format
+    lf, lh, bc, ec, nw, nh, nd, ni, nl, nk, ne, np = struct.unpack(
+        ">12H", data[:24])
+    if lf * 4 != len(data):
+        raise ValueError(f"{path} is not a valid TFM file.")
+
+    def fix_words(start: int, count: int) -> list[float]:
+        return [word / 2 ** 20 for word in struct.unpack(f">{count}i", data[start * 4:(start + count) * 4])]
+
+    char_info_start = 6 + lh
+    width_start = char_info_start + ec - bc + 1
+    param_start = width_start + nw + nh + nd + ni + nl + nk + ne
+    widths_table = fix_words(width_start, nw)
+    widths: dict[str, float] = {}
+    for code in range(max(bc, 33), min(ec, 126) + 1):
+        width_index = data[(char_info_start + code - bc) * 4]
+        # index 0 means the character doesn't exist
+        if width_index:
+            widths[chr(code)] = widths_table[width_index]
+    params = fix_words(param_start, np)
+    # the second parameter is the interword space
+    space = params[1] if np > 1 else 0.25
+    return FontMetrics(widths, space)
+
+
+def find_font_file(font: str) -> Optional[str]:
+    """Find a font metric file by path or by name with kpsewhich, TFM files are preferred."""
+    if os.path.isfile(font):
+        return font
+    if shutil.which("kpsewhich") is None:
+        return None
+    for ext in (".tfm", ".afm"):
+        result = subprocess.run(["kpsewhich", font + ext], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, check=False)
+        if result.returncode == 0 and result.stdout.strip():
+            return result.stdout.strip()
+    return None
+
+
+def load_font_metrics(font: str) -> Optional[FontMetrics]:
+    """Load the metrics of a font, from the on disk cache if it was parsed before. Returns None if the font can't be found."""
+    path = find_font_file(font)
+    if path is None:
+        return None
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    cache_path = os.path.join(
+        cache_dir, f"{digest}.json") if cache_dir is not None else None
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return FontMetrics.from_dict(json.load(f))
+
+    metrics = parse_afm(path) if path.lower().endswith(
+        ".afm") else parse_tfm(path)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metrics.to_dict(), f)
+        os.replace(tmp_path, cache_path)
+    return metrics
+
+
+def bold_mask(text: str, bold: Optional[list[str]]) -> list[bool]:
+    """Mark the characters that are typeset in bold, every occurence of a bold keyword is bolded when the template is filled."""
+    mask = [False] * len(text)
+    for keyword in bold or []:
+        if not keyword:
+            continue
+        start = text.find(keyword)
+        while start != -1:
+            mask[start:start + len(keyword)] = [True] * len(keyword)
+            start = text.find(keyword, start + len(keyword))
+    return mask
+
+
+class LineEstimator:
+    """Counts the lines a bullet wraps to by breaking it at spaces like ragged right text."""
+
+    def __init__(self, regular: FontMetrics, bold: FontMetrics, font_size: float, text_width: float) -> None:
+        self.regular = regular
+        self.bold = bold
+        self.font_size = font_size
+        # in ems so widths don't need to be scaled
+        self.line_width = text_width / font_size
+        # wrapped per estimator, a cache on the class would keep every estimator alive in its keys
+        self.word_width = functools.lru_cache(maxsize=WORD_CACHE_SIZE)(self.word_width)
+        self.__count_lines = functools.lru_cache(maxsize=LINE_CACHE_SIZE)(self.__count_lines)
+
+    @classmethod
+    def from_layout(cls, layout: TemplateLayout) -> Optional["LineEstimator"]:
+        """Create an estimator for a template layout, returns None if the layout doesn't declare a font or it can't be found."""
+        if layout.font is None or layout.text_width is None:
+            return None
+        regular = load_font_metrics(layout.font)
+        bold = load_font_metrics(
+            layout.bold_font) if layout.bold_font is not None else regular
+        if regular is None or bold is None:
+            if layout.font not in missing_fonts:
+                missing_fonts.add(layout.font)
+                logging.warning(
+                    "Font metrics for %s were not found, estimating lines by character count.", layout.font)
+            return None
+        return cls(regular, bold, layout.font_size, parse_dimension(layout.text_width))
+
+    def word_width(self, word: str) -> float:
+        "Width of a regular word in ems, words repeat a lot between bullets so they're memoized."
+        return sum(self.regular.width(char) for char in word)
+
+    def cache_info(self) -> dict[str, functools._CacheInfo]:
+        "Hits, misses and sizes of the memoized line counts and word widths."
+        return {"lines": self.__count_lines.cache_info(), "words": self.word_width.cache_info()}
+
+    def count_lines(self, text: str, bold: Optional[list[str]] = None) -> int:
+        "Count the lines a text wraps to."
+        return self.__count_lines(text, tuple(bold or ()))
+
+    def __count_lines(self, text: str, bold: tuple[str, ...]) -> int:
+        "Count the lines a text wraps to, memoized by text and bold keywords."
+        mask = bold_mask(text, bold) if bold else None
+        lines = 0
+        line = 0.0
+        position = 0
+        for word in text.split(" "):
+            end = position + len(word)
+            if word:
+                if mask is None or not any(mask[position:end]):
+                    width = self.word_width(word)
+                else:
+                    width = sum((self.bold if is_bold else self.regular).width(char)
+                                for char, is_bold in zip(word, mask[position:end]))
+                if lines and line + self.regular.space + width <= self.line_width:
+                    line += self.regular.space + width
+                else:
+                    lines += 1
+                    line = width
+                    # words wider than a line overflow into the next lines
+                    while line > self.line_width:
+                        lines += 1
+                        line -= self.line_width
+            position = end + 1
+        return lines
@@ -0,0 +1,109 @@
+"""Module for building the resume query from a description without the LLM.
+
+Skills from the bundled vocabulary in skills.txt that appear in the description come first, followed
+by the key phrases with the best RAKE scores. Phrases are the runs of words between punctuation and
+stopwords, and each word is scored by the number of words in the phrases it appears in divided by
+how often it appears, so words that are part of longer phrases are ranked higher.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+from gencv.lexical import STOPWORDS, TOKEN_PATTERN, tokenize
+
+SKILLS_PATH = os.path.join(os.path.dirname(__file__), "skills.txt")
+# the most keywords in a query, skills count towards it
+MAX_QUERY_PHRASES = 24
+# longer phrases are usually sentence fragments rather than qualifications
+MAX_PHRASE_WORDS = 3
+# punctuation and list markers that end a phrase, periods only when they end a sentence
+PHRASE_BREAK_PATTERN = re.compile(r"[,;:!?()\[\]{}<>\"|•*\n\t]|\.(?![a-z0-9])|\s[-–—]\s")
+# numbers like 3+ or 5 are left out of phrases
+LETTER_PATTERN = re.compile("[a-z]")
+# words that are common in job descriptions but not qualifications
+PHRASE_STOPWORDS = STOPWORDS | frozenset((
+    "abilities", "ability", "able", "about", "across", "all", "also", "any", "apply", "based", "basic",
+    "being", "benefits", "both", "can", "candidate", "candidates", "company", "degree", "demonstrated",
+    "desired", "do", "duties", "each", "environment", "equivalent", "etc", "excellent", "experience",
+    "experienced", "familiar", "familiarity", "good", "great", "has", "have", "help", "highly", "ideal", "if",
+    "including", "job", "knowledge", "looking", "may", "more", "must", "need", "needs", "not", "other", "plus",
+    "position", "preferred", "proficiency", "proficient", "qualifications", "related", "required", "requirements",
+    "responsibilities", "role", "should", "skills", "strong", "such", "team", "understanding", "us", "we",
+    "well", "what", "who", "within", "work", "working", "would", "year", "years"))
+
+
+@lru_cache(maxsize=1)
+def load_skills() -> tuple[dict[tuple[str, ...], str], int]:
+    """Load the skills vocabulary, maps the terms of each skill to how it's written and gives the most terms in a skill."""
+    skills: dict[tuple[str, ...], str] = {}
+    with open(SKILLS_PATH, encoding="utf-8") as f:
+        for line in f:
+            skill = line.strip()
+            if not skill or skill.startswith("#"):
+                continue
+            terms = tuple(tokenize(skill))
+            if terms:
+                skills.setdefault(terms, skill)
+    return skills, max((len(terms) for terms in skills), default=0)
+
+
+def match_skills(description: str) -> list[str]:
+    """Find the skills in a description, the most mentioned first, longer skills are matched over the skills they contain."""
+    skills, max_terms = load_skills()
+    terms = tokenize(description)
+    counts: dict[str, int] = {}
+    i = 0
+    while i < len(terms):
+        for n in range(min(max_terms, len(terms) - i), 0, -1):
+            skill = skills.get(tuple(terms[i:i + n]))
+            if skill is not None:
+                # dicts keep insertion order so ties stay in the order they're mentioned
+                counts[skill] = counts.get(skill, 0) + 1
+                i += n
+                break
+        else:
+            i += 1
+    return sorted(counts, key=counts.get, reverse=True)
+
+
+def extract_phrases(description: str) -> list[str]:
+    """Extract the key phrases of a description ranked by RAKE score."""
+    phrases: list[tuple[str, ...]] = []
+    for fragment in PHRASE_BREAK_PATTERN.split(description.lower()):
+        phrase: list[str] = []
+        for word in TOKEN_PATTERN.findall(fragment) + [None]:
+            if word is None or word in PHRASE_STOPWORDS or not LETTER_PATTERN.search(word):
+                if 0 < len(phrase) <= MAX_PHRASE_WORDS:
+                    phrases.append(tuple(phrase))
+                phrase = []
+            else:
+                phrase.append(word)
+
+    frequencies: dict[str, int] = {}
+    degrees: dict[str, int] = {}
+    for phrase in phrases:
+        for word in phrase:
+            frequencies[word] = frequencies.get(word, 0) + 1
+            degrees[word] = degrees.get(word, 0) + len(phrase)
+    scores = {phrase: sum(degrees[word] / frequencies[word] for word in phrase) for phrase in dict.fromkeys(phrases)}
+    return [" ".join(phrase) for phrase in sorted(scores, key=scores.get, reverse=True)]
+
+
+def local_keywords(description: str, max_phrases: int = MAX_QUERY_PHRASES) -> list[str]:
+    """Extract the keywords of a description, the matched skills followed by the key phrases that add new terms."""
+    keywords = match_skills(description)[:max_phrases]
+    covered = {term for keyword in keywords for term in tokenize(keyword)}
+    for phrase in extract_phrases(description):
+        if len(keywords) >= max_phrases:
+            break
+        terms = set(tokenize(phrase))
+        if not terms <= covered:
+            keywords.append(phrase)
+            covered |= terms
+    return keywords
+
+
+def local_resume_query(description: str) -> str:
+    """Create a textual query from description without the LLM."""
+    return ", ".join(local_keywords(description))
@@ -1,13 +1,18 @@
 from dataclasses import dataclass
 from enum import Flag
+import functools
+import hashlib
 import json
+import re
 import subprocess
 import os
-from typing import Literal
-from numpy import fromregex
+from typing import Literal, NamedTuple, Optional
 import yaml
 from pylatexenc.latexencode import utf8tolatex
-from .utils import TemplateYAML
+from .utils import TemplateYAML, TemplateLayout, calculate_lines
+from .fontmetrics import LineCounter, LineEstimator
+from .latexformat import engine_version, run_with_format
+from .cache import BuildCache, hash_text
 from pydantic import BaseModel
 import shutil
 import datetime
@@ -19,121 +24,240 @@ class ExperiencePlaceHolder(BaseModel):
     n: int
 
 
+# upper bound on memoized escapes so long running batches and the daemon don't grow without bound
+ESCAPE_CACHE_SIZE = 16_384
+ITEM_SLOT_PATTERN = re.compile(r"%(metatext[1-5]|bullets)%")
+BULLET_TEXT_KW = r"%text%"
+
+
+@functools.lru_cache(maxsize=ESCAPE_CACHE_SIZE)
+def escape_latex(text: str) -> str:
+    """Escape text for latex, memoized since the same bullets and metatexts are rendered over and over."""
+    return utf8tolatex(text)
+
+
+@functools.lru_cache(maxsize=ESCAPE_CACHE_SIZE)
+def bold_pattern(keywords: tuple[str, ...]) -> Optional[re.Pattern]:
+    """Regex matching any of the escaped bold keywords, longer keywords win when keywords overlap."""
+    escaped = sorted({escape_latex(keyword)
+                     for keyword in keywords if keyword}, key=len, reverse=True)
+    if not escaped:
+        return None
+    return re.compile("|".join(re.escape(keyword) for keyword in escaped))
+
+
+def bold_keywords(text: str, keywords: Optional[list[str]]) -> str:
+    """Wrap every occurence of the bold keywords in escaped text with \\textbf in one pass."""
+    pattern = bold_pattern(tuple(keywords)) if keywords else None
+    if pattern is None:
+        return text
+    return pattern.sub(lambda match: rf"\textbf{{{match.group()}}}", text)
+
+
+class ItemTemplate:
+    """Item template from the YAML file compiled into literal segments and placeholder slots."""
+
+    def __init__(self, template: TemplateYAML) -> None:
+        # split with a capture group so odd indices are slot names and even indices are literals
+        self.segments = ITEM_SLOT_PATTERN.split(template.template)
+        self.bullet_segments = template.bullet.split(BULLET_TEXT_KW)
+
+    def render_bullet(self, bullet: "BulletData") -> str:
+        "Render a bullet."
+        return bold_keywords(escape_latex(bullet.text), bullet.bold).join(self.bullet_segments)
+
+    def render(self, data: "ExperienceData") -> str:
+        "Render an experience and its bullets."
+        values = {
+            "metatext1": escape_latex(data.metatext1),
+            "metatext2": escape_latex(data.metatext2),
+            "metatext3": escape_latex(data.metatext3),
+            "metatext4": escape_latex(data.metatext4),
+            "metatext5": escape_latex(data.metatext5),
+            "bullets": "\n".join(self.render_bullet(bullet) for bullet in data.bullets),
+        }
+        parts = self.segments.copy()
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
+
 def fill_item_template(template: TemplateYAML, data: "ExperienceData") -> str:
     """Fills the item templat specified in the YAML file."""
-    bullet_text_kw = r"%text%"
-    bullets_kw = r"%bullets%"
-    metatext1kw = r"%metatext1%"
-    metatext2kw = r"%metatext2%"
-    metatext3kw = r"%metatext3%"
-    metatext4kw = r"%metatext4%"
-    metatext5kw = r"%metatext5%"
-
-    compiled_bullets: list[str] = []
-    for bullet in data.bullets:
-        text = utf8tolatex(bullet.text)
-        for bold_kw in bullet.bold:
-            ltx_bold_kw = utf8tolatex(bold_kw)
-            text = text.replace(utf8tolatex(
-                ltx_bold_kw), rf"\textbf{{{ltx_bold_kw}}}")
-        compiled_bullet = template.bullet.replace(
-            bullet_text_kw, text)
-        compiled_bullets.append(compiled_bullet)
-
-    compiled_template = template.template \
-        .replace(metatext1kw, utf8tolatex(data.metatext1)) \
-        .replace(metatext2kw, utf8tolatex(data.metatext2)) \
-        .replace(metatext3kw, utf8tolatex(data.metatext3)) \
-        .replace(metatext4kw, utf8tolatex(data.metatext4)) \
-        .replace(metatext5kw, utf8tolatex(data.metatext5)) \
-        .replace(bullets_kw, "\n".join(compiled_bullets))
-
-    return compiled_template
+    return ItemTemplate(template).render(data)
+
+
+def unlink_shared(path: str):
+    """Remove a file if it is hard linked to other files, so writing to the path doesn't change them."""
+    if os.path.exists(path) and os.stat(path).st_nlink > 1:
+        os.remove(path)
+
+
+class TemplateSlot(NamedTuple):
+    """A %GENCV placeholder in a parsed template."""
+    placetype: str
+    n: int
+    # start and end index of the placeholder in the normalized template
+    start: int
+    end: int
+    # placeholder text, kept if the type has no item template
+    text: str
+
+
+class ParsedTemplate(NamedTuple):
+    """Template split into the literal segments around its placeholder slots, there is one more segment than slots."""
+    segments: tuple[str, ...]
+    slots: tuple[TemplateSlot, ...]
+
+
+# runs of characters between the spaces and newlines that separate tokens
+TOKEN_PATTERN = re.compile(r"[^ \n]+")
+PLACEHOLDER_MARKER = r"%GENCV"
+
+
+def parse_template(file_template: str) -> ParsedTemplate:
+    """Tokenize a latex template in one pass and find its placeholders.
+
+    Tokens are split at spaces and newlines and stripped of other whitespace like tabs, except for the last token.
+    A placeholder is a %GENCV token followed by a JSON object with the experience type and the amount of experiences.
+    """
+    normalized: list[str] = []
+    # (token, start, end) in the normalized template
+    tokens: list[tuple[str, int, int]] = []
+    position = 0
+    length = 0
+    for match in TOKEN_PATTERN.finditer(file_template):
+        separators = file_template[position:match.start()]
+        token = match.group()
+        if match.end() != len(file_template):
+            token = token.strip()
+        normalized.append(separators)
+        normalized.append(token)
+        length += len(separators)
+        tokens.append((token, length, length + len(token)))
+        length += len(token)
+        position = match.end()
+    normalized.append(file_template[position:])
+    text = "".join(normalized)
+
+    segments: list[str] = []
+    slots: list[TemplateSlot] = []
+    segment_start = 0
+    token_iter = iter(tokens)
+    for token, start, _ in token_iter:
+        if token != PLACEHOLDER_MARKER:
+            continue
+        # the argument runs from the token starting with { to the token ending with }
+        arg_start = None
+        for val, val_start, val_end in token_iter:
+            if arg_start is None and val.startswith("{"):
+                arg_start = val_start
+            if val.endswith("}"):
+                break
+        else:
+            raise ValueError(
+                f"{PLACEHOLDER_MARKER} placeholder at index {start} has no closing brace.")
+        arg = text[arg_start:val_end] if arg_start is not None else ""
+        placeholder = ExperiencePlaceHolder(**json.loads(arg.strip()))
+        segments.append(text[segment_start:start])
+        slots.append(TemplateSlot(placeholder.placetype, placeholder.n,
+                     start, val_end, text[start:val_end]))
+        segment_start = val_end
+    segments.append(text[segment_start:])
+    return ParsedTemplate(tuple(segments), tuple(slots))
 
 
 class TexResumeTemplate:
     """Class for loading and filling latex templates."""
+    # bump when the parsed template format changes so old cache entries are ignored
+    PARSED_VERSION = 1
+    # folder parsed templates are cached in, disabled when None
+    cache_dir: Optional[str] = None
 
     def __init__(self, template_folder_path: str) -> None:
+        self.template_folder_path = template_folder_path
         with open(os.path.join(template_folder_path, "+resume.tex"), "r", encoding="utf-8") as f:
             self.file_template = f.read()
-
         with open(os.path.join(template_folder_path, "+resume.yaml"), "r", encoding="utf-8") as f:
-            self.item_templates: dict[str, dict] = yaml.safe_load(f)
-
-        self.command_stack = self.create_command_stack()
+            item_templates_yaml = f.read()
+
+        self.parsed, self.item_templates, layout = self.load_parsed(
+            self.file_template, item_templates_yaml)
+        self.layout = TemplateLayout(**layout)
+        # validated and compiled once instead of on every fill
+        self.item_renderers = {exp_type: ItemTemplate(TemplateYAML(**template))
+                               for exp_type, template in self.item_templates.items()}
+        self.__line_counter: LineCounter = None
         # tuple is start index and end index of where the place holder is in the string
-        self.args: list[tuple[ExperiencePlaceHolder, tuple[int, int]]] = []
-        self.compile()
-
-    def create_command_stack(self):
-        """Parses latex file to create command stack."""
-        chars = ""
-        stack = []
-        for char in self.file_template:
-            if char == " ":
-                stack.append(chars.strip())
-                stack.append(" ")
-                chars = ""
-            elif char == "\n":
-                stack.append(chars.strip())
-                stack.append("\n")
-                chars = ""
-            else:
-                chars += char
-        # append last word
-        stack.append(chars)
-        return stack
-
-    def compile(self):
-        """Compiles latex template file, extracts placeholder arguments."""
-        commands = enumerate(self.command_stack)
-        self.command_stack: list
-        args = []
-        for i, command in commands:
-            if command == r"%GENCV":
-                arg = ""
-                in_arg = False
-                arg_start_indx = i
-                while True:
-                    i, val = next(commands)
-                    if val.startswith("{"):
-                        in_arg = True
-                    if in_arg:
-                        arg += val
-                    if val.endswith("}"):
-                        in_arg = False
-                        break
-                arg_end_indx = i + 1
-                args.append((ExperiencePlaceHolder(**json.loads(arg.strip())),
-                            (arg_start_indx, arg_end_indx)))
-        self.args = args
-
-    def fill(self, experiences: list["ExperienceData"]):
-        """Fills the template with resume data. Returns new command stack."""
-        displacement = 0
-        filled_latex_stack = self.command_stack.copy()
-        for exp_type, template in self.item_templates.items():
-            template = TemplateYAML(**template)
-            filled_latex_items = []
-            for exp in experiences:
-                if exp.experience_type == exp_type:
-                    filled_latex = fill_item_template(template, exp)
-                    filled_latex_items.append(filled_latex)
-
-            for arg in self.args:
-                if arg[0].placetype == exp_type:
-
-                    filled_latex_stack = filled_latex_stack[:arg[1][0] - displacement] + \
-                        filled_latex_items + \
-                        filled_latex_stack[arg[1][1] - displacement:]
-
-                    displacement = len(self.command_stack) - \
-                        len(filled_latex_stack)
-        return filled_latex_stack
+        self.args: list[tuple[ExperiencePlaceHolder, tuple[int, int]]] = [
+            (ExperiencePlaceHolder(placetype=slot.placetype, n=slot.n), (slot.start, slot.end)) for slot in self.parsed.slots]
+
+    @functools.cached_property
+    def asset_hash(self) -> str:
+        "Hash of every file in the template folder, changes when any asset the template uses changes."
+        parts: list[str] = []
+        for root, dirs, files in os.walk(self.template_folder_path):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                parts += [os.path.relpath(path,
+                                          self.template_folder_path), digest]
+        return hash_text(*parts)
+
+    @classmethod
+    def set_cache_dir(cls, cache_dir: Optional[str]):
+        "Set the folder parsed templates are cached in."
+        cls.cache_dir = cache_dir
+
+    @classmethod
+    def load_parsed(cls, file_template: str, item_templates_yaml: str) -> tuple[ParsedTemplate, dict[str, dict], dict]:
+        """Parse a template and its item templates, uses the cached result if the files were parsed before.
+
+        Returns the parsed template, the item templates and the layout settings.
+        """
+        cache_path = None
+        if cls.cache_dir is not None:
+            key = hash_text(str(cls.PARSED_VERSION), hash_text(
+                file_template), hash_text(item_templates_yaml))
+            cache_path = os.path.join(cls.cache_dir, f"{key}.json")
+            if os.path.exists(cache_path):
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                parsed = ParsedTemplate(tuple(cached["segments"]), tuple(
+                    TemplateSlot(*slot) for slot in cached["slots"]))
+                return parsed, cached["item_templates"], cached["layout"]
+
+        parsed = parse_template(file_template)
+        item_templates: dict[str, dict] = yaml.safe_load(item_templates_yaml)
+        # the layout key holds page fit settings instead of an experience type
+        layout = item_templates.pop("layout", None) or {}
+        if cache_path is not None:
+            os.makedirs(cls.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"segments": parsed.segments, "slots": parsed.slots,
+                           "item_templates": item_templates, "layout": layout}, f)
+            os.replace(tmp_path, cache_path)
+        return parsed, item_templates, layout
+
+    def fill(self, experiences: list["ExperienceData"]) -> str:
+        """Fills the template with resume data. Returns the filled latex."""
+        filled_items: dict[str, str] = {}
+        for exp_type, item_template in self.item_renderers.items():
+            filled_items[exp_type] = "".join(
+                item_template.render(exp) for exp in experiences if exp.experience_type == exp_type)
+
+        parts = [self.parsed.segments[0]]
+        for slot, segment in zip(self.parsed.slots, self.parsed.segments[1:]):
+            # placeholders without an item template are left as they are
+            parts.append(filled_items.get(slot.placetype, slot.text))
+            parts.append(segment)
+        return "".join(parts)
 
     @staticmethod
-    def to_file(output_dir, filename, latex: str | list[str],  output_name=None, compiler: Literal["pdflatex"] = "pdflatex", proxy_dir: str = None, output: Literal["pdf", "tex", "all"] = "all"):
+    def to_file(output_dir, filename, latex: str | list[str],  output_name=None, compiler: Literal["pdflatex"] = "pdflatex", proxy_dir: str = None, output: Literal["pdf", "tex", "all"] = "all", synctex: bool = True, format_dir: str = None, build_cache: BuildCache = None, assets_hash: str = ""):
         """
         Converts a LaTeX string into a PDF using the terminal LaTeX compiler.
 
@@ -141,9 +265,13 @@ class TexResumeTemplate:
             file_path (str): Path where the PDF will be saved.
             latex_string (str): The LaTeX content as a string.
             latex_compiler (str): The LaTeX compiler to use (default is "pdflatex").
+            synctex (bool): Generate synctex data for jumping between the source and the PDF.
+            format_dir (str): Folder of cached preamble formats, builds start from the preamble's format when given.
+            build_cache (BuildCache): Cache of built PDFs, the PDF isn't built again if the same latex was built before.
+            assets_hash (str): Hash of the template assets, see TexResumeTemplate.asset_hash.
 
         Returns:
-            None: The PDF is generated at the specified file path.
+            str: Path of the generated output file.
         """
 
         # Extract the base name (without extension) to use for .tex and .pdf
@@ -151,6 +279,28 @@ class TexResumeTemplate:
         proxy_dir_exists = True
         if output_name is None:
             output_name = f"{filename}_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+        if not isinstance(latex, str):
+            latex = "".join(latex)
+
+        build_key = None
+        if build_cache is not None and output != "tex":
+            version = engine_version(compiler)
+            if version is not None:
+                build_key = build_cache.make_key(
+                    latex, assets_hash, f"{compiler} {version}")
+        if build_key is not None:
+            if output == "pdf":
+                pdf_path = os.path.join(output_dir, f"{output_name}.pdf")
+            else:
+                os.makedirs(output_dir, exist_ok=True)
+                pdf_path = os.path.join(output_dir, filename + ".pdf")
+            if build_cache.get(build_key, pdf_path):
+                if output == "all":
+                    with open(os.path.join(output_dir, filename + ".tex"), 'w') as tex_file:
+                        tex_file.write(latex)
+                print(f"PDF loaded from the build cache at {output_dir}.")
+                return pdf_path
+
         # Ensure the output directory exists
         if output == "pdf":
             build_dir = proxy_dir
@@ -168,40 +318,60 @@ class TexResumeTemplate:
 
         # Create the full path for the .tex file
         tex_file_path = os.path.join(build_dir, filename + ".tex")
+        built_pdf_path = os.path.join(build_dir, filename + ".pdf")
 
         # Write the LaTeX string to a .tex file
-        if output == "tex":
-            with open(tex_file_path, 'w') as tex_file:
-                if isinstance(latex, str):
-                    tex_file.write(latex)
-                else:
-                    tex_file.write("".join(latex))
-            return
-
         with open(tex_file_path, 'w') as tex_file:
-            if isinstance(latex, str):
-                tex_file.write(latex)
-            else:
-                tex_file.write("".join(latex))
+            tex_file.write(latex)
+        if output == "tex":
+            return tex_file_path
 
         # Compile the LaTeX file using the specified LaTeX compiler
-
-        # Call the LaTeX compiler using subprocess
-        result = subprocess.run([compiler, '-interaction=nonstopmode', '-synctex=1', filename + ".tex"],
-                                cwd=build_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        command = [compiler, '-interaction=nonstopmode']
+        if synctex:
+            command.append('-synctex=1')
+
+        # outputs placed from the build cache are hard links, replace them instead of letting the compiler write through
+        unlink_shared(built_pdf_path)
+        result = None
+        if format_dir is not None:
+            result = run_with_format(
+                latex, filename, build_dir, command, compiler, format_dir)
+        # build the whole document if there is no format or the document doesn't work with it
+        if result is None or result.returncode != 0:
+            # Call the LaTeX compiler using subprocess
+            result = subprocess.run([*command, filename + ".tex"],
+                                    cwd=build_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
         # Check if the compilation was successful
         if result.returncode == 0:
             print(f"PDF successfully generated at {output_dir}.")
+            if build_key is not None and os.path.exists(built_pdf_path):
+                build_cache.put(build_key, built_pdf_path)
         else:
             print(
                 f"Error during PDF generation: {result.stderr.decode('utf-8')}")
 
         if output == "pdf":
-            shutil.copy(os.path.join(build_dir, filename + ".pdf"),
-                        os.path.join(output_dir, f"{output_name}.pdf"))
+            pdf_path = os.path.join(output_dir, f"{output_name}.pdf")
+            unlink_shared(pdf_path)
+            shutil.copy(built_pdf_path, pdf_path)
             if not proxy_dir_exists:
                 shutil.rmtree(proxy_dir)
+            return pdf_path
+        return built_pdf_path
+
+    def get_line_counter(self) -> LineCounter:
+        """Get the function counting the lines a bullet takes up, uses the layout font's metrics if they can be found."""
+        if self.__line_counter is None:
+            estimator = LineEstimator.from_layout(self.layout)
+            if estimator is not None:
+                self.__line_counter = estimator.count_lines
+            else:
+                line_chars_lim = self.layout.line_chars_lim
+                self.__line_counter = lambda text, bold=None: calculate_lines(
+                    text, line_chars_lim)
+        return self.__line_counter
 
     def get_experience_args(self, experience_type: str) -> ExperiencePlaceHolder:
         """Get arguments for an experience."""
@@ -0,0 +1,108 @@
+"""Module for precompiling the preamble of a resume into a LaTeX format file.
+
+Loading the preamble packages takes most of a pdflatex run, so the preamble is dumped once into a
+.fmt file (like mylatexformat does) and later builds start from it and only typeset the document body.
+Formats are cached keyed by a hash of the preamble and the engine version.
+
+Everything in the preamble before a `%endofdump` line is dumped, or the whole preamble if there is no such line.
+The rest of the preamble is run on every build, for commands that can't be stored in a format.
+"""
+
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Optional
+
+from gencv.cache import hash_text
+
+BEGIN_DOCUMENT = r"\begin{document}"
+END_OF_DUMP = "%endofdump"
+
+# formats are only built by one thread at a time so parallel builds don't all build the same format
+_build_lock = threading.Lock()
+
+
+def split_preamble(latex: str) -> Optional[tuple[str, str]]:
+    """Split a document into the part of the preamble to dump and the rest, returns None if there is no document body."""
+    begin = latex.find(BEGIN_DOCUMENT)
+    if begin == -1:
+        return None
+    end_of_dump = latex.find(END_OF_DUMP, 0, begin)
+    split = begin if end_of_dump == -1 else end_of_dump
+    return latex[:split], latex[split:]
+
+
+@functools.lru_cache(maxsize=None)
+def engine_version(compiler: str) -> Optional[str]:
+    """Get the version line of a latex compiler, None if it isn't installed."""
+    if shutil.which(compiler) is None:
+        return None
+    result = subprocess.run([compiler, "--version"], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True, check=False)
+    return result.stdout.splitlines()[0] if result.stdout else None
+
+
+def format_name(preamble: str, compiler: str) -> Optional[str]:
+    """Name of the format for a preamble, None if the compiler isn't installed."""
+    version = engine_version(compiler)
+    if version is None:
+        return None
+    return f"gencv-{hash_text(compiler, version, preamble)[:24]}"
+
+
+def build_format(preamble: str, compiler: str, format_dir: str) -> Optional[str]:
+    """Get the format for a preamble, dumps it if it isn't cached. Returns the format name or None if dumping failed."""
+    name = format_name(preamble, compiler)
+    if name is None:
+        return None
+    format_path = os.path.join(format_dir, f"{name}.fmt")
+    with _build_lock:
+        if os.path.exists(format_path):
+            return name
+        os.makedirs(format_dir, exist_ok=True)
+        # dump in a temporary folder and move the format into place so other processes never see half a format
+        with tempfile.TemporaryDirectory(dir=format_dir) as build_dir:
+            with open(os.path.join(build_dir, f"{name}.tex"), "w", encoding="utf-8") as f:
+                f.write(preamble)
+                f.write("\n\\dump\n")
+            result = subprocess.run(
+                [compiler, "-ini", "-interaction=nonstopmode",
+                    f"-jobname={name}", f"&{compiler}", f"{name}.tex"],
+                cwd=build_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+            built_path = os.path.join(build_dir, f"{name}.fmt")
+            if result.returncode != 0 or not os.path.exists(built_path):
+                return None
+            os.replace(built_path, format_path)
+    return name
+
+
+def format_env(format_dir: str) -> dict:
+    """Environment for a compiler to find formats in the format folder before the default locations."""
+    env = os.environ.copy()
+    # the trailing separator keeps the default search path
+    env["TEXFORMATS"] = format_dir + os.pathsep + env.get("TEXFORMATS", "")
+    return env
+
+
+def run_with_format(latex: str, jobname: str, build_dir: str, command: list[str], compiler: str, format_dir: str) -> Optional[subprocess.CompletedProcess]:
+    """Typeset a document starting from its preamble's format, returns None if there is no usable format."""
+    parts = split_preamble(latex)
+    if parts is None:
+        return None
+    preamble, body = parts
+    name = build_format(preamble, compiler, format_dir)
+    if name is None:
+        return None
+    body_filename = f"{jobname}-body.tex"
+    body_path = os.path.join(build_dir, body_filename)
+    with open(body_path, "w", encoding="utf-8") as f:
+        f.write(body)
+    try:
+        return subprocess.run([*command, f"-fmt={name}", f"-jobname={jobname}", body_filename],
+                              cwd=build_dir, env=format_env(format_dir),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    finally:
+        os.remove(body_path)
@@ -0,0 +1,137 @@
+"""Module for scoring bullets by the keywords of a description with a BM25 inverted index.
+
+The index is built over the bullet texts when the data file is compiled and saved in the bundle.
+Lexical scores can replace the dense similarities, which doesn't need the encoder, be fused with
+them, or prefilter large libraries to the bullets that match any keyword before dense scoring.
+"""
+
+import math
+import re
+from typing import Literal, NamedTuple
+
+import numpy as np
+
+ScoringMode = Literal["dense", "hybrid", "lexical"]
+SCORING_MODES = ("dense", "hybrid", "lexical")
+# share of the fused score that comes from the lexical score
+DEFAULT_LEXICAL_WEIGHT = 0.3
+# experiences are ranked by the inverse of their similarity so lexical similarities are kept above 0
+MIN_LEXICAL_SIMILARITY = 1e-3
+# keeps terms like c++, c#, node.js and 3.5 whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9](?:[a-z0-9+#]|\.(?=[a-z0-9]))*")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it", "of", "on",
+    "or", "our", "that", "the", "their", "this", "to", "using", "was", "were", "will", "with", "you", "your"))
+
+
+def tokenize(text: str) -> list[str]:
+    "Split text into lowercase terms without stopwords."
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index over bullet texts scored with BM25.
+
+    The postings of term i are the bullet rows `bullets[offsets[i]:offsets[i + 1]]`. Their BM25
+    term weights in `weights` only depend on the bullet, so scoring a query only multiplies the
+    weights of each matched term by its idf.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, bullets: np.ndarray, weights: np.ndarray, n_bullets: int) -> None:
+        self.terms = terms
+        self.offsets = offsets
+        self.bullets = bullets
+        self.weights = weights
+        self.n_bullets = n_bullets
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(cls, texts: list[str]) -> "BM25Index":
+        "Index texts, row i of the scores is text i."
+        n_bullets = len(texts)
+        term_ids: dict[str, int] = {}
+        token_terms: list[int] = []
+        token_bullets: list[int] = []
+        lengths = np.zeros(n_bullets, dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            token_terms.extend(term_ids.setdefault(token, len(term_ids)) for token in tokens)
+            token_bullets.extend([row] * len(tokens))
+
+        # unique (term, bullet) pairs sorted by term are the postings, their counts are the term frequencies
+        stride = max(n_bullets, 1)
+        pairs, frequencies = np.unique(
+            np.array(token_terms, dtype=np.int64) * stride + np.array(token_bullets, dtype=np.int64),
+            return_counts=True)
+        bullets = (pairs % stride).astype(np.int32)
+        offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // stride, minlength=len(term_ids)), out=offsets[1:])
+        average_length = lengths.mean() if n_bullets and lengths.mean() > 0 else 1
+        weights = (frequencies * (cls.K1 + 1) / (
+            frequencies + cls.K1 * (1 - cls.B + cls.B * lengths[bullets] / average_length))).astype(np.float32)
+        return cls(np.array(list(term_ids), dtype=str), offsets, bullets, weights, n_bullets)
+
+    def idf(self, term_id: int) -> float:
+        "Inverse document frequency of a term."
+        frequency = self.offsets[term_id + 1] - self.offsets[term_id]
+        return math.log(1 + (self.n_bullets - frequency + 0.5) / (frequency + 0.5))
+
+    def scores(self, keywords: list[str]) -> np.ndarray:
+        "BM25 score of every bullet for keywords, keywords can be phrases and each of their terms counts once."
+        scores = np.zeros(self.n_bullets, dtype=np.float32)
+        for term in {term for keyword in keywords for term in tokenize(keyword)}:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            postings = slice(self.offsets[term_id], self.offsets[term_id + 1])
+            scores[self.bullets[postings]] += self.idf(term_id) * self.weights[postings]
+        return scores
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        "Arrays to save the index with np.savez."
+        return {"terms": self.terms, "offsets": self.offsets, "bullets": self.bullets, "weights": self.weights,
+                "n_bullets": np.array(self.n_bullets)}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "BM25Index":
+        "Load an index saved from to_arrays."
+        return cls(arrays["terms"], arrays["offsets"], arrays["bullets"], arrays["weights"], int(arrays["n_bullets"]))
+
+
+class LexicalQuery(NamedTuple):
+    """Keywords to score bullets with and how the lexical scores are used.
+
+    `prefilter_top_n` keeps only the bullets with the best lexical scores before dense scoring
+    and selection, 0 keeps every bullet.
+    """
+    index: BM25Index
+    keywords: list[str]
+    scoring: ScoringMode = "hybrid"
+    weight: float = DEFAULT_LEXICAL_WEIGHT
+    prefilter_top_n: int = 0
+
+
+def normalize_scores(scores: np.ndarray) -> np.ndarray:
+    "Scale scores so the best one is 1."
+    best = scores.max() if len(scores) else 0
+    return scores / best if best > 0 else np.zeros_like(scores)
+
+
+def top_rows(scores: np.ndarray, n: int) -> np.ndarray:
+    "Rows of the n best scores in row order, None to keep every row if there are at most n or none scored."
+    if n <= 0 or n >= len(scores) or not np.any(scores > 0):
+        return None
+    return np.sort(np.argpartition(-scores, n - 1)[:n])
+
+
+def fuse(dense: np.ndarray, lexical: np.ndarray, weight: float = DEFAULT_LEXICAL_WEIGHT) -> np.ndarray:
+    "Weighted sum of dense similarities and lexical scores scaled to the range of cosine similarities."
+    return (1 - weight) * dense + weight * normalize_scores(lexical)
+
+
+def lexical_similarities(lexical: np.ndarray) -> np.ndarray:
+    "Similarities from lexical scores alone."
+    return np.maximum(normalize_scores(lexical), MIN_LEXICAL_SIMILARITY)
@@ -0,0 +1,288 @@
+"""Module for selecting resume data by exactly solving the selection as a knapsack problem.
+
+The selection maximizes the total similarity of the selected bullets subject to the line budget,
+experience and group min/max bullets, the number of experiences per type in the template and
+dependant bullets only being selected with their dependency.
+
+It's solved with dynamic programming over tables indexed by (number of bullets or experiences, lines),
+built bottom up: bullets -> dependency clusters -> groups -> experiences -> experience types.
+Each table entry holds the best total similarity, -inf marks an infeasible entry.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import Literal
+
+import numpy as np
+
+from gencv.fontmetrics import LineCounter
+from gencv.latex_builder import TexResumeTemplate
+from gencv.resumeitems import ProcessedData, ResumeBulletItem, select_data
+from gencv.utils import calculate_lines
+
+DEFAULT_TIME_LIMIT = 2.0
+
+
+class SolverTimeoutError(Exception):
+    """The solver ran out of time."""
+
+
+class InfeasibleError(Exception):
+    """No selection satisfies every constraint."""
+
+
+class Deadline:
+    """Raises SolverTimeoutError once the time limit passes."""
+
+    def __init__(self, time_limit: float) -> None:
+        self.end = time.perf_counter() + time_limit
+
+    def check(self):
+        "Raise an error if the deadline has passed."
+        if time.perf_counter() > self.end:
+            raise SolverTimeoutError("Exact selection ran out of time.")
+
+
+def max_plus(a: np.ndarray, b: np.ndarray, deadline: Deadline) -> np.ndarray:
+    """Combine two tables, result[c, l] is the best a[c1, l1] + b[c2, l2] with c1 + c2 = c and l1 + l2 = l."""
+    result = np.full_like(a, -np.inf)
+    n_counts, n_lines = a.shape
+    for c, l in zip(*np.nonzero(np.isfinite(b))):
+        if c >= n_counts or l >= n_lines:
+            continue
+        np.maximum(result[c:, l:], a[:n_counts - c, :n_lines - l] + b[c, l],
+                   out=result[c:, l:])
+        deadline.check()
+    return result
+
+
+def find_split(a: np.ndarray, b: np.ndarray, c: int, l: int, value: float) -> tuple[int, int]:
+    """Find the entry of b that combined with a gave `value` at (c, l) in max_plus(a, b)."""
+    for c2, l2 in zip(*np.nonzero(np.isfinite(b))):
+        if c2 <= c and l2 <= l and a[c - c2, l - l2] + b[c2, l2] == value:
+            return c2, l2
+    raise LookupError(f"No split found for ({c}, {l}).")
+
+
+class Node(ABC):
+    """A table of best similarities and a way to recover the bullets behind each entry."""
+    table: np.ndarray
+
+    @abstractmethod
+    def backtrack(self, c: int, l: int) -> list[int]:
+        "Get the indices of the bullets selected for an entry of the table."
+
+
+class ItemNode(Node):
+    """A single bullet that can be selected or not."""
+
+    def __init__(self, index: int, similarity: float, lines: int, n_lines: int) -> None:
+        self.index = index
+        self.table = np.full((2, n_lines), -np.inf)
+        self.table[0, 0] = 0
+        if lines < n_lines:
+            self.table[1, lines] = similarity
+
+    def backtrack(self, c: int, l: int) -> list[int]:
+        return [self.index] if c == 1 else []
+
+
+class FoldNode(Node):
+    """Combines child nodes, the count of the result is the sum of the child counts.
+
+    `mode` controls the output table:
+        counts: counts outside [min_count, max_count] are infeasible
+        unit: the fold counts as one unit, row 0 is not selecting it and row 1 the best valid count
+        flat: a single row with the best valid count
+    `base` is a table the children are folded into, e.g. a forced dependency bullet.
+    `optional` adds the empty selection to a counts table.
+    """
+
+    def __init__(
+            self,
+            children: list[Node],
+            n_counts: int,
+            n_lines: int,
+            deadline: Deadline,
+            min_count: int = 0,
+            max_count: int = None,
+            mode: Literal["counts", "unit", "flat"] = "counts",
+            base: np.ndarray = None,
+            base_indices: list[int] = None,
+            optional: bool = False) -> None:
+        self.children = children
+        self.base_indices = base_indices or []
+        self.mode = mode
+        self.optional = optional
+
+        if base is None:
+            base = np.full((n_counts, n_lines), -np.inf)
+            base[0, 0] = 0
+        self.prefixes = [base]
+        for child in children:
+            child_table = child.table
+            if child_table.shape[0] > n_counts:
+                child_table = child_table[:n_counts]
+            elif child_table.shape[0] < n_counts:
+                child_table = np.vstack([child_table, np.full(
+                    (n_counts - child_table.shape[0], n_lines), -np.inf)])
+            self.prefixes.append(
+                max_plus(self.prefixes[-1], child_table, deadline))
+
+        self.folded = self.prefixes[-1].copy()
+        max_count = n_counts - 1 if max_count is None else max_count
+        self.folded[:min_count] = -np.inf
+        self.folded[max_count + 1:] = -np.inf
+
+        if mode == "counts":
+            self.table = self.folded.copy()
+            if optional:
+                self.table[0, 0] = max(self.table[0, 0], 0)
+        elif mode == "unit":
+            self.table = np.full((2, n_lines), -np.inf)
+            self.table[0, 0] = 0
+            if n_counts > 1:
+                self.best_counts = np.argmax(self.folded[1:], axis=0) + 1
+                self.table[1] = self.folded[1:].max(axis=0)
+        else:
+            self.best_counts = np.argmax(self.folded, axis=0)
+            self.table = self.folded.max(axis=0, keepdims=True)
+
+    def backtrack_fold(self, c: int, l: int) -> list[int]:
+        "Get the bullets behind an entry of the fold table."
+        indices = list(self.base_indices)
+        value = self.prefixes[-1][c, l]
+        for i in range(len(self.children), 0, -1):
+            child_table = self.children[i - 1].table
+            c2, l2 = find_split(self.prefixes[i - 1], child_table, c, l, value)
+            indices.extend(self.children[i - 1].backtrack(c2, l2))
+            c, l = c - c2, l - l2
+            value = self.prefixes[i - 1][c, l]
+        return indices
+
+    def backtrack(self, c: int, l: int) -> list[int]:
+        if self.mode == "counts":
+            if self.optional and c == 0 and l == 0 and not self.folded[0, 0] >= 0:
+                return []
+            return self.backtrack_fold(c, l)
+        if self.mode == "unit":
+            if c == 0:
+                return []
+            return self.backtrack_fold(int(self.best_counts[l]), l)
+        return self.backtrack_fold(int(self.best_counts[l]), l)
+
+
+def solve(
+        processed_datas: list[ProcessedData],
+        resume_template: TexResumeTemplate,
+        max_lines: int,
+        line_char_lim: int,
+        time_limit: float = DEFAULT_TIME_LIMIT,
+        count_lines: LineCounter = None) -> list[ProcessedData]:
+    """Select the data that maximizes total similarity without breaking any constraint.
+
+    Raises SolverTimeoutError if the time limit passes and InfeasibleError if the constraints can't be met.
+    """
+    deadline = Deadline(time_limit)
+    n_lines = max_lines + 1
+    template_types = {placeholder.placetype: placeholder.n
+                      for placeholder, _ in resume_template.args}
+
+    # bullet -> index of its processed data, so dependants can find their dependency
+    bullet_indices: dict[int, int] = {id(d.bullet): i
+                                      for i, d in enumerate(processed_datas)}
+
+    # experience id -> group id -> indices of bullets without a dependency
+    experience_groups: dict[str, dict[str, list[int]]] = {}
+    # bullet index -> indices of its dependants
+    dependants: dict[int, list[int]] = {}
+    experiences = {}
+    groups = {}
+    for i, d in enumerate(processed_datas):
+        if d.experience.experience_type not in template_types:
+            continue
+        experiences[d.experience.id] = d.experience
+        groups[d.group.id] = d.group
+        dependency: ResumeBulletItem = d.bullet.dependency
+        if dependency is None:
+            experience_groups.setdefault(d.experience.id, {}).setdefault(
+                d.group.id, []).append(i)
+        elif id(dependency) in bullet_indices:
+            dependants.setdefault(
+                bullet_indices[id(dependency)], []).append(i)
+
+    def similarity(i: int) -> float:
+        # the sorting data holds the inverse similarity
+        return 1 / processed_datas[i].sorting_data.bullet_similarity
+
+    def lines(i: int) -> int:
+        bullet = processed_datas[i].bullet
+        if count_lines is None:
+            return calculate_lines(bullet.text, line_char_lim)
+        return count_lines(bullet.text, bullet.bold)
+
+    def tree_size(i: int) -> int:
+        return 1 + sum(tree_size(j) for j in dependants.get(i, []))
+
+    def tree_node(i: int) -> Node:
+        "Node for a bullet and the bullets that depend on it."
+        if i not in dependants:
+            return ItemNode(i, similarity(i), lines(i), n_lines)
+        # the bullet is forced into the base so its dependants can only be selected with it
+        n_tree = 1 + tree_size(i)
+        base = np.full((n_tree, n_lines), -np.inf)
+        if lines(i) < n_lines:
+            base[1, lines(i)] = similarity(i)
+        return FoldNode([tree_node(j) for j in dependants[i]], n_tree, n_lines, deadline,
+                        base=base, base_indices=[i], optional=True)
+
+    type_experience_nodes: dict[str, list[Node]] = {
+        t: [] for t in template_types}
+    for exp_id, exp_groups in experience_groups.items():
+        experience = experiences[exp_id]
+        n_exp_bullets = sum(tree_size(i) for roots in exp_groups.values()
+                            for i in roots)
+        exp_max = n_exp_bullets if experience.max_bullets is None \
+            else min(experience.max_bullets, n_exp_bullets)
+        group_nodes = []
+        for group_id, roots in exp_groups.items():
+            group = groups[group_id]
+            n_group_bullets = sum(tree_size(i) for i in roots)
+            group_max = n_group_bullets if group.max is None \
+                else min(group.max, n_group_bullets)
+            # like the greedy selection, a min larger than the group can't be met so it's capped
+            group_min = 0 if group.min is None else min(
+                group.min, n_group_bullets)
+            group_nodes.append(FoldNode(
+                [tree_node(i) for i in roots], group_max + 1, n_lines, deadline,
+                min_count=group_min, max_count=group_max))
+
+        exp_min = 0 if experience.min_bullets is None else min(
+            experience.min_bullets, exp_max)
+        type_experience_nodes[experience.experience_type].append(FoldNode(
+            group_nodes, exp_max + 1, n_lines, deadline,
+            min_count=max(exp_min, 1), max_count=exp_max, mode="unit"))
+
+    type_nodes = [FoldNode(nodes, n + 1, n_lines, deadline, mode="flat")
+                  for t, n in template_types.items() for nodes in [type_experience_nodes[t]]]
+    root = FoldNode(type_nodes, 1, n_lines, deadline, mode="flat")
+
+    if not np.isfinite(root.table[0]).any():
+        raise InfeasibleError(
+            "No selection satisfies the line budget and bullet minimums.")
+    best_lines = int(np.argmax(root.table[0]))
+    return [processed_datas[i] for i in root.backtrack(0, best_lines)]
+
+
+def select_data_exact(
+        processed_datas: list[ProcessedData],
+        resume_template: TexResumeTemplate,
+        max_lines: int,
+        line_char_lim: int,
+        time_limit: float = DEFAULT_TIME_LIMIT,
+        count_lines: LineCounter = None) -> list[ProcessedData]:
+    """Selects the data with the exact solver, falls back to the greedy selection if it times out or is infeasible."""
+    try:
+        return solve(processed_datas, resume_template, max_lines, line_char_lim, time_limit, count_lines)
+    except (SolverTimeoutError, InfeasibleError):
+        return select_data(processed_datas, resume_template, max_lines, line_char_lim, count_lines)
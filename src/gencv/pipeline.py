@@ -0,0 +1,125 @@
+"Module containing the resume tailoring pipeline shared by the cli commands."
+
+from typing import Literal
+
+import numpy as np
+
+from gencv.latex_builder import TexResumeTemplate, ExperienceData, BulletData
+from gencv.resumeitems import (
+    ResumeBulletItem, ResumeExperienceItem, ProcessedData,
+    select_data, bullet_similarities, preprocess_bullets, process_data)
+from gencv.lexical import LexicalQuery, fuse, lexical_similarities, top_rows
+from gencv.optimizer import DEFAULT_TIME_LIMIT, select_data_exact
+from gencv.precision import CompactEmbeddings
+from gencv.utils import TemplateLayout
+
+# line budget of templates that don't declare a layout in +resume.yaml
+DEFAULT_LINE_CHARS_LIM = TemplateLayout().line_chars_lim
+DEFAULT_MAX_LINES = TemplateLayout().max_lines
+
+Optimizer = Literal["greedy", "exact"]
+
+
+def to_template_data(selected_data: list[ProcessedData]) -> list[ExperienceData]:
+    """Sort selected data and group the bullets by experience into the latex template interface."""
+    # sort selected data based on order and similarity
+    selected_data = sorted(selected_data, key=lambda x: x.sorting_data)
+
+    exp_id_data_map: dict[str, tuple[ResumeExperienceItem,
+                                     list[ResumeBulletItem]]] = {}
+    for d in selected_data:
+        if d.experience.id not in exp_id_data_map:
+            exp_id_data_map[d.experience.id] = (d.experience, [])
+        exp_id_data_map[d.experience.id][1].append(d.bullet)
+
+    template_data: list[ExperienceData] = []
+    for _, (experience, bullets) in exp_id_data_map.items():
+        template_bullets = []
+        for b in bullets:
+            template_bullets.append(BulletData(b.text, b.bold))
+        template_experience = ExperienceData(
+            id=experience.id,
+            experience_type=experience.experience_type,
+            bullets=template_bullets,
+            metatext1=experience.metatext1,
+            metatext2=experience.metatext2,
+            metatext3=experience.metatext3,
+            metatext4=experience.metatext4,
+            metatext5=experience.metatext5
+        )
+        template_data.append(template_experience)
+    return template_data
+
+
+def score_resume_data(
+        experiences: list[ResumeExperienceItem],
+        normalized_embeddings: np.ndarray | CompactEmbeddings,
+        query: str,
+        lexical: LexicalQuery = None) -> list[ProcessedData]:
+    """Score and rank every bullet against a query.
+
+    Bullets are scored by their dense similarity to the query unless a lexical query is given, then
+    its keywords' BM25 scores are fused with the dense similarities or replace them, which doesn't
+    load the encoder. The lexical scores can also prefilter the bullets that are scored and selected.
+    """
+    if lexical is None:
+        bullets = preprocess_bullets(
+            experiences, query, embedding_matrix=normalized_embeddings)
+        return process_data(bullets)
+
+    lexical_scores = lexical.index.scores(lexical.keywords)
+    rows = top_rows(lexical_scores, lexical.prefilter_top_n)
+    if rows is not None:
+        lexical_scores = lexical_scores[rows]
+    if lexical.scoring == "lexical":
+        similarities = lexical_similarities(lexical_scores)
+    else:
+        similarities = bullet_similarities(
+            experiences, query, normalized_embeddings, rows)
+        if lexical.scoring == "hybrid":
+            similarities = fuse(similarities, lexical_scores, lexical.weight)
+    bullets = preprocess_bullets(
+        experiences, query, similarities=similarities, rows=rows)
+    return process_data(bullets)
+
+
+def select_processed_data(
+        processed_data: list[ProcessedData],
+        resume_template: TexResumeTemplate,
+        optimizer: Optimizer = "greedy",
+        time_limit: float = DEFAULT_TIME_LIMIT) -> list[ProcessedData]:
+    """Select the scored bullets that fit in the template's line budget."""
+    layout = resume_template.layout
+    count_lines = resume_template.get_line_counter()
+    if optimizer == "exact":
+        return select_data_exact(processed_data, resume_template, layout.max_lines, layout.line_chars_lim,
+                                 time_limit, count_lines)
+    return select_data(processed_data, resume_template, layout.max_lines, layout.line_chars_lim, count_lines)
+
+
+def select_resume_data(
+        experiences: list[ResumeExperienceItem],
+        normalized_embeddings: np.ndarray | CompactEmbeddings,
+        resume_template: TexResumeTemplate,
+        query: str,
+        optimizer: Optimizer = "greedy",
+        time_limit: float = DEFAULT_TIME_LIMIT,
+        lexical: LexicalQuery = None) -> list[ProcessedData]:
+    """Score, rank and select the bullets that best match a query within the template's line budget."""
+    processed_data = score_resume_data(
+        experiences, normalized_embeddings, query, lexical)
+    return select_processed_data(processed_data, resume_template, optimizer, time_limit)
+
+
+def tailor_resume(
+        experiences: list[ResumeExperienceItem],
+        normalized_embeddings: np.ndarray | CompactEmbeddings,
+        resume_template: TexResumeTemplate,
+        query: str,
+        optimizer: Optimizer = "greedy",
+        time_limit: float = DEFAULT_TIME_LIMIT,
+        lexical: LexicalQuery = None) -> str:
+    """Fill a resume template with the bullets that best match a query."""
+    selected_data = select_resume_data(
+        experiences, normalized_embeddings, resume_template, query, optimizer, time_limit, lexical)
+    return resume_template.fill(to_template_data(selected_data))
@@ -0,0 +1,113 @@
+"""Module for storing bullet embeddings compactly for scoring.
+
+Embeddings can be kept as float32, float16 or int8 with a scale per vector, and truncated to
+their first dimensions since mxbai-embed-large is trained with Matryoshka representation learning,
+so a prefix of the vector is still a usable embedding once it is normalized again. Scores of
+the top K bullets can be recomputed from the full precision embeddings to fix their order.
+"""
+
+from typing import Literal, Optional
+
+import numpy as np
+
+from gencv.utils import TextEncoder
+
+Precision = Literal["float32", "float16", "int8"]
+PRECISIONS = ("float32", "float16", "int8")
+# float16 and int8 rows are converted to float32 in chunks that stay in the cpu cache
+SCORE_CHUNK_ROWS = 256
+INT8_MAX = 127
+
+
+class CompactEmbeddings:
+    """L2 normalized embeddings stored at a reduced precision and/or dimension for scoring.
+
+    `full` is the full precision embedding matrix used to rescore the top `rescore_top_k`
+    bullets, it can be a memory map since only the rescored rows are read.
+    """
+
+    def __init__(self, vectors: np.ndarray, scales: Optional[np.ndarray], precision: Precision, dims: Optional[int],
+                 full: np.ndarray = None, rescore_top_k: int = 0) -> None:
+        self.vectors = vectors
+        self.scales = scales
+        self.precision = precision
+        self.dims = dims
+        self.full = full
+        self.rescore_top_k = rescore_top_k if full is not None else 0
+
+    @classmethod
+    def from_embeddings(cls, embeddings: np.ndarray, precision: Precision = "float32", dims: int = None,
+                        rescore_top_k: int = 0) -> "CompactEmbeddings":
+        """Compact full precision embeddings, they are truncated to `dims` dimensions first if given."""
+        if precision not in PRECISIONS:
+            raise ValueError(
+                f"Unknown precision {precision}, use one of {', '.join(PRECISIONS)}.")
+        if dims is not None and len(embeddings) and not 0 < dims <= embeddings.shape[1]:
+            raise ValueError(
+                f"Can't truncate {embeddings.shape[1]} dimensional embeddings to {dims} dimensions.")
+        vectors = TextEncoder.normalize(embeddings[:, :dims] if dims is not None else embeddings)
+        scales = None
+        if precision == "float16":
+            vectors = vectors.astype(np.float16)
+        elif precision == "int8":
+            scales = np.abs(vectors).max(axis=1) / INT8_MAX if len(vectors) \
+                else np.zeros(0, dtype=np.float32)
+            scales[scales == 0] = 1
+            vectors = np.round(
+                vectors / scales[:, None]).astype(np.int8)
+            scales = scales.astype(np.float32)
+        return cls(vectors, scales, precision, dims, embeddings, rescore_top_k)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def nbytes(self) -> int:
+        "Bytes used by the compact vectors and scales, not counting the full precision embeddings."
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def similarities(self, vec: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        "Cosine similarity of an embedding to every row, or to the sorted `rows` when given."
+        full_query = TextEncoder.normalize(vec)
+        query = TextEncoder.normalize(vec[:self.dims]) if self.dims is not None else full_query
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if self.precision == "float32":
+            scores = vectors @ query
+        else:
+            if self.precision == "float16":
+                # numpy converts float16 to float32 several times slower than torch does
+                import torch
+                to_float32 = lambda chunk: torch.from_numpy(chunk).float().numpy()
+            else:
+                to_float32 = lambda chunk: chunk.astype(np.float32)
+            scores = np.empty(len(vectors), dtype=np.float32)
+            for start in range(0, len(vectors), SCORE_CHUNK_ROWS):
+                chunk = vectors[start:start + SCORE_CHUNK_ROWS]
+                scores[start:start + len(chunk)] = to_float32(chunk) @ query
+            if self.precision == "int8":
+                scores *= self.scales if rows is None else self.scales[rows]
+
+        k = min(self.rescore_top_k, len(scores))
+        if k > 0 and (self.precision != "float32" or self.dims is not None):
+            # sorted rows read the memory map sequentially
+            top = np.sort(np.argpartition(-scores, k - 1)[:k])
+            rescored = TextEncoder.normalize(
+                self.full[top if rows is None else rows[top]]) @ full_query
+            # approximate scores can be off by more than the gap to the top k, keep the rest ranked below it
+            np.minimum(scores, rescored.min(), out=scores)
+            scores[top] = rescored
+        return scores
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        "Arrays to save the compact embeddings with np.savez."
+        arrays = {"vectors": self.vectors}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, precision: Precision, dims: Optional[int], full: np.ndarray = None,
+                    rescore_top_k: int = 0) -> "CompactEmbeddings":
+        "Load compact embeddings saved from to_arrays."
+        scales = arrays["scales"] if "scales" in arrays else None
+        return cls(arrays["vectors"], scales, precision, dims, full, rescore_top_k)
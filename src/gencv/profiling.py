@@ -0,0 +1,167 @@
+"""Module for profiling the stages of a command.
+
+Stages record their wall time, process CPU time and how much the peak resident set size grew while
+they ran. Stages that run concurrently overlap, so their CPU time and peak RSS deltas include work
+done by the other stages. Counters like embedding batches are added by the code doing the work
+through the module profiler, which is disabled when None so the hooks cost nothing by default.
+
+Profiles are written as a JSON summary and a Chrome trace event file that can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, peak rss isn't recorded there
+    resource = None
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of the process in bytes, None if it can't be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes and macos reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageRecord(NamedTuple):
+    """Measurements of a finished stage, times are in seconds."""
+    name: str
+    thread: int
+    start: float
+    wall: float
+    cpu: float
+    peak_rss_delta: Optional[int]
+
+
+class Profiler:
+    """Records stages, counters and cache hit rates of a command."""
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_rss = peak_rss()
+        self.stages: list[StageRecord] = []
+        self.counters: dict[str, int] = {}
+        self.caches: dict[str, dict] = {}
+        # stages run in worker threads too
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        "Measure the code run in the context as a stage."
+        rss = peak_rss()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu
+            rss_delta = peak_rss() - rss if rss is not None else None
+            with self._lock:
+                self.stages.append(StageRecord(
+                    name, threading.get_ident(), start - self.start_wall, wall, cpu, rss_delta))
+
+    def count(self, name: str, n: int = 1):
+        "Add to a counter."
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_cache(self, cache):
+        "Record the hit/miss counters of a cache."
+        total = cache.hits + cache.misses
+        self.caches[cache.NAME] = {"hits": cache.hits, "misses": cache.misses,
+                                   "hit_rate": cache.hits / total if total else None}
+
+    def summary(self) -> dict:
+        "Get the profile as a JSON serializable dict, times are in milliseconds and memory in MB."
+        rss = peak_rss()
+        return {
+            "command": self.command,
+            "wall_ms": (time.perf_counter() - self.start_wall) * 1000,
+            "cpu_ms": (time.process_time() - self.start_cpu) * 1000,
+            "peak_rss_mb": rss / 2 ** 20 if rss is not None else None,
+            "stages": [{
+                "name": stage.name,
+                "start_ms": stage.start * 1000,
+                "wall_ms": stage.wall * 1000,
+                "cpu_ms": stage.cpu * 1000,
+                "peak_rss_delta_mb": stage.peak_rss_delta / 2 ** 20 if stage.peak_rss_delta is not None else None,
+            } for stage in sorted(self.stages, key=lambda stage: stage.start)],
+            "counters": self.counters,
+            "caches": self.caches,
+        }
+
+    def trace(self) -> dict:
+        "Get the profile as Chrome trace events, stages are complete events on the thread they ran on."
+        pid = os.getpid()
+        threads = {stage.thread for stage in self.stages}
+        events: list[dict] = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                               "args": {"name": f"gencv {self.command}"}}]
+        main_thread = threading.main_thread().ident
+        for thread in threads:
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread,
+                           "args": {"name": "main" if thread == main_thread else f"worker {thread}"}})
+        for stage in self.stages:
+            events.append({
+                "name": stage.name, "cat": "stage", "ph": "X", "pid": pid, "tid": stage.thread,
+                "ts": stage.start * 1e6, "dur": stage.wall * 1e6,
+                "args": {"cpu_ms": stage.cpu * 1000, "peak_rss_delta_bytes": stage.peak_rss_delta},
+            })
+        end = (time.perf_counter() - self.start_wall) * 1e6
+        if self.counters:
+            events.append({"name": "counters", "ph": "C", "pid": pid, "tid": main_thread,
+                           "ts": end, "args": self.counters})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"caches": self.caches}}
+
+    @staticmethod
+    def trace_path(path: str) -> str:
+        "Path the trace of a profile written to `path` is written to."
+        return os.path.splitext(path)[0] + ".trace.json"
+
+    def write(self, path: str):
+        "Write the JSON summary to a file and the Chrome trace next to it."
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        with open(self.trace_path(path), "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+
+
+# profiler the hooks record to, disabled when None
+profiler: Optional[Profiler] = None
+
+
+def set_profiler(new_profiler: Optional[Profiler]):
+    """Set the profiler stages and counters are recorded to."""
+    global profiler  # pylint: disable=global-statement
+    profiler = new_profiler
+
+
+def stage(name: str):
+    """Context measuring a stage with the module profiler, does nothing if profiling is disabled."""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name)
+
+
+def count(name: str, n: int = 1):
+    """Add to a counter of the module profiler."""
+    if profiler is not None:
+        profiler.count(name, n)
+
+
+def run_stage(name: str, func, *args, **kwargs):
+    """Call a function as a stage of the module profiler, for submitting stages to worker threads."""
+    with stage(name):
+        return func(*args, **kwargs)
@@ -1,5 +1,6 @@
 "Module contain functions and classes for working with resume items."
 
+import heapq
 import logging
 from typing import Literal, NamedTuple
 import uuid
@@ -7,24 +8,65 @@ from dataclasses import dataclass, field
 import torch
 import numpy as np
 
+from gencv.fontmetrics import LineCounter
 from gencv.latex_builder import TexResumeTemplate
+from gencv.precision import CompactEmbeddings
 from gencv.utils import TextEncoder, load_yaml, calculate_lines
 
 
+class EmbeddingStore:
+    """Contiguous matrix with the embedding of every bullet of a data set, bullets refer to their row.
+
+    Keeping one matrix instead of a tensor per bullet saves an object per bullet and lets the
+    pipeline work on views of the matrix.
+    """
+    __slots__ = ("matrix",)
+
+    def __init__(self, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def row(self, row: int) -> np.ndarray:
+        "Get a view of a row."
+        return self.matrix[row]
+
+    def rows(self, rows: np.ndarray) -> np.ndarray:
+        "Get the rows at the indices, rows in one contiguous range are returned as a view."
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+            return self.matrix[rows[0]:rows[-1] + 1]
+        return self.matrix[rows]
+
+    def mean(self, rows: np.ndarray) -> np.ndarray:
+        "Mean of the rows at the indices."
+        return self.rows(rows).mean(axis=0)
+
+
 class ResumeBulletItem:
-    """Class for holding and managing resume bullet item."""
+    """Class for holding and managing resume bullet item.
+
+    The embedding is a row of an EmbeddingStore shared by the data set, or a tensor owned by the
+    bullet when it was embedded on its own.
+    """
+    __slots__ = ("__text", "__embedding", "__store", "__row", "__dependants", "__dependency", "__parent",
+                 "order_", "order", "bold")
     DEFAULT_ORDER = 0
 
-    def __init__(self, text: str, order_: int, order: int = DEFAULT_ORDER, bold: list[str] = None) -> None:
+    def __init__(self, text: str, order_: int, order: int = DEFAULT_ORDER, bold: list[str] = None, embed: bool = True) -> None:
         self.__text = text
         self.__embedding = None
+        self.__store: EmbeddingStore = None
+        self.__row: int = None
         self.__dependants: list[ResumeBulletItem] = []
         self.__dependency = None
         self.__parent: ResumeBulletItem = None
         self.order_ = order_
         self.order = self.order = order if order is not None else self.DEFAULT_ORDER
         self.bold = bold
-        self.set_text(text)
+        # embedding can be skipped so it can be set later from a batched embedding pass
+        if embed:
+            self.set_text(text)
 
     def __str__(self) -> str:
         return self.__text
@@ -35,9 +77,33 @@ class ResumeBulletItem:
     def set_text(self, text: str) -> "ResumeBulletItem":
         "Set the bullet text."
         self.__text = text
-        self.__embedding = TextEncoder.embed(text)
+        self.set_embedding(TextEncoder.embed(text))
         return self
 
+    def set_embedding(self, embedding: torch.Tensor) -> "ResumeBulletItem":
+        "Set the bullet embedding, should be the embedding of the bullet text."
+        self.__embedding = embedding
+        self.__store = None
+        self.__row = None
+        return self
+
+    def attach(self, store: EmbeddingStore, row: int) -> "ResumeBulletItem":
+        "Use a row of an embedding store as the bullet embedding, should be the embedding of the bullet text."
+        self.__embedding = None
+        self.__store = store
+        self.__row = row
+        return self
+
+    @property
+    def store(self) -> EmbeddingStore:
+        "Get the embedding store holding the embedding, None if the bullet owns its embedding."
+        return self.__store
+
+    @property
+    def row(self) -> int:
+        "Get the row of the embedding in the store."
+        return self.__row
+
     def set_parent(self, parent_bullet_item: "ResumeBulletItem"):
         "Set the bullet parent."
         self.__parent = parent_bullet_item
@@ -64,8 +130,10 @@ class ResumeBulletItem:
         return self.__text
 
     @property
-    def embedding(self):
-        "Get embbeding."
+    def embedding(self) -> torch.Tensor:
+        "Get embbeding, embeddings in a store are returned as a view of the store row."
+        if self.__store is not None:
+            return torch.from_numpy(self.__store.row(self.__row))
         return self.__embedding
 
     def add_dependant(self, dependant):
@@ -81,7 +149,7 @@ class ResumeBulletItem:
         return self.__dependency
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GroupData:
     "Dataclass for holding group data."
     min: int
@@ -90,8 +158,18 @@ class GroupData:
     id: uuid.UUID = field(init=False, repr=True, default_factory=uuid.uuid4)
 
 
+def shared_store(bullets: list[ResumeBulletItem]) -> EmbeddingStore:
+    "Get the embedding store every bullet's embedding is in, None if they aren't all in the same store."
+    store = bullets[0].store if bullets else None
+    if store is None or any(bullet.store is not store for bullet in bullets):
+        return None
+    return store
+
+
 class ResumeExperienceItem:
     "Class for storing resume experience data."
+    __slots__ = ("order_", "id", "experience_type", "__bullets", "__embedding", "metatext1", "metatext2",
+                 "metatext3", "metatext4", "metatext5", "max_bullets", "min_bullets", "order")
     DEFAULT_ORDER = 0
 
     def __init__(self,
@@ -112,7 +190,7 @@ class ResumeExperienceItem:
         self.id = id
         self.experience_type = experience_type
         self.__bullets = [] if bullets is None else bullets
-        self.embedding = None
+        self.__embedding = None
         self.metatext1 = metatext1
         self.metatext2 = metatext2
         self.metatext3 = metatext3
@@ -134,15 +212,24 @@ class ResumeExperienceItem:
         self.update_embedding()
 
     def update_embedding(self):
-        "Update the experience embedding."
-        if len(self.__bullets) == 0:
-            return
-        # this should only calculate for the first 5
-        mean = torch.stack(
-            [bullet[0].embedding for bullet in self.__bullets], dim=0).mean(dim=0)
-        self.embedding = mean
+        "Mark the experience embedding as stale, it is recalculated the next time it's used."
+        self.__embedding = None
+
+    @property
+    def embedding(self) -> torch.Tensor:
+        "Get the mean embedding of the bullets, None if there are no bullets."
+        if self.__embedding is None and len(self.__bullets) != 0:
+            bullets = [bullet for bullet, _ in self.__bullets]
+            store = shared_store(bullets)
+            if store is not None:
+                self.__embedding = torch.from_numpy(store.mean(
+                    np.fromiter((bullet.row for bullet in bullets), dtype=np.intp, count=len(bullets))))
+            else:
+                self.__embedding = torch.stack(
+                    [bullet.embedding for bullet in bullets], dim=0).mean(dim=0)
         # self.embedding = TextEncoder.embed(
         #     ", ".join([bullet[0].text for bullet in self.__bullets]))
+        return self.__embedding
 
     @property
     def bullets(self):
@@ -195,54 +282,75 @@ class BreaksConstraintError(Exception):
     """Selecting a bullet would break a constraint."""
 
 
+def experience_similarities(experience_indices: np.ndarray, similarities: np.ndarray, n_experiences: int, top_n: int = 5) -> np.ndarray:
+    """Mean similarity of the first `top_n` bullets of each experience using segment reductions.
+
+    `experience_indices` maps each bullet to its experience, bullets keep their relative order within an experience.
+    """
+    order = np.argsort(experience_indices, kind="stable")
+    sorted_indices = experience_indices[order]
+    segment_starts = np.searchsorted(sorted_indices, np.arange(n_experiences))
+    position_in_segment = np.arange(len(sorted_indices)) - \
+        segment_starts[sorted_indices]
+    in_top_n = position_in_segment < top_n
+    totals = np.bincount(
+        sorted_indices[in_top_n], weights=similarities[order][in_top_n], minlength=n_experiences)
+    counts = np.bincount(sorted_indices[in_top_n], minlength=n_experiences)
+    return totals / np.maximum(counts, 1)
+
+
 def process_data(bullets: list[PreProcessedBullet]) -> list[ProcessedData]:
     """Finds how well an experience matches a description using the bullets embedding."""
-    #
-    exp_bullet_map: dict[str, tuple[list[ResumeBulletItem],
-                                    list[GroupData], list[float], ResumeExperienceItem]] = {}
-    for experience, (bullet, group), cos_sim in bullets:
-        # initialize
-        if experience.id not in exp_bullet_map:
-            exp_bullet_map[experience.id] = ([], [], [], experience)
-        exp_bullet_map[experience.id][0].append(bullet)
-        exp_bullet_map[experience.id][1].append(group)
-        exp_bullet_map[experience.id][2].append(cos_sim)
+    experience_index_map: dict[str, int] = {}
+    experience_indices = np.fromiter(
+        (experience_index_map.setdefault(b.experience.id, len(experience_index_map))
+         for b in bullets),
+        dtype=np.intp, count=len(bullets))
+    similarities = np.fromiter(
+        (float(b.similarity) for b in bullets), dtype=np.float64, count=len(bullets))
+    # only calculate the average of first 5 because most resume wont have more than 6 points
+    exp_similarities = experience_similarities(
+        experience_indices, similarities, len(experience_index_map))
 
     processed_datas: list[ProcessedData] = []
 
-    for _, (exp_bullets, exp_groups, exp_blt_similarities, experience) in exp_bullet_map.items():
-        # only calculate the average of first 6 because most resume wont have more than 6 points
-        exp_similarity = np.mean(exp_blt_similarities[:5])
-        for bullet, group, blt_sim in zip(exp_bullets, exp_groups, exp_blt_similarities):
-            sorting_keys = DataSortingKeys(
-                # descending
-                experience_order=experience.order,
-                # ascending order so take inverse
-                experience_similarity=1/exp_similarity,
-                # order doesn't matter
-                experience_id=experience.id,
-                # descending order
-                experience_order_=experience.order_,
-                # descending order
-                bullet_order=bullet.order,
-                # ascending order so take inverse
-                bullet_similarity=1/blt_sim,
-                # descending order
-                bullet_group_order_=group.order_,
-                # descending order
-                bullet_intergroup_order_=bullet.order_
-            )
-            data = ProcessedData(experience, bullet, group, sorting_keys)
-            processed_datas.append(data)
+    # keep bullets from the same experience together
+    for i in np.argsort(experience_indices, kind="stable"):
+        experience, (bullet, group), blt_sim = bullets[i]
+        exp_similarity = exp_similarities[experience_indices[i]]
+        sorting_keys = DataSortingKeys(
+            # descending
+            experience_order=experience.order,
+            # ascending order so take inverse
+            experience_similarity=1/exp_similarity,
+            # order doesn't matter
+            experience_id=experience.id,
+            # descending order
+            experience_order_=experience.order_,
+            # descending order
+            bullet_order=bullet.order,
+            # ascending order so take inverse
+            bullet_similarity=1/similarities[i],
+            # descending order
+            bullet_group_order_=group.order_,
+            # descending order
+            bullet_intergroup_order_=bullet.order_
+        )
+        data = ProcessedData(experience, bullet, group, sorting_keys)
+        processed_datas.append(data)
 
     return processed_datas
 
 
-def compile_yaml(data_file: str):
+def compile_yaml(data_file: str, batch_size: int = TextEncoder.DEFAULT_BATCH_SIZE):
     """Load yaml file and convert types into custom types."""
     compiled_experiences: list[ResumeExperienceItem] = []
     experiences = load_yaml(data_file)
 
+    # build the whole bullet tree before embedding so all bullets can be embedded in batches
+    pending_groups: list[tuple[ResumeExperienceItem,
+                               list[ResumeBulletItem], GroupData]] = []
+    all_bullets: list[ResumeBulletItem] = []
     for exp_i, data in enumerate(experiences):
         resume_experience = ResumeExperienceItem(
             id=data.id,
@@ -267,188 +375,211 @@ def compile_yaml(data_file: str):
             bullets = []
             for blt_i, point in enumerate(bullet_group.points):
                 bullet_item = ResumeBulletItem(
-                    point.text, order_=blt_i, order=point.order, bold=point.bold)
+                    point.text, order_=blt_i, order=point.order, bold=point.bold, embed=False)
                 bullets.append(bullet_item)
                 for depenant in point.dependants:
                     depenant_item = ResumeBulletItem(
-                        depenant.text, depenant.order, bold=depenant.bold)
+                        depenant.text, depenant.order, bold=depenant.bold, embed=False)
                     dependant_bullet = bullet_item.add_dependant(depenant_item)
                     dependant_bullet.order += 1
                     bullets.append(dependant_bullet)
 
-            resume_experience.add_group(bullets, group_data)
+            pending_groups.append((resume_experience, bullets, group_data))
+            all_bullets.extend(bullets)
 
         compiled_experiences.append(resume_experience)
+
+    embeddings = TextEncoder.embed_batch(
+        [bullet.text for bullet in all_bullets], batch_size=batch_size)
+    store = EmbeddingStore(torch.stack(embeddings).numpy().astype(np.float32, copy=False)
+                           if embeddings else np.zeros((0, 0), dtype=np.float32))
+    for row, bullet in enumerate(all_bullets):
+        bullet.attach(store, row)
+
+    for resume_experience, bullets, group_data in pending_groups:
+        resume_experience.add_group(bullets, group_data)
+
     return compiled_experiences
 
 
-def preprocess_bullets(compiled_experiences: list[ResumeExperienceItem], prompt) -> list[PreProcessedBullet]:
-    "Calculate embeddings for bullets."
+def bullet_embedding_matrix(compiled_experiences: list[ResumeExperienceItem]) -> np.ndarray:
+    "Stack the embeddings of every bullet into one L2 normalized matrix, rows are in the same order as the bullets."
+    bullets = [bullet for exp in compiled_experiences for bullet, _ in exp.bullets]
+    if len(bullets) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    store = shared_store(bullets)
+    if store is not None:
+        # gather rows straight from the store, a view when the bullets are in store order
+        return TextEncoder.normalize(store.rows(
+            np.fromiter((bullet.row for bullet in bullets), dtype=np.intp, count=len(bullets))))
+    return TextEncoder.normalize(torch.stack([bullet.embedding for bullet in bullets]).numpy())
+
+
+def bullet_similarities(compiled_experiences: list[ResumeExperienceItem], prompt, embedding_matrix: np.ndarray | CompactEmbeddings = None, rows: np.ndarray = None) -> np.ndarray:
+    "Cosine similarity of the prompt to every bullet, or to the bullets at `rows` when given."
+    if embedding_matrix is None:
+        embedding_matrix = bullet_embedding_matrix(compiled_experiences)
     prompt_embedding = TextEncoder.embed(prompt)
+    if len(embedding_matrix) == 0:
+        return np.zeros(0, dtype=np.float32)
+    if isinstance(embedding_matrix, CompactEmbeddings):
+        return embedding_matrix.similarities(prompt_embedding.numpy(), rows)
+    if rows is not None:
+        embedding_matrix = embedding_matrix[rows]
+    return TextEncoder.cosine_similarities(embedding_matrix, prompt_embedding.numpy())
+
+
+def preprocess_bullets(compiled_experiences: list[ResumeExperienceItem], prompt, embedding_matrix: np.ndarray | CompactEmbeddings = None, similarities: np.ndarray = None, rows: np.ndarray = None) -> list[PreProcessedBullet]:
+    """Calculate embeddings for bullets, `embedding_matrix` is the L2 normalized bullet embeddings or their compact embeddings.
+
+    Precomputed `similarities` are used instead of embedding the prompt if given. Only the bullets at the sorted
+    `rows` are kept if given, `similarities` then has one entry per kept bullet.
+    """
+    if similarities is None:
+        similarities = bullet_similarities(
+            compiled_experiences, prompt, embedding_matrix, rows)
+    similarities = similarities.tolist()
     datas = []
+    row = 0
+    kept = 0
     for exp in compiled_experiences:
         for bullet in exp.bullets:
-            datas.append(PreProcessedBullet(
-                exp,
-                bullet,
-                TextEncoder.cosine_similarity(
-                    prompt_embedding, bullet[0].embedding),
-            ))
+            if rows is None or (kept < len(rows) and rows[kept] == row):
+                datas.append(PreProcessedBullet(
+                    exp,
+                    bullet,
+                    similarities[kept],
+                ))
+                kept += 1
+            row += 1
     return datas
 
 
-def select_data(processed_datas: list[ProcessedData], resume_template: TexResumeTemplate, max_lines, line_char_lim) -> list[ProcessedData]:
-    """Selects which bullets to add based on similarity to query, constraints in data file, and constraints in latex template."""
-    logging.debug(
-        f"selecting data {processed_datas}, {resume_template}, {max_lines}, {line_char_lim}")
-    selected_datas: list[ProcessedData] = []
-    selected_datas_set: set[str] = set()
-    experience_bullet_selection_counter = {
-        d.experience.id: 0 for d in processed_datas}
-    group_bullet_selection_counter = {d.group.id: 0 for d in processed_datas}
-    total_lines_counter = 0
-    total_experience_type_selection_counter = {
-        d[0].placetype: set() for d in resume_template.args}
-    selected_experience_ids = set()
+def select_data(processed_datas: list[ProcessedData], resume_template: TexResumeTemplate, max_lines, line_char_lim, count_lines: LineCounter = None) -> list[ProcessedData]:
+    """Selects which bullets to add based on similarity to query, constraints in data file, and constraints in latex template.
+
+    Bullets are taken in order of similarity in three passes: first to meet experience minimums, then group
+    minimums, then until the line budget runs out. Experiences and groups are mapped to integer ids with list
+    backed counters and line costs are computed once, candidates come off a heap so only the bullets that are
+    visited before the line budget runs out get sorted. Lines are counted by character count unless a
+    `count_lines` function, e.g. from the template's font metrics, is given.
+    """
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug(
+            f"selecting data {processed_datas}, {resume_template}, {max_lines}, {line_char_lim}")
+
+    experience_index_map: dict[str, int] = {}
+    group_index_map: dict[uuid.UUID, int] = {}
+    experience_indices: list[int] = []
+    group_indices: list[int] = []
+    for d in processed_datas:
+        experience_indices.append(experience_index_map.setdefault(
+            d.experience.id, len(experience_index_map)))
+        group_indices.append(group_index_map.setdefault(
+            d.group.id, len(group_index_map)))
+
+    # the constraints of the first experience/group with an id, None means unconstrained
+    experience_max: list[int] = [None] * len(experience_index_map)
+    experience_min: list[int] = [None] * len(experience_index_map)
+    group_max: list[int] = [None] * len(group_index_map)
+    group_min: list[int] = [None] * len(group_index_map)
+    for i in reversed(range(len(processed_datas))):
+        d = processed_datas[i]
+        experience_max[experience_indices[i]] = d.experience.max_bullets
+        experience_min[experience_indices[i]] = d.experience.min_bullets
+        group_max[group_indices[i]] = d.group.max
+        group_min[group_indices[i]] = d.group.min
+    experience_counter = [0] * len(experience_index_map)
+    group_counter = [0] * len(group_index_map)
 
     # select most similar experience according to amount of experience per type outlined in templates
-    for d in sorted(processed_datas, key=lambda x: (x.sorting_data.experience_similarity, x.sorting_data.experience_id)):
-        if d.experience.experience_type not in total_experience_type_selection_counter:
-            continue
-        elif len(total_experience_type_selection_counter[d.experience.experience_type]) < resume_template.get_experience_args(d.experience.experience_type).n:
-            total_experience_type_selection_counter[d.experience.experience_type].add(
-                d.experience.id)
-            selected_experience_ids.add(d.experience.id)
-
-    # sort by only bullet similarity so best bullets are taken
-    similarity_sorted_data = sorted(
-        processed_datas, key=lambda x: x.sorting_data.bullet_similarity)
-
-    logging.debug("Sorted data:")
-    for d in similarity_sorted_data if logging.getLogger().getEffectiveLevel() <= logging.DEBUG else []:
-        log_processed_data(d)
-
-    def check_experience_selected(experience: ResumeExperienceItem):
-        "Raises error if the type does not exist in the template or if the max amount of experience for that type has been reached."
-        if experience.id not in selected_experience_ids:
-            raise BreaksConstraintError(
-                f"Experience: {experience.id} has not been selected."
-            )
+    experience_limits = {
+        d[0].placetype: resume_template.get_experience_args(d[0].placetype).n for d in resume_template.args}
+    experience_keys: dict[str, tuple] = {}
+    for d in processed_datas:
+        if d.experience.experience_type in experience_limits:
+            experience_keys.setdefault(d.experience.id, (
+                d.sorting_data.experience_similarity, d.experience.id, d.experience.experience_type))
+    selected_experiences = [False] * len(experience_index_map)
+    type_counter = {experience_type: 0 for experience_type in experience_limits}
+    for _, experience_id, experience_type in sorted(experience_keys.values()):
+        if type_counter[experience_type] < experience_limits[experience_type]:
+            type_counter[experience_type] += 1
+            selected_experiences[experience_index_map[experience_id]] = True
+
+    line_costs: dict[str, int] = {}
+
+    def line_cost(bullet: ResumeBulletItem) -> int:
+        if bullet.text not in line_costs:
+            line_costs[bullet.text] = calculate_lines(bullet.text, line_char_lim) if count_lines is None \
+                else count_lines(bullet.text, bullet.bold)
+        return line_costs[bullet.text]
+
+    selected_datas: list[ProcessedData] = []
+    selected_datas_set: set[str] = set()
+    total_lines = 0
+
+    def add_data_to_selection(i: int):
+        "Add a bullet after the bullets it depends on, these are counted towards the bullet's experience and group."
+        nonlocal total_lines
+        data = processed_datas[i]
+        chain = [data]
+        dependency = data.bullet.dependency
+        while dependency is not None:
+            chain.append(ProcessedData(
+                data.experience, dependency, data.group, data.sorting_data))
+            dependency = dependency.dependency
+        for d in reversed(chain):
+            if d.bullet.text in selected_datas_set:
+                continue
+            selected_datas.append(d)
+            selected_datas_set.add(d.bullet.text)
+            total_lines += line_cost(d.bullet)
+            experience_counter[experience_indices[i]] += 1
+            group_counter[group_indices[i]] += 1
+
+    # sort by only bullet similarity so best bullets are taken, the heap is drained lazily into `ranked`
+    # so later passes reuse the order and nothing after the line budget runs out is ever sorted
+    heap = [(d.sorting_data.bullet_similarity, i)
+            for i, d in enumerate(processed_datas)]
+    heapq.heapify(heap)
+    ranked: list[int] = []
+
+    def candidates():
+        "Yield candidate indices in order of similarity that don't break a max constraint."
+        position = 0
+        while total_lines < max_lines:
+            if position == len(ranked):
+                if not heap:
+                    return
+                ranked.append(heapq.heappop(heap)[1])
+            i = ranked[position]
+            position += 1
+            if debug:
+                log_processed_data(processed_datas[i])
+            e, g = experience_indices[i], group_indices[i]
+            if not selected_experiences[e] \
+                    or (experience_max[e] is not None and experience_counter[e] >= experience_max[e]) \
+                    or (group_max[g] is not None and group_counter[g] >= group_max[g]):
+                continue
+            yield i
 
-    def check_experience_max(experience: ResumeExperienceItem):
-        """Raises error if experience bullet max is met."""
-        if experience.max_bullets is None:
-            return
-        if experience_bullet_selection_counter[experience.id] >= experience.max_bullets:
-            raise BreaksConstraintError(
-                f"{experience.id} experience type max bullets reached.")
-
-    def check_experience_min(experience: ResumeExperienceItem):
-        """Raises error if experience bullet min is not met."""
-        if experience.min_bullets is None:
-            return
-        if experience_bullet_selection_counter[experience.id] < experience.min_bullets:
-            raise BreaksConstraintError(
-                f"{experience.id} experience type min bullets not met.")
-
-    def check_group_max(group: GroupData):
-        """Raises error if group bullet max is met."""
-        if group.max is None:
-            return
-        if group_bullet_selection_counter[group.id] >= group.max:
-            raise BreaksConstraintError(
-                f"{group} max bullets reached.")
-
-    def check_group_min(group: GroupData):
-        """Raises error if group bullet min is not met."""
-        if group.min is None:
-            return
-        if group_bullet_selection_counter[group.id] < group.min:
-            raise BreaksConstraintError(
-                f"{group} min bullets not reached.")
-
-    def check_lines_max():
-        """Raises error if max lines is met."""
-        if total_lines_counter >= max_lines:
-            raise BreaksConstraintError("Max lines is met.")
-
-    def add_data_to_selection(data: ProcessedData):
-        nonlocal total_lines_counter
-        if data.bullet.dependency is not None:
-            add_data_to_selection(ProcessedData(
-                data.experience, data.bullet.dependency, data.group, data.sorting_data))
-        if data.bullet.text not in selected_datas_set:
-            selected_datas.append(data)
-            selected_datas_set.add(data.bullet.text)
-            total_lines_counter += calculate_lines(
-                data.bullet.text, line_char_lim)
-            experience_bullet_selection_counter[data.experience.id] += 1
-            group_bullet_selection_counter[data.group.id] += 1
-            total_experience_type_selection_counter[data.experience.experience_type].add(
-                data.experience.id)
-
-    # loop through data in order and make sure conditions are not broken
     # first satisfy min requirement for experiences
-    logging.debug("\nSatisfying min requirements for experiences: ")
-    for data in similarity_sorted_data:
-        log_processed_data(data)
-        try:
-            # could but max lines in a seperate try except cause this function can just return of max lines raises an error. but not really worth it for the perforance boost.
-            check_lines_max()
-            check_experience_selected(data.experience)
-            check_experience_max(data.experience)
-            check_group_max(data.group)
-        except BreaksConstraintError as e:
-            logging.debug(
-                f"For the above bullet the following exception occured: {e} \nNOT ADDING BULLET.")
-            continue
-        try:
-            check_experience_min(data.experience)
-        except BreaksConstraintError as e:
-            logging.debug(
-                f"For the above bullet the following exception occured: {e} \nADDING BULLET.")
-            add_data_to_selection(data)
-            continue
-        logging.debug("No exception occured, NOT ADDING BULLET.")
+    for i in candidates():
+        e = experience_indices[i]
+        if experience_min[e] is not None and experience_counter[e] < experience_min[e]:
+            add_data_to_selection(i)
 
     # second satisfy min requirement for group
-    logging.debug("\nSatisfying min requirements for groups: ")
-    for data in similarity_sorted_data:
-        log_processed_data(data)
-        try:
-            check_lines_max()
-            check_experience_selected(data.experience)
-            check_experience_max(data.experience)
-            check_group_max(data.group)
-        except BreaksConstraintError as e:
-            logging.debug(
-                f"For the above bullet the following exception occured: {e} \nNOT ADDING BULLET.")
-            continue
-        try:
-            check_group_min(data.group)
-        except BreaksConstraintError as e:
-            logging.debug(
-                f"For the above bullet the following exception occured: {e} \nADDING BULLET.")
-            add_data_to_selection(data)
-            continue
-        logging.debug("No exception occured, NOT ADDING BULLET.")
+    for i in candidates():
+        g = group_indices[i]
+        if group_min[g] is not None and group_counter[g] < group_min[g]:
+            add_data_to_selection(i)
 
     # last keep adding bullets until a constraint is met (probably max lines)
-    logging.debug("\nSatisfying min requirements for experiences: ")
-    for data in similarity_sorted_data:
-        log_processed_data(data)
-        try:
-            check_lines_max()
-            check_experience_selected(data.experience)
-            check_experience_max(data.experience)
-            check_group_max(data.group)
-        except BreaksConstraintError as e:
-            logging.debug(
-                f"For the above bullet the following exception occured: {e} \nNOT ADDING BULLET.")
-            continue
-        logging.debug(
-            f"ADDING BULLET.")
-        add_data_to_selection(data)
+    for i in candidates():
+        add_data_to_selection(i)
 
     return selected_datas
 
@@ -0,0 +1,202 @@
+"""Module for a local daemon that keeps the encoder, compiled data and templates resident.
+
+The daemon speaks JSON over localhost HTTP:
+    GET  /health   -> {"status": "ok"}
+    POST /mkres    -> generate a resume, body is a MkresRequest
+    POST /preview  -> get the selected bullets without rendering, body is a PreviewRequest
+"""
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pydantic import ValidationError
+
+from gencv.batch import build_in_proxy
+from gencv.client import DEFAULT_HOST, DEFAULT_PORT, MkresRequest, PreviewRequest
+from gencv.compiled_data import CompiledData, load_compact_embeddings, load_lexical_index, load_or_compile
+from gencv import description_summerizer
+from gencv.description_summerizer import extract_keywords, gen_resume_query
+from gencv.latex_builder import TexResumeTemplate
+from gencv.lexical import BM25Index, LexicalQuery
+from gencv.pipeline import select_resume_data, to_template_data
+from gencv.utils import TextEncoder
+from gencv.watch import Snapshot, snapshot
+
+
+class ResumeService:
+    """Holds the resident data and templates, reloads them when their files change."""
+
+    def __init__(self, datafile: str, template_dir: str, proxy_dir: str, batch_size: int = TextEncoder.DEFAULT_BATCH_SIZE, optimizer_options: dict = None, scoring_options: dict = None, lexical_options: dict = None, build_options: dict = None, verbose: bool = False) -> None:
+        self.datafile = datafile
+        self.template_dir = template_dir
+        self.proxy_dir = proxy_dir
+        self.batch_size = batch_size
+        # keyword arguments for select_resume_data picking the optimizer
+        self.optimizer_options = optimizer_options or {}
+        # keyword arguments for load_compact_embeddings picking the scoring precision
+        self.scoring_options = scoring_options or {}
+        # keyword arguments for LexicalQuery, bullets are only scored by embedding when empty
+        self.lexical_options = lexical_options or {}
+        # keyword arguments for TexResumeTemplate.to_file
+        self.build_options = build_options or {}
+        self.verbose = verbose
+        self.__data: CompiledData = None
+        self.__normalized_embeddings = None
+        self.__lexical_index: BM25Index = None
+        self.__data_mtime: float = None
+        self.__templates: dict[str,
+                               tuple[Snapshot, TexResumeTemplate]] = {}
+        # the model and templates are shared so requests are handled one at a time
+        self.lock = threading.Lock()
+
+    def warm_up(self):
+        "Load the model and compile the data ahead of the first request."
+        # lexical scoring never embeds the query
+        if self.lexical_options.get("scoring") != "lexical":
+            TextEncoder.get_model()
+        self.get_data()
+
+    def get_data(self) -> CompiledData:
+        "Get the compiled data, recompiles it if the data file was modified."
+        mtime = os.path.getmtime(self.datafile)
+        if self.__data is None or mtime != self.__data_mtime:
+            self.__data = load_or_compile(
+                self.datafile, batch_size=self.batch_size)
+            self.__normalized_embeddings = load_compact_embeddings(
+                self.datafile, self.__data.embeddings, **self.scoring_options)
+            if self.lexical_options:
+                self.__lexical_index = load_lexical_index(self.datafile)
+            self.__data_mtime = mtime
+        return self.__data
+
+    def get_template(self, template: str) -> TexResumeTemplate:
+        "Get a parsed template, reparses it if any file in the template folder was modified."
+        template_path = os.path.join(self.template_dir, template)
+        # assets like .cls files and fonts count too, a new template also recomputes the asset hash the build cache uses
+        files = snapshot(template_path)
+        if template not in self.__templates or self.__templates[template][0] != files:
+            self.__templates[template] = (
+                files, TexResumeTemplate(template_path))
+        return self.__templates[template][1]
+
+    def select(self, request: PreviewRequest, query: str, keywords: list[str] = None):
+        "Select the data for a request, must be called while holding the lock."
+        data = self.get_data()
+        resume_template = self.get_template(request.template)
+        lexical = LexicalQuery(self.__lexical_index, keywords, **self.lexical_options) \
+            if self.lexical_options else None
+        selected_data = select_resume_data(
+            data.experiences, self.__normalized_embeddings, resume_template, query,
+            lexical=lexical, **self.optimizer_options)
+        # the daemon never exits normally so write new embeddings after every request
+        if TextEncoder.cache is not None:
+            TextEncoder.cache.flush()
+        return resume_template, selected_data
+
+    @staticmethod
+    def get_query(request: PreviewRequest) -> str:
+        "Get the query for a request, doesn't need the lock since it doesn't touch resident data."
+        if request.as_query:
+            return request.desc
+        query = gen_resume_query(request.desc)
+        if description_summerizer.cache is not None:
+            description_summerizer.cache.flush()
+        return query
+
+    def get_inputs(self, request: PreviewRequest) -> tuple[str, list[str]]:
+        "Get the query and the keywords of a request, each is None if the scoring doesn't use it."
+        query = None
+        if request.as_query or self.lexical_options.get("scoring") != "lexical":
+            query = self.get_query(request)
+        keywords = None
+        if self.lexical_options:
+            keywords = [request.desc] if request.as_query else extract_keywords(request.desc)
+            if description_summerizer.cache is not None:
+                description_summerizer.cache.flush()
+        return query, keywords
+
+    def preview(self, request: PreviewRequest) -> dict:
+        "Get the bullets that would be selected for a request."
+        query, keywords = self.get_inputs(request)
+        with self.lock:
+            _, selected_data = self.select(request, query, keywords)
+        experiences = []
+        for experience in to_template_data(selected_data):
+            experiences.append({
+                "id": experience.id,
+                "type": experience.experience_type,
+                "bullets": [bullet.text for bullet in experience.bullets],
+            })
+        return {"query": query, "experiences": experiences}
+
+    def mkres(self, request: MkresRequest) -> dict:
+        "Generate a resume for a request."
+        query, keywords = self.get_inputs(request)
+        with self.lock:
+            resume_template, selected_data = self.select(request, query, keywords)
+            resume = resume_template.fill(to_template_data(selected_data))
+        # each request builds in its own temporary folder under the proxy folder, which is always removed
+        path = build_in_proxy(
+            request.outdir, request.template, resume, self.proxy_dir, request.output,
+            output_name=request.outname, build_options=self.build_options, assets_hash=resume_template.asset_hash)
+        return {"query": query, "path": path}
+
+
+def make_handler(service: ResumeService):
+    "Create a request handler class bound to a service."
+
+    class Handler(BaseHTTPRequestHandler):
+        """Handles JSON requests to the daemon."""
+
+        def send_json(self, status: int, body: dict):
+            "Send a JSON response."
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            "Handle health checks."
+            if self.path == "/health":
+                self.send_json(200, {"status": "ok"})
+            else:
+                self.send_json(404, {"error": f"Unknown path {self.path}."})
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            "Handle mkres and preview requests."
+            routes = {"/mkres": (MkresRequest, service.mkres),
+                      "/preview": (PreviewRequest, service.preview)}
+            if self.path not in routes:
+                self.send_json(404, {"error": f"Unknown path {self.path}."})
+                return
+            request_type, handle = routes[self.path]
+            try:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                request = request_type(**json.loads(body))
+            except (ValueError, TypeError, ValidationError) as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            try:
+                self.send_json(200, handle(request))
+            except Exception as e:  # pylint: disable=broad-except
+                self.send_json(500, {"error": str(e)})
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            "Only log requests in verbose mode."
+            if service.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def serve(service: ResumeService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    "Run the daemon until interrupted."
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
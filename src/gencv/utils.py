@@ -1,13 +1,17 @@
 # Use a pipeline as a high-level helper
 # Load model directly
 import math
+import threading
 from typing import Literal, Optional
-from transformers import AutoTokenizer, AutoModel
-from sentence_transformers import SentenceTransformer
+import numpy as np
 import torch
 from pydantic import BaseModel
 import yaml
 
+from gencv import profiling
+from gencv.cache import EmbeddingCache
+from gencv.encoders import BACKENDS, DEFAULT_MODEL, Backend, backend_key, load_backend, resolve_model
+
 
 class TextEncoder:
     '''Helper class for making text embeddings.'''
@@ -17,7 +21,60 @@ class TextEncoder:
     # model = AutoModel.from_pretrained(
     #     "sentence-transformers/all-mpnet-base-v2")
 
-    model = SentenceTransformer("mixedbread-ai/mxbai-embed-large-v1")
+    MODEL_NAME = DEFAULT_MODEL
+    INSTRUCTION = "Represent this sentence for searching relevant passages: "
+    DEFAULT_BATCH_SIZE = 32
+
+    # backend and model set with configure
+    backend: Backend = "torch"
+    model_name: str = MODEL_NAME
+    quantize: bool = False
+    threads: Optional[int] = None
+    export_dir: Optional[str] = None
+    # loaded on first use since loading the model takes seconds
+    model = None
+    # the model can be requested from several threads at once, e.g. by the mkres stages, only one loads it
+    model_lock = threading.Lock()
+    # persistent embedding cache, disabled when None
+    cache: Optional[EmbeddingCache] = None
+
+    @classmethod
+    def configure(cls, backend: Backend = "torch", model_name: str = None, quantize: bool = False, threads: int = None, export_dir: str = None):
+        "Choose the backend and model used to embed text, `model_name` can be an alias like small, see gencv.encoders."
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown embedding backend {backend}, use one of {', '.join(BACKENDS)}.")
+        cls.backend = backend
+        cls.model_name = resolve_model(model_name)
+        cls.quantize = quantize
+        cls.threads = threads
+        cls.export_dir = export_dir
+        cls.model = None
+
+    @classmethod
+    def model_key(cls) -> str:
+        "Key of the backend and model that cached and compiled embeddings are stored under."
+        return backend_key(cls.backend, cls.model_name, cls.quantize)
+
+    @classmethod
+    def get_model(cls):
+        "Get the embedding model, loads it if it hasn't been loaded yet."
+        if cls.model is None:
+            with cls.model_lock:
+                if cls.model is None:
+                    cls.model = load_backend(
+                        cls.backend, cls.model_name, cls.quantize, cls.threads, cls.export_dir)
+        return cls.model
+
+    @classmethod
+    def set_model(cls, model):
+        "Set the model used to embed text, anything with a sentence transformers style encode method works."
+        cls.model = model
+
+    @classmethod
+    def set_cache(cls, cache: Optional[EmbeddingCache]):
+        "Set the cache used to look up embeddings before running the model."
+        cls.cache = cache
 
     @classmethod
     def embed(cls, text: str) -> torch.Tensor:
@@ -34,11 +91,52 @@ class TextEncoder:
 
         # embedding = torch.mean(last_hidden_state, dim=0)
 
+        if cls.cache is not None:
+            cached = cls.cache.get(cls.model_key(), cls.INSTRUCTION, text)
+            if cached is not None:
+                return torch.from_numpy(cached)
+
         # other api
-        embedding = torch.tensor(cls.model.encode(
-            "Represent this sentence for searching relevant passages: " + text))
+        with profiling.stage("embedding"):
+            encoded = cls.get_model().encode(cls.INSTRUCTION + text)
+        profiling.count("embedding_batches")
+        profiling.count("embedded_texts")
+        if cls.cache is not None:
+            cls.cache.put(cls.model_key(), cls.INSTRUCTION, text, encoded)
+        embedding = torch.tensor(encoded)
         return embedding
 
+    @classmethod
+    def embed_batch(cls, texts: list[str], batch_size: int = DEFAULT_BATCH_SIZE) -> list[torch.Tensor]:
+        '''Embeds many texts at once, only texts that are not cached are passed to the model in batches.'''
+        embeddings: list[Optional[torch.Tensor]] = [None] * len(texts)
+        # map uncached text to the indices it appears at so duplicates are only embedded once
+        uncached: dict[str, list[int]] = {}
+        for i, text in enumerate(texts):
+            cached = cls.cache.get(cls.model_key(), cls.INSTRUCTION,
+                                   text) if cls.cache is not None else None
+            if cached is not None:
+                embeddings[i] = torch.from_numpy(cached)
+            else:
+                uncached.setdefault(text, []).append(i)
+
+        if len(uncached) == 0:
+            return embeddings
+
+        uncached_texts = list(uncached)
+        with profiling.stage("embedding"):
+            encoded = cls.get_model().encode(
+                [cls.INSTRUCTION + text for text in uncached_texts], batch_size=batch_size)
+        profiling.count("embedding_batches", math.ceil(
+            len(uncached_texts) / batch_size))
+        profiling.count("embedded_texts", len(uncached_texts))
+        for text, vector in zip(uncached_texts, encoded):
+            if cls.cache is not None:
+                cls.cache.put(cls.model_key(), cls.INSTRUCTION, text, vector)
+            for i in uncached[text]:
+                embeddings[i] = torch.tensor(vector)
+        return embeddings
+
     @staticmethod
     def cosine_similarity(vec1: torch.Tensor, vec2: torch.Tensor):
         '''Compares two embeddings.'''
@@ -46,6 +144,20 @@ class TextEncoder:
             (torch.norm(vec1) * torch.norm(vec2))
         return sim
 
+    @staticmethod
+    def normalize(embeddings: np.ndarray) -> np.ndarray:
+        '''L2 normalizes embeddings along the last axis, works on a single embedding or a matrix of embeddings.'''
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        # avoid dividing by zero for empty text embeddings
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    @classmethod
+    def cosine_similarities(cls, normalized_matrix: np.ndarray, vec: np.ndarray) -> np.ndarray:
+        '''Compares an embedding to every row of an L2 normalized embedding matrix with a single matrix-vector product.'''
+        return normalized_matrix @ cls.normalize(vec)
+
 
 class ExperienceYAML(BaseModel):
     class GroupYAML(BaseModel):
@@ -83,6 +195,21 @@ class TemplateYAML(BaseModel):
     bullet: str
 
 
+class TemplateLayout(BaseModel):
+    """Page fit settings declared under the layout key of +resume.yaml."""
+    # line budget for all bullets
+    max_lines: int = 31
+    # used to estimate lines by character count when no font is declared or found
+    line_chars_lim: int = 120
+    # TFM/AFM font metric file paths or font names found with kpsewhich
+    font: Optional[str] = None
+    bold_font: Optional[str] = None
+    # size in points of the bullet text
+    font_size: float = 10
+    # width available to bullet text as a TeX dimension, e.g. 7in
+    text_width: Optional[str] = None
+
+
 def load_yaml(path: str):
     "Load YAML from a file."
     with open(path, 'r') as file:
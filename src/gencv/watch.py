@@ -0,0 +1,194 @@
+"""Module for re-rendering a resume whenever its data file, template or description changes.
+
+The result of every stage is kept between renders and a change only reruns the stages it
+invalidates. A description change regenerates the query, a data file change recompiles the
+bundle, which only embeds the edited bullets, and either one rescores the bullets. A template
+change reparses the template and reselects from the existing scores. LaTeX only runs when the
+filled resume or the template's assets changed.
+"""
+
+import os
+import time
+from typing import Callable, Literal, NamedTuple, Optional
+
+from gencv import description_summerizer
+from gencv.batch import render
+from gencv.compiled_data import CompiledData, load_compact_embeddings, load_lexical_index, load_or_compile
+from gencv.description_summerizer import extract_keywords, gen_resume_query
+from gencv.latex_builder import ExperienceData, TexResumeTemplate
+from gencv.lexical import BM25Index, LexicalQuery
+from gencv.pipeline import score_resume_data, select_processed_data, to_template_data
+from gencv.precision import CompactEmbeddings
+from gencv.resumeitems import ProcessedData
+from gencv.utils import TextEncoder
+
+Input = Literal["data", "template", "description"]
+# stages in the order they run, each one invalidates the ones after it that depend on it
+STAGES = ("query", "data", "template", "score", "select", "fill", "build")
+INPUT_STAGES: dict[Input, str] = {
+    "description": "query", "data": "data", "template": "template"}
+DEFAULT_INTERVAL = 0.25
+# editors can write a file in several steps, changes are only rendered once the files stop changing
+SETTLE_TIME = 0.1
+
+Snapshot = dict[str, tuple[int, int]]
+
+
+def snapshot(path: str) -> Snapshot:
+    "Modification time and size of a file or of every file in a folder, empty if the path doesn't exist."
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return {path: (stat.st_mtime_ns, stat.st_size)}
+    files: Snapshot = {}
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            files[file_path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class WatchUpdate(NamedTuple):
+    """Stages rerun by an update, path is None if the output didn't need to be rebuilt."""
+    stages: tuple[str, ...]
+    path: Optional[str]
+    seconds: float
+
+
+class ResumeWatcher:
+    """Keeps every stage of tailoring a resume resident and reruns the stages invalidated by file changes."""
+
+    def __init__(self, datafile: str, template_path: str, desc_file: str, outdir: str, output_name: str, proxy_dir: str, output: Literal["pdf", "tex", "all"] = "pdf", as_query: bool = False, batch_size: int = TextEncoder.DEFAULT_BATCH_SIZE, optimizer_options: dict = None, scoring_options: dict = None, lexical_options: dict = None, build_options: dict = None) -> None:
+        self.inputs: dict[Input, str] = {
+            "data": datafile, "template": template_path, "description": desc_file}
+        self.outdir = outdir
+        self.output_name = output_name
+        self.proxy_dir = proxy_dir
+        self.output = output
+        self.as_query = as_query
+        self.batch_size = batch_size
+        # keyword arguments for select_processed_data, load_compact_embeddings, LexicalQuery and TexResumeTemplate.to_file
+        self.optimizer_options = optimizer_options or {}
+        self.scoring_options = scoring_options or {}
+        self.lexical_options = lexical_options or {}
+        self.build_options = build_options or {}
+
+        self.snapshots: dict[Input, Snapshot] = {}
+        # stages that have to run on the next update, failed stages stay here until they succeed
+        self.dirty: set[str] = set()
+        self.query: str = None
+        self.keywords: list[str] = None
+        self.data: CompiledData = None
+        self.embeddings: CompactEmbeddings = None
+        self.lexical_index: BM25Index = None
+        self.resume_template: TexResumeTemplate = None
+        self.processed_data: list[ProcessedData] = None
+        self.template_data: list[ExperienceData] = None
+        self.latex: str = None
+        # latex and assets hash of the last successful build
+        self.built: tuple[str, str] = None
+        self.path: str = None
+
+    def poll(self) -> list[Input]:
+        "Find the inputs whose files changed since the last poll and mark their stages to run on the next update."
+        changed: list[Input] = []
+        for name, path in self.inputs.items():
+            current = snapshot(path)
+            if current != self.snapshots.get(name):
+                self.snapshots[name] = current
+                self.dirty.add(INPUT_STAGES[name])
+                changed.append(name)
+        return changed
+
+    def update(self) -> WatchUpdate:
+        "Run the dirty stages, a stage that fails stays dirty and the stages after it don't run."
+        start = time.perf_counter()
+        ran: list[str] = []
+        self.path = None
+        for stage in STAGES:
+            if stage in self.dirty:
+                getattr(self, f"run_{stage}")()
+                self.dirty.discard(stage)
+                ran.append(stage)
+        return WatchUpdate(tuple(ran), self.path, time.perf_counter() - start)
+
+    def run_query(self):
+        "Generate the query and, if bullets are scored lexically, the keywords from the description file."
+        with open(self.inputs["description"], "r", encoding="utf-8") as f:
+            description = f.read()
+        query = keywords = None
+        if self.as_query:
+            query = description.strip()
+        elif self.lexical_options.get("scoring") != "lexical":
+            query = gen_resume_query(description)
+        if self.lexical_options:
+            keywords = [description.strip()] if self.as_query else extract_keywords(description)
+        if description_summerizer.cache is not None:
+            description_summerizer.cache.flush()
+        if (query, keywords) != (self.query, self.keywords):
+            self.query, self.keywords = query, keywords
+            self.dirty.add("score")
+
+    def run_data(self):
+        "Recompile the data file, only bullets whose text changed are embedded."
+        self.data = load_or_compile(
+            self.inputs["data"], batch_size=self.batch_size)
+        self.embeddings = load_compact_embeddings(
+            self.inputs["data"], self.data.embeddings, **self.scoring_options)
+        if self.lexical_options:
+            self.lexical_index = load_lexical_index(self.inputs["data"])
+        self.dirty.add("score")
+
+    def run_template(self):
+        "Reparse the template."
+        self.resume_template = TexResumeTemplate(self.inputs["template"])
+        self.dirty.add("select")
+
+    def run_score(self):
+        "Score and rank the bullets against the query."
+        lexical = LexicalQuery(self.lexical_index, self.keywords, **self.lexical_options) \
+            if self.lexical_options else None
+        self.processed_data = score_resume_data(
+            self.data.experiences, self.embeddings, self.query, lexical)
+        # the query embedding is new whenever the query changed
+        if TextEncoder.cache is not None:
+            TextEncoder.cache.flush()
+        self.dirty.add("select")
+
+    def run_select(self):
+        "Select the bullets that fit in the template."
+        self.template_data = to_template_data(select_processed_data(
+            self.processed_data, self.resume_template, **self.optimizer_options))
+        self.dirty.add("fill")
+
+    def run_fill(self):
+        "Fill the template, the output is only rebuilt if the latex or the template assets changed."
+        self.latex = self.resume_template.fill(self.template_data)
+        if (self.latex, self.resume_template.asset_hash) != self.built:
+            self.dirty.add("build")
+
+    def run_build(self):
+        "Build the filled template."
+        assets_hash = self.resume_template.asset_hash
+        os.makedirs(self.outdir, exist_ok=True)
+        self.path = render(self.latex, self.output_name, self.outdir, self.proxy_dir, self.output,
+                           self.build_options, assets_hash)
+        self.built = (self.latex, assets_hash)
+
+    def watch(self, on_update: Callable[[list[Input], WatchUpdate], None], on_error: Callable[[Exception], None], interval: float = DEFAULT_INTERVAL):
+        "Render once, then whenever an input changes until interrupted."
+        while True:
+            changed = self.poll()
+            if changed:
+                time.sleep(SETTLE_TIME)
+                while more := self.poll():
+                    changed += [name for name in more if name not in changed]
+                    time.sleep(SETTLE_TIME)
+                try:
+                    on_update(changed, self.update())
+                except Exception as e:  # pylint: disable=broad-except
+                    on_error(e)
+            time.sleep(interval)
@@ -0,0 +1,44 @@
+"""Puts the gencv sources and the benchmark helpers the tests reuse on the import path."""
+
+import os
+import stat
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+# pylint: disable=wrong-import-position
+from datagen import StubEncoder
+from gencv import utils
+from gencv.utils import TextEncoder
+
+# writes a placeholder PDF named after the .tex file it's given
+FAKE_PDFLATEX = """#!/bin/sh
+for arg in "$@"; do last="$arg"; done
+echo pdf > "$(basename "$last" .tex).pdf"
+"""
+
+
+@pytest.fixture
+def fake_pdflatex(tmp_path, monkeypatch) -> str:
+    """Put a pdflatex that writes placeholder PDFs first on the PATH, gives the folder it's in."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    pdflatex = bin_dir / "pdflatex"
+    pdflatex.write_text(FAKE_PDFLATEX)
+    pdflatex.chmod(pdflatex.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return str(bin_dir)
+
+
+@pytest.fixture
+def stub_encoder(monkeypatch):
+    """Load the stub encoder instead of the embedding model and restore the encoder's settings afterwards."""
+    monkeypatch.setattr(utils, "load_backend", lambda *args: StubEncoder(64))
+    for name in ("backend", "model_name", "quantize", "threads", "export_dir", "model", "cache"):
+        monkeypatch.setattr(TextEncoder, name, getattr(TextEncoder, name))
+    TextEncoder.set_model(None)
+    TextEncoder.set_cache(None)
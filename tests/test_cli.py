@@ -0,0 +1,103 @@
+"""Tests running the CLI commands end to end with the stub encoder and a fake pdflatex."""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+from typer.testing import CliRunner
+
+from datagen import write_data_file
+from optimizer import TEMPLATE_DIR
+
+import cli
+from gencv import description_summerizer, fontmetrics
+from gencv.cache import ResponseCache
+from gencv.latex_builder import TexResumeTemplate
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch, fake_pdflatex, stub_encoder) -> str:
+    """Point the CLI at a config in a temporary home folder and restore the module state it changes."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    write_data_file(str(tmp_path / "data.yaml"), 40)
+    (tmp_path / "out").mkdir()
+    config = {
+        "datafile": tmp_path / "data.yaml",
+        "template_dir": os.path.dirname(TEMPLATE_DIR),
+        "output_dir": tmp_path / "out",
+        "proxy_dir": tmp_path / ".gencv" / "proxy",
+        "cache_dir": tmp_path / ".gencv" / "cache",
+        "query_mode": "local",
+        "latex_format": False,
+        "build_cache": False,
+    }
+    (tmp_path / ".gencvrc").write_text("".join(f"{key} = {value}\n" for key, value in config.items()))
+
+    monkeypatch.setattr(TexResumeTemplate, "cache_dir", TexResumeTemplate.cache_dir)
+    monkeypatch.setattr(fontmetrics, "cache_dir", fontmetrics.cache_dir)
+    monkeypatch.setattr(description_summerizer, "cache", description_summerizer.cache)
+    monkeypatch.setattr(description_summerizer, "query_mode", description_summerizer.query_mode)
+    return str(tmp_path)
+
+
+def invoke(*args: str):
+    result = CliRunner().invoke(cli.app, list(args))
+    assert result.exit_code == 0, result.output + repr(result.exception)
+    return result
+
+
+def test_batch_then_mkres_leaves_no_proxy_files(home: str):
+    template = os.path.basename(TEMPLATE_DIR)
+    jobs = os.path.join(home, "jobs.jsonl")
+    with open(jobs, "w", encoding="utf-8") as f:
+        for name in ("backend", "firmware"):
+            f.write(json.dumps({"name": name, "description": f"{name} engineer", "as_query": True}) + "\n")
+
+    invoke("batch", jobs, "--template", template)
+    for outname in ("first", "second"):
+        invoke("mkres", template, "python developer", "--as-query", "--outname", outname)
+
+    assert sorted(os.listdir(os.path.join(home, "out"))) == ["backend.pdf", "firmware.pdf", "first.pdf", "second.pdf"]
+    proxy_dir = os.path.join(home, ".gencv", "proxy")
+    assert not os.path.exists(proxy_dir) or os.listdir(proxy_dir) == []
+
+
+def test_cache_stats_does_not_evict(home: str):
+    cache_dir = os.path.join(home, ".gencv", "cache")
+    cache = ResponseCache(cache_dir)
+    cache.put("model", "prompt", {}, "description", "response")
+    # older than the default time to live
+    with cache._connection:  # pylint: disable=protected-access
+        cache._connection.execute("UPDATE responses SET created = ?",  # pylint: disable=protected-access
+                                  (time.time() - 2 * ResponseCache.DEFAULT_TTL,))
+    cache.close(flush=False)
+
+    assert "LLM cache: 1 entries." in invoke("cache", "stats").output
+    cache = ResponseCache(cache_dir)
+    assert len(cache) == 1
+    cache.close(flush=False)
+
+
+def test_mkres_fails_without_waiting_for_other_stages(home: str, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(description_summerizer, "gen_resume_query", lambda description: release.wait(5))
+    try:
+        start = time.perf_counter()
+        result = CliRunner().invoke(cli.app, ["mkres", "missing_template", "python developer"])
+        assert isinstance(result.exception, FileNotFoundError)
+        # the query stage is still waiting
+        assert time.perf_counter() - start < 2 and not release.is_set()
+    finally:
+        release.set()
+
+
+@pytest.mark.parametrize("option", [["--datafile", "data.yaml"], ["--template-dir", "templates"], ["--optimizer", "exact"],
+                                    ["--scoring", "lexical"], ["--query-mode", "local"], ["--no-llm-cache"],
+                                    ["--profile", "profile.json"]])
+def test_mkres_rejects_local_options_with_remote(home: str, option: list[str]):
+    result = CliRunner().invoke(cli.app, ["mkres", "jakes_resume", "python developer", "--remote", *option])
+    assert result.exit_code == 2
+    assert option[0] in result.output
@@ -0,0 +1,161 @@
+"""Tests of the AsyncSummerizer concurrency, timeout and retry behaviour against a stub ollama server."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import ollama
+import pytest
+
+from gencv import description_summerizer
+from gencv.description_summerizer import RESUME_QUERY_PROMPT, AsyncSummerizer
+
+
+class StubOllama(ThreadingHTTPServer):
+    """Serves /api/chat on localhost, replies after `delay` seconds and fails the first calls with the statuses in `failures`."""
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.delay = 0.0
+        self.failures: dict[str, list[int]] = {}
+        self.calls: list[str] = []
+        # client address of every call, one per connection
+        self.connections: set[tuple[str, int]] = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers chat requests like ollama with stream set to False."""
+    # keeps connections open between requests like ollama does
+    protocol_version = "HTTP/1.1"
+    server: StubOllama
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        description = body["messages"][0]["content"].removeprefix(RESUME_QUERY_PROMPT)
+        with self.server.lock:
+            self.server.calls.append(description)
+            self.server.connections.add(self.client_address)
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            failures = self.server.failures.get(description)
+            status = failures.pop(0) if failures else 200
+        try:
+            time.sleep(self.server.delay)
+            if status == 200:
+                self.send_json(200, {"model": body["model"], "created_at": "2024-01-01T00:00:00Z", "done": True,
+                                     "message": {"role": "assistant", "content": f"query for {description}"}})
+            else:
+                self.send_json(status, {"error": f"status {status}"})
+        except OSError:
+            # the client gave up on the request
+            pass
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture(autouse=True)
+def llm_mode():
+    description_summerizer.set_cache(None)
+    description_summerizer.set_query_mode("llm")
+
+
+@pytest.fixture
+def server():
+    server = StubOllama()
+    # a short poll interval so shutdown returns quickly
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(server: StubOllama, descriptions: list[str], **options) -> list:
+    "Create the queries of descriptions with a summerizer talking to the stub server."
+    async def main():
+        async with AsyncSummerizer(host=server.host, **options) as summerizer:
+            return await summerizer.gen_resume_queries(descriptions, return_exceptions=True)
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("status", [500, 429])
+def test_retries_server_errors_and_rate_limits(server: StubOllama, status: int):
+    server.failures = {"a": [status, status]}
+    assert run(server, ["a"], retries=2, backoff=0) == ["query for a"]
+    assert server.calls == ["a", "a", "a"]
+
+
+def test_gives_up_after_retries(server: StubOllama):
+    server.failures = {"a": [500, 500]}
+    [result] = run(server, ["a"], retries=1, backoff=0)
+    assert isinstance(result, ollama.ResponseError) and result.status_code == 500
+    assert server.calls == ["a", "a"]
+
+
+def test_does_not_retry_client_errors(server: StubOllama):
+    server.failures = {"a": [400]}
+    [result] = run(server, ["a"], retries=2, backoff=0)
+    assert isinstance(result, ollama.ResponseError) and result.status_code == 400
+    assert server.calls == ["a"]
+
+
+def test_reports_connection_errors():
+    # nothing listens on the port of a closed server
+    closed = StubOllama()
+    closed.server_close()
+    [result] = run(closed, ["a"], retries=1, backoff=0)
+    assert isinstance(result, ConnectionError)
+
+
+def test_times_out_slow_requests(server: StubOllama):
+    server.delay = 0.5
+    [result] = run(server, ["a"], timeout=0.05, retries=1, backoff=0)
+    assert isinstance(result, (asyncio.TimeoutError, httpx.TimeoutException))
+    # timeouts are retried
+    assert server.calls == ["a", "a"]
+
+
+def test_requests_share_a_connection(server: StubOllama):
+    server.failures = {"b": [500]}
+    descriptions = [str(i) for i in range(4)] + ["b"]
+    assert run(server, descriptions, concurrency=1, backoff=0) == [f"query for {d}" for d in descriptions]
+    assert len(server.calls) == 6
+    assert len(server.connections) == 1
+
+
+def test_limits_requests_in_flight(server: StubOllama):
+    server.delay = 0.02
+    descriptions = [str(i) for i in range(8)]
+    assert run(server, descriptions, concurrency=2) == [f"query for {d}" for d in descriptions]
+    assert server.max_in_flight == 2
+
+
+def test_backoff_releases_the_slot(server: StubOllama):
+    server.delay = 0.01
+    server.failures = {"a": [500]}
+    assert run(server, ["a", "b"], concurrency=1, backoff=0.2) == ["query for a", "query for b"]
+    # b runs while a waits to retry
+    assert server.calls == ["a", "b", "a"]
@@ -0,0 +1,115 @@
+"""Tests of the font metric parsers and the line estimator."""
+
+import logging
+import struct
+
+import pytest
+
+from optimizer import TEMPLATE_DIR
+
+from gencv import fontmetrics
+from gencv.fontmetrics import FontMetrics, LineEstimator, parse_afm, parse_tfm
+from gencv.latex_builder import TexResumeTemplate
+from gencv.utils import TemplateLayout, calculate_lines
+
+AFM = """StartFontMetrics 4.1
+FontName Fixture
+StartCharMetrics 4
+C 32 ; WX 250 ; N space ; B 0 0 0 0 ;
+C 65 ; WX 722 ; N A ; B 15 0 706 674 ;
+C 66 ; WX 667 ; N B ; B 17 0 593 662 ;
+C 160 ; WX 500 ; N nbspace ; B 0 0 0 0 ;
+EndCharMetrics
+EndFontMetrics
+"""
+
+# flat metrics, every glyph is half an em regular and a whole em bold
+REGULAR = FontMetrics({char: 0.5 for char in "abcdefghijklmnopqrstuvwxyz"}, 0.25)
+BOLD = FontMetrics({char: 1.0 for char in "abcdefghijklmnopqrstuvwxyz"}, 0.25)
+
+
+def fix_word(value: float) -> int:
+    return round(value * 2 ** 20)
+
+
+@pytest.fixture
+def tfm_path(tmp_path) -> str:
+    """Write a TFM file with A half an em wide, B three quarters of an em, C missing and a third of an em interword space."""
+    lh, bc, ec, nw, nh, nd, ni, nl, nk, ne, np = 2, 65, 67, 3, 1, 1, 1, 0, 0, 0, 2
+    lf = 6 + lh + (ec - bc + 1) + nw + nh + nd + ni + nl + nk + ne + np
+    data = struct.pack(">12H", lf, lh, bc, ec, nw, nh, nd, ni, nl, nk, ne, np)
+    # checksum and design size
+    data += struct.pack(">2i", 0, fix_word(10))
+    # width index of A, B and C, 0 means missing
+    data += bytes([1, 0, 0, 0, 2, 0, 0, 0, 0, 0, 0, 0])
+    data += struct.pack(">3i", 0, fix_word(0.5), fix_word(0.75))
+    # the first height, depth and italic correction are always 0
+    data += struct.pack(">3i", 0, 0, 0)
+    # slant and interword space
+    data += struct.pack(">2i", 0, fix_word(1 / 3))
+    path = tmp_path / "fixture.tfm"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_parse_tfm(tfm_path: str):
+    metrics = parse_tfm(tfm_path)
+    assert metrics.widths == {"A": 0.5, "B": 0.75}
+    assert metrics.space == pytest.approx(1 / 3)
+    # missing glyphs get the average width
+    assert metrics.width("C") == 0.625
+
+
+def test_parse_tfm_rejects_truncated_files(tfm_path: str):
+    with open(tfm_path, "rb") as f:
+        data = f.read()
+    with open(tfm_path, "wb") as f:
+        f.write(data[:-4])
+    with pytest.raises(ValueError):
+        parse_tfm(tfm_path)
+
+
+def test_parse_afm(tmp_path):
+    path = tmp_path / "fixture.afm"
+    path.write_text(AFM, encoding="latin-1")
+    metrics = parse_afm(str(path))
+    # the space is kept separately and codes outside printable ASCII are skipped
+    assert metrics.widths == {"A": 0.722, "B": 0.667}
+    assert metrics.space == 0.25
+
+
+def test_count_lines_wraps_at_spaces():
+    # 10 ems per line, each four letter word is 2 ems
+    estimator = LineEstimator(REGULAR, BOLD, 10, 100)
+    assert estimator.count_lines("") == 0
+    assert estimator.count_lines(" ".join(["word"] * 4)) == 1
+    assert estimator.count_lines(" ".join(["word"] * 5)) == 2
+    # a word wider than a line overflows into the next one
+    assert estimator.count_lines("a" * 30) == 2
+
+
+def test_count_lines_measures_bold_keywords():
+    estimator = LineEstimator(REGULAR, BOLD, 10, 100)
+    text = "word word word"
+    assert estimator.count_lines(text) == 1
+    # every occurence of a bold keyword is twice as wide
+    assert estimator.count_lines(text, ["word"]) == 2
+    assert estimator.count_lines(text, ["wo"]) == 1
+    assert estimator.cache_info()["lines"].currsize == 3
+
+
+def test_falls_back_to_character_count(monkeypatch, caplog):
+    monkeypatch.setattr(fontmetrics, "missing_fonts", set())
+    monkeypatch.setattr(fontmetrics, "load_font_metrics", lambda font: None)
+    layout = TemplateLayout(font="missing-font", text_width="7in")
+    with caplog.at_level(logging.WARNING):
+        assert LineEstimator.from_layout(layout) is None
+        assert LineEstimator.from_layout(layout) is None
+    # only warned about once
+    assert len(caplog.records) == 1
+    # no font declared
+    assert LineEstimator.from_layout(TemplateLayout()) is None
+
+    resume_template = TexResumeTemplate(TEMPLATE_DIR)
+    text = "x" * 250
+    assert resume_template.get_line_counter()(text) == calculate_lines(text, resume_template.layout.line_chars_lim)
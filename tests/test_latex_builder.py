@@ -0,0 +1,90 @@
+"""Tests of parsing and filling latex templates and of the parsed template cache."""
+
+import os
+import shutil
+
+import pytest
+
+from optimizer import TEMPLATE_DIR
+
+from gencv import latex_builder
+from gencv.latex_builder import BulletData, ExperienceData, TexResumeTemplate, parse_template
+
+EXPECTED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jakes_resume_expected.tex")
+
+EXPERIENCES = [
+    ExperienceData("acme", "job", [
+        BulletData("Cut p99 latency by 40% with a Redis cache & batching", ["Redis"]),
+        BulletData("Built the C++ ingestion service for $2M/year of orders", ["C++"]),
+    ], "Acme Corp", "May 2023 -- Aug 2023", "Software Engineering Intern", "Toronto, ON", ""),
+    ExperienceData("robot", "project", [
+        BulletData("Wrote a PID controller for a self_balancing robot"),
+    ], "Balance Bot", "C, STM32", "https://github.com/example/bot", "github.com/example/bot", ""),
+    # types without a slot in the template are left out
+    ExperienceData("prize", "award", [BulletData("First place")], "Hackathon", "", "", "", ""),
+]
+
+
+def test_parse_template_finds_placeholders():
+    with open(os.path.join(TEMPLATE_DIR, "+resume.tex"), "r", encoding="utf-8") as f:
+        parsed = parse_template(f.read())
+    assert [(slot.placetype, slot.n) for slot in parsed.slots] == [("job", 2), ("project", 3)]
+    assert len(parsed.segments) == len(parsed.slots) + 1
+    assert all(slot.text.startswith("%GENCV") for slot in parsed.slots)
+
+
+def test_fill_matches_expected_output():
+    filled = TexResumeTemplate(TEMPLATE_DIR).fill(EXPERIENCES)
+    with open(EXPECTED_PATH, "r", encoding="utf-8") as f:
+        assert filled == f.read()
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch) -> str:
+    """Copy of the template with the parsed template cache in a temporary folder."""
+    monkeypatch.setattr(TexResumeTemplate, "cache_dir", str(tmp_path / "cache"))
+    path = str(tmp_path / "jakes_resume")
+    shutil.copytree(TEMPLATE_DIR, path)
+    return path
+
+
+def count_parses(monkeypatch) -> list[str]:
+    "Record the templates parse_template is called with."
+    calls = []
+
+    def parse(file_template: str):
+        calls.append(file_template)
+        return parse_template(file_template)
+    monkeypatch.setattr(latex_builder, "parse_template", parse)
+    return calls
+
+
+def test_cache_hit(template_dir: str, monkeypatch):
+    calls = count_parses(monkeypatch)
+    first = TexResumeTemplate(template_dir)
+    second = TexResumeTemplate(template_dir)
+    assert len(calls) == 1
+    assert len(os.listdir(TexResumeTemplate.cache_dir)) == 1
+    assert second.parsed == first.parsed
+    assert second.item_templates == first.item_templates
+    assert second.layout == first.layout
+    assert second.fill(EXPERIENCES) == first.fill(EXPERIENCES)
+
+
+@pytest.mark.parametrize("filename, comment", [("+resume.tex", "% changed"), ("+resume.yaml", "# changed")])
+def test_cache_invalidated_by_changes(template_dir: str, monkeypatch, filename: str, comment: str):
+    calls = count_parses(monkeypatch)
+    TexResumeTemplate(template_dir)
+    with open(os.path.join(template_dir, filename), "a", encoding="utf-8") as f:
+        f.write(f"\n{comment}\n")
+    TexResumeTemplate(template_dir)
+    assert len(calls) == 2
+    assert len(os.listdir(TexResumeTemplate.cache_dir)) == 2
+
+
+def test_cache_invalidated_by_version(template_dir: str, monkeypatch):
+    calls = count_parses(monkeypatch)
+    TexResumeTemplate(template_dir)
+    monkeypatch.setattr(TexResumeTemplate, "PARSED_VERSION", TexResumeTemplate.PARSED_VERSION + 1)
+    TexResumeTemplate(template_dir)
+    assert len(calls) == 2
@@ -0,0 +1,116 @@
+"""Tests of the BM25 index, its bundle file and lexical scoring."""
+
+import math
+import os
+
+import numpy as np
+import pytest
+
+from datagen import write_data_file
+
+from gencv.compiled_data import (LEXICAL_FILENAME, get_bundle_dir, load_compact_embeddings, load_lexical_index,
+                                 load_or_compile)
+from gencv.lexical import BM25Index, LexicalQuery, fuse, lexical_similarities, tokenize
+from gencv.pipeline import score_resume_data
+
+TEXTS = [
+    "Built a REST API in Python and Flask",
+    "Trained PyTorch models for computer vision",
+    "Wrote C++ firmware for a motor controller in C++",
+    "Deployed Python services with Docker",
+    "",
+]
+
+
+def reference_scores(texts: list[str], keywords: list[str]) -> list[float]:
+    "BM25 computed term by term from its definition."
+    documents = [tokenize(text) for text in texts]
+    average_length = sum(map(len, documents)) / len(documents)
+    terms = {term for keyword in keywords for term in tokenize(keyword)}
+    scores = []
+    for document in documents:
+        score = 0.0
+        for term in terms:
+            frequency = document.count(term)
+            if not frequency:
+                continue
+            n_containing = sum(term in other for other in documents)
+            idf = math.log(1 + (len(documents) - n_containing + 0.5) / (n_containing + 0.5))
+            score += idf * frequency * (BM25Index.K1 + 1) / (
+                frequency + BM25Index.K1 * (1 - BM25Index.B + BM25Index.B * len(document) / average_length))
+        scores.append(score)
+    return scores
+
+
+@pytest.mark.parametrize("keywords", [["python"], ["c++", "firmware"], ["Python services", "docker"], ["golang"], []])
+def test_scores_match_reference(keywords: list[str]):
+    index = BM25Index.build(TEXTS)
+    assert index.scores(keywords) == pytest.approx(reference_scores(TEXTS, keywords), rel=1e-5)
+
+
+def test_build_empty_index():
+    assert len(BM25Index.build([]).scores(["python"])) == 0
+
+
+@pytest.fixture
+def data_file(tmp_path, stub_encoder) -> str:
+    path = str(tmp_path / "data.yaml")
+    write_data_file(path, 60)
+    return path
+
+
+def test_compiled_index_round_trip(data_file: str):
+    data = load_or_compile(data_file)
+    bundle_dir = get_bundle_dir(data_file)
+    # written with the rest of the bundle, no temporary files are left behind
+    assert os.path.exists(os.path.join(bundle_dir, LEXICAL_FILENAME))
+    assert not [filename for filename in os.listdir(bundle_dir) if filename.endswith(".tmp")]
+
+    texts = [bullet.text for experience in data.experiences for bullet, _ in experience.bullets]
+    built = BM25Index.build(texts)
+    loaded = load_lexical_index(data_file)
+    assert loaded.n_bullets == len(texts)
+    for name, array in built.to_arrays().items():
+        np.testing.assert_array_equal(loaded.to_arrays()[name], array)
+    keywords = list(loaded.terms[:5])
+    np.testing.assert_array_equal(loaded.scores(keywords), built.scores(keywords))
+
+
+def similarities(processed_data) -> dict[int, float]:
+    "Similarity of every scored bullet by the bullet's id."
+    return {id(d.bullet): 1 / d.sorting_data.bullet_similarity for d in processed_data}
+
+
+def test_hybrid_and_lexical_scoring(data_file: str):
+    data = load_or_compile(data_file)
+    embeddings = load_compact_embeddings(data_file, data.embeddings)
+    index = load_lexical_index(data_file)
+    keywords = list(index.terms[:3])
+    bullets = [id(bullet) for experience in data.experiences for bullet, _ in experience.bullets]
+    lexical_scores = index.scores(keywords)
+
+    dense = similarities(score_resume_data(data.experiences, embeddings, "query"))
+    dense_scores = np.array([dense[bullet] for bullet in bullets])
+    hybrid = similarities(score_resume_data(data.experiences, embeddings, "query",
+                                            LexicalQuery(index, keywords, "hybrid", weight=0.4)))
+    assert [hybrid[bullet] for bullet in bullets] == pytest.approx(fuse(dense_scores, lexical_scores, 0.4), abs=1e-6)
+
+    lexical = similarities(score_resume_data(data.experiences, embeddings, None, LexicalQuery(index, keywords, "lexical")))
+    assert [lexical[bullet] for bullet in bullets] == pytest.approx(lexical_similarities(lexical_scores))
+
+
+def test_prefilter_keeps_best_lexical_scores(data_file: str):
+    data = load_or_compile(data_file)
+    embeddings = load_compact_embeddings(data_file, data.embeddings)
+    index = load_lexical_index(data_file)
+    keywords = list(index.terms[:3])
+    bullets = [id(bullet) for experience in data.experiences for bullet, _ in experience.bullets]
+    lexical_scores = index.scores(keywords)
+    top_n = 10
+
+    processed_data = score_resume_data(data.experiences, embeddings, "query",
+                                       LexicalQuery(index, keywords, "hybrid", prefilter_top_n=top_n))
+    kept = {bullets.index(id(d.bullet)) for d in processed_data}
+    assert len(kept) == top_n
+    # no dropped bullet scores higher than a kept one
+    assert min(lexical_scores[list(kept)]) >= max(np.delete(lexical_scores, list(kept)))
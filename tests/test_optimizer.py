@@ -0,0 +1,102 @@
+"""Tests of the exact selection against brute force and of its fallback to the greedy selection."""
+
+import itertools
+import random
+
+import pytest
+
+from optimizer import TEMPLATE_DIR, generate_bullets
+
+from gencv import optimizer
+from gencv.latex_builder import TexResumeTemplate
+from gencv.optimizer import InfeasibleError, select_data_exact, solve
+from gencv.resumeitems import ProcessedData, process_data, select_data
+from gencv.utils import calculate_lines
+
+CASES = 60
+
+
+@pytest.fixture(scope="module")
+def resume_template() -> TexResumeTemplate:
+    return TexResumeTemplate(TEMPLATE_DIR)
+
+
+def similarity(d: ProcessedData) -> float:
+    return 1 / d.sorting_data.bullet_similarity
+
+
+def is_feasible(selected: list[ProcessedData], processed_data: list[ProcessedData], template_types: dict[str, int], max_lines: int, line_char_lim: int) -> bool:
+    """Check a selection against every constraint the exact solver enforces."""
+    candidates = [d for d in processed_data if d.experience.experience_type in template_types]
+    selected_bullets = {id(d.bullet) for d in selected}
+    if any(d.experience.experience_type not in template_types for d in selected):
+        return False
+    # dependants only come with their dependency
+    if any(d.bullet.dependency is not None and id(d.bullet.dependency) not in selected_bullets for d in selected):
+        return False
+    if sum(calculate_lines(d.bullet.text, line_char_lim) for d in selected) > max_lines:
+        return False
+
+    experiences_per_type = {experience_type: 0 for experience_type in template_types}
+    for experience_id in {d.experience.id for d in selected}:
+        experience = next(d.experience for d in candidates if d.experience.id == experience_id)
+        experiences_per_type[experience.experience_type] += 1
+        available = [d for d in candidates if d.experience.id == experience_id]
+        count = sum(d.experience.id == experience_id for d in selected)
+        # like the solver, limits larger than the available bullets are capped
+        exp_max = len(available) if experience.max_bullets is None else min(experience.max_bullets, len(available))
+        exp_min = 0 if experience.min_bullets is None else min(experience.min_bullets, exp_max)
+        if not max(exp_min, 1) <= count <= exp_max:
+            return False
+        for group_id in {d.group.id for d in available}:
+            group = next(d.group for d in available if d.group.id == group_id)
+            n_group = sum(d.group.id == group_id for d in available)
+            group_count = sum(d.group.id == group_id for d in selected)
+            group_min = 0 if group.min is None else min(group.min, n_group)
+            group_max = n_group if group.max is None else min(group.max, n_group)
+            if not group_min <= group_count <= group_max:
+                return False
+    return all(experiences_per_type[t] <= n for t, n in template_types.items())
+
+
+def brute_force(processed_data: list[ProcessedData], template_types: dict[str, int], max_lines: int, line_char_lim: int) -> float:
+    """Best total similarity of every feasible selection."""
+    candidates = [d for d in processed_data if d.experience.experience_type in template_types]
+    best = 0.0
+    for n in range(1, len(candidates) + 1):
+        for selected in itertools.combinations(candidates, n):
+            total = sum(map(similarity, selected))
+            if total > best and is_feasible(list(selected), processed_data, template_types, max_lines, line_char_lim):
+                best = total
+    return best
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_solve_matches_brute_force(seed: int, resume_template: TexResumeTemplate):
+    rng = random.Random(seed)
+    # one type only to go over the number of experiences the template has room for and a type it doesn't have
+    experience_types = rng.choice([("job", "project"), ("job",), ("project", "award")])
+    processed_data = process_data(generate_bullets(rng.randint(4, 13), rng, experience_types))
+    max_lines = rng.randint(0, 16)
+    line_char_lim = rng.choice([40, 80])
+    template_types = {placeholder.placetype: placeholder.n for placeholder, _ in resume_template.args}
+
+    selected = solve(processed_data, resume_template, max_lines, line_char_lim, time_limit=10)
+    assert is_feasible(selected, processed_data, template_types, max_lines, line_char_lim)
+    assert sum(map(similarity, selected)) == pytest.approx(
+        brute_force(processed_data, template_types, max_lines, line_char_lim))
+
+
+def test_falls_back_to_greedy_on_timeout(resume_template: TexResumeTemplate):
+    processed_data = process_data(generate_bullets(300, random.Random(0)))
+    expected = select_data(processed_data, resume_template, 31, 80)
+    assert select_data_exact(processed_data, resume_template, 31, 80, time_limit=0) == expected
+
+
+def test_falls_back_to_greedy_when_infeasible(resume_template: TexResumeTemplate, monkeypatch):
+    def infeasible(*args):
+        raise InfeasibleError()
+    monkeypatch.setattr(optimizer, "solve", infeasible)
+    processed_data = process_data(generate_bullets(30, random.Random(0)))
+    expected = select_data(processed_data, resume_template, 31, 80)
+    assert select_data_exact(processed_data, resume_template, 31, 80) == expected
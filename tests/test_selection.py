@@ -0,0 +1,44 @@
+"""Differential test of the indexed select_data against the exception based implementation it replaced."""
+
+import logging
+import random
+
+import pytest
+
+from optimizer import TEMPLATE_DIR, generate_bullets
+from selection import reference_select_data, selection_key
+
+from gencv.latex_builder import TexResumeTemplate
+from gencv.pipeline import DEFAULT_LINE_CHARS_LIM
+from gencv.resumeitems import process_data, select_data
+
+CASES = 200
+
+
+@pytest.fixture(scope="module", autouse=True)
+def info_logging():
+    # the reference implementation formats debug messages even when they aren't shown
+    logger = logging.getLogger()
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    yield
+    logger.setLevel(level)
+
+
+@pytest.fixture(scope="module")
+def resume_template() -> TexResumeTemplate:
+    return TexResumeTemplate(TEMPLATE_DIR)
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_select_data_matches_reference(seed: int, resume_template: TexResumeTemplate):
+    rng = random.Random(seed)
+    # include an experience type that isn't in the template and negative similarities
+    processed_data = process_data(generate_bullets(
+        rng.randint(1, 80), rng, ("job", "project", "award"), (-0.3, 0.9)))
+    max_lines = rng.randint(0, 60)
+    line_char_lim = rng.choice([40, 80, DEFAULT_LINE_CHARS_LIM])
+
+    expected = reference_select_data(processed_data, resume_template, max_lines, line_char_lim)
+    actual = select_data(processed_data, resume_template, max_lines, line_char_lim)
+    assert selection_key(actual) == selection_key(expected)
@@ -0,0 +1,40 @@
+"""Tests of the daemon's resume service with the stub encoder and a fake pdflatex."""
+
+import os
+
+import pytest
+
+from datagen import write_data_file
+from optimizer import TEMPLATE_DIR
+
+from gencv.client import MkresRequest
+from gencv.server import ResumeService
+
+
+def test_mkres_builds_leave_proxy_folder_empty(tmp_path, fake_pdflatex, stub_encoder):
+    write_data_file(str(tmp_path / "data.yaml"), 40)
+    proxy_dir = str(tmp_path / "proxy")
+    service = ResumeService(str(tmp_path / "data.yaml"), os.path.dirname(TEMPLATE_DIR), proxy_dir)
+
+    def mkres(outname: str) -> dict:
+        return service.mkres(MkresRequest(
+            template=os.path.basename(TEMPLATE_DIR), desc="python developer", as_query=True,
+            outdir=str(tmp_path), outname=outname))
+
+    assert mkres("first")["path"] == str(tmp_path / "first.pdf")
+    assert os.listdir(proxy_dir) == []
+
+    # a failed build is cleaned up too and doesn't block the next request
+    pdflatex = os.path.join(fake_pdflatex, "pdflatex")
+    with open(pdflatex, encoding="utf-8") as f:
+        script = f.read()
+    with open(pdflatex, "w", encoding="utf-8") as f:
+        f.write("#!/bin/sh\nexit 1\n")
+    with pytest.raises(FileNotFoundError):
+        mkres("failed")
+    assert os.listdir(proxy_dir) == []
+
+    with open(pdflatex, "w", encoding="utf-8") as f:
+        f.write(script)
+    assert mkres("second")["path"] == str(tmp_path / "second.pdf")
+    assert os.listdir(proxy_dir) == []
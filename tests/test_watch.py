@@ -0,0 +1,29 @@
+"""Tests of the watch mode's incremental rebuilds with the stub encoder and a fake pdflatex."""
+
+import os
+
+from datagen import write_data_file
+from optimizer import TEMPLATE_DIR
+
+from gencv.watch import ResumeWatcher
+
+
+def test_rebuilds_leave_proxy_folder_empty(tmp_path, fake_pdflatex, stub_encoder):
+    write_data_file(str(tmp_path / "data.yaml"), 40)
+    description = tmp_path / "description.txt"
+    description.write_text("python developer")
+    proxy_dir = str(tmp_path / "proxy")
+    watcher = ResumeWatcher(str(tmp_path / "data.yaml"), TEMPLATE_DIR, str(description),
+                            str(tmp_path / "out"), "resume", proxy_dir, as_query=True)
+
+    assert watcher.poll() == ["data", "template", "description"]
+    assert watcher.update().path == str(tmp_path / "out" / "resume.pdf")
+    assert os.listdir(proxy_dir) == []
+
+    # the second build would fail if the first one left files in the proxy folder
+    description.write_text("embedded firmware engineer")
+    os.utime(description, ns=(0, 0))
+    assert watcher.poll() == ["description"]
+    update = watcher.update()
+    assert "build" in update.stages
+    assert os.listdir(proxy_dir) == []